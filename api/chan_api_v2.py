@@ -9,8 +9,13 @@
 import sys
 import os
 import json
+import time
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional, Union
+from typing import Dict, List, Any, Optional, Tuple, Union
 from pathlib import Path
 import logging
 
@@ -25,30 +30,125 @@ from chan_theory_v2.models.dynamics import BuySellPointType, BackChi, DynamicsCo
 from chan_theory_v2.config.chan_config import ChanConfig
 from chan_theory_v2.strategies.backchi_stock_selector import SimpleBackchiStockSelector
 from database.db_handler import get_db_handler
+from database.async_db_handler import get_async_db_handler
+from database.kline_mirror import find_klines, use_mirror
+from database.time_fields import NATIVE_TIME_FIELD, parse_kline_time, time_range_query
+from api.symbol_index import SymbolIndex
+from api.metrics import engine_stage_duration, record_cache, record_engine_stages
+from api.structure_cache import StructureCache
+from api.latest_structure import LatestStructureStore
 
 # 设置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 批量分析参数
+BATCH_MAX_SYMBOLS = 300                                  # 单次批量分析的最大股票数
+BATCH_WORKERS = min(8, os.cpu_count() or 1)             # 批量分析进程数
+BATCH_FETCH_CHUNK = {"daily": 200, "30min": 50, "5min": 10}  # 每次 $in 查询的股票数
+
 
 class ChanDataAPIv2:
     """缠论数据API v2 - 基于最新缠论引擎的完整分析服务"""
     
     def __init__(self):
-        """初始化API"""
-        self.db_handler = get_db_handler()
-        self.db = self.db_handler.db
+        """
+        初始化API
+        数据库连接与选股器在首次使用时才创建，构造本身不访问MongoDB，
+        数据库短暂不可用时API进程仍可启动（由 /ready 探针反映就绪状态）
+        """
+        self._db_handler = None
+        self._stock_selector = None
+        self._batch_pool = None
+        self._structure_cache = None
+        self._latest_structure = None
         
         # 初始化缠论引擎
         self.chan_engine = ChanEngine()
         
-        # 初始化选股器
-        self.stock_selector = SimpleBackchiStockSelector()
+        # 股票搜索内存索引（首次搜索时加载）
+        self.symbol_index = SymbolIndex(self._load_symbol_documents)
         
         logger.info("🚀 缠论数据API v2初始化完成")
     
+    @property
+    def db_handler(self):
+        """数据库处理器（首次访问时连接）"""
+        if self._db_handler is None:
+            self._db_handler = get_db_handler()
+        return self._db_handler
+    
+    @property
+    def db(self):
+        """数据库实例"""
+        return self.db_handler.db
+    
+    @property
+    def stock_selector(self) -> SimpleBackchiStockSelector:
+        """选股器（首次访问时创建）"""
+        if self._stock_selector is None:
+            self._stock_selector = SimpleBackchiStockSelector()
+        return self._stock_selector
+    
+    @property
+    def structure_cache(self) -> StructureCache:
+        """收盘后预计算的结构缓存（见 daily_structure_precompute.py）"""
+        if self._structure_cache is None:
+            self._structure_cache = StructureCache(self.db)
+        return self._structure_cache
+    
+    @property
+    def latest_structure(self) -> LatestStructureStore:
+        """最新结构物化表（跨市场结构筛选）"""
+        if self._latest_structure is None:
+            self._latest_structure = LatestStructureStore(self.db)
+        return self._latest_structure
+    
+    def screen_structures(self, level: str = "30min", **filters) -> Dict[str, Any]:
+        """
+        按最新结构筛选股票（读取物化表，不运行引擎）
+        
+        Args:
+            level: 时间级别
+            **filters: 见 LatestStructureStore.screen
+            
+        Returns:
+            {"level", "count", "items"}
+        """
+        items = self.latest_structure.screen(level, **filters)
+        return {"level": level, "count": len(items), "items": items}
+    
+    def check_ready(self) -> bool:
+        """就绪检查：数据库可连接并响应ping"""
+        try:
+            self.db_handler.client.admin.command('ping')
+            return True
+        except Exception as e:
+            logger.warning(f"⚠️ 数据库未就绪: {e}")
+            return False
+    
+    def _load_symbol_documents(self) -> List[Dict[str, Any]]:
+        """加载全部股票基础信息，供搜索索引使用"""
+        collection = self.db["infrastructure_stock_basic"]
+        return list(collection.find(
+            {"ts_code": {"$exists": True}, "name": {"$exists": True}},
+            {"ts_code": 1, "symbol": 1, "name": 1, "_id": 0}
+        ))
+    
     def get_symbols_list(self, query: str = "") -> List[Dict[str, str]]:
-        """获取股票列表"""
+        """获取股票列表（内存索引，支持代码、名称、拼音首字母）"""
+        try:
+            record_cache("symbol_index", self.symbol_index.is_loaded)
+            stocks = self.symbol_index.search(query, limit=100)
+            if query and query.strip():
+                logger.debug(f"🔍 搜索股票: {query.strip()} → {len(stocks)} 个结果")
+            return stocks
+        except Exception as e:
+            logger.warning(f"⚠️ 股票搜索索引不可用，回退到数据库查询: {e}")
+            return self._query_symbols_from_db(query)
+    
+    def _query_symbols_from_db(self, query: str = "") -> List[Dict[str, str]]:
+        """直接查询数据库获取股票列表（索引不可用时的回退路径）"""
         try:
             collection = self.db["infrastructure_stock_basic"]
             
@@ -102,6 +202,13 @@ class ChanDataAPIv2:
             完整的分析结果
         """
         try:
+            # 优先使用收盘后预计算的结果（下一交易日开盘前有效）
+            if analysis_level == "complete":
+                cached = self.structure_cache.get(symbol, timeframe, days)
+                if cached is not None:
+                    logger.info(f"⚡ 命中预计算缓存 {symbol} ({timeframe}, {days}天)")
+                    return cached
+            
             logger.info(f"🔍 开始缠论v2分析 {symbol} ({timeframe}, {days}天, {analysis_level}级别)")
             
             # 获取数据
@@ -129,8 +236,11 @@ class ChanDataAPIv2:
                 analysis_level=analysis_level_enum
             )
             
+            record_engine_stages(result.stage_timings, timeframe)
+            
             # 转换为前端标准格式
-            frontend_data = self._convert_to_frontend_format(result, timeframe, days)
+            with engine_stage_duration.time(stage="frontend_conversion", level=timeframe):
+                frontend_data = self._convert_to_frontend_format(result, timeframe, days)
             
             logger.info(f"✅ {symbol} 缠论v2分析完成")
             return frontend_data
@@ -170,15 +280,54 @@ class ChanDataAPIv2:
                 else:
                     logger.warning(f"⚠️ 无法获取{level_str}数据")
             
+            return self._analyze_level_data(symbol, levels, days, level_data)
+            
+        except Exception as e:
+            logger.error(f"❌ 多级别分析 {symbol} 失败: {e}")
+            import traceback
+            traceback.print_exc()
+            return self._generate_empty_multi_level_result(symbol, levels)
+    
+    async def analyze_multi_level_async(self,
+                                        symbol: str,
+                                        levels: List[str] = ["daily", "30min", "5min"],
+                                        days: int = 90) -> Dict[str, Any]:
+        """
+        多级别缠论分析（异步版本）：各级别K线并发获取，分析在线程池中执行
+        参数与返回值同 analyze_multi_level
+        """
+        try:
+            logger.info(f"🔍 开始多级别缠论分析 {symbol} ({levels}, {days}天, 并发取数)")
+            
+            time_levels = [self._get_time_level(level_str) for level_str in levels]
+            fetched = await asyncio.gather(*(self._fetch_stock_data_async(symbol, time_level, days)
+                                             for time_level in time_levels))
+            level_data = {time_level: data for time_level, data in zip(time_levels, fetched) if data}
+            
+            return await asyncio.to_thread(self._analyze_level_data, symbol, levels, days, level_data)
+            
+        except Exception as e:
+            logger.error(f"❌ 多级别分析 {symbol} 失败: {e}")
+            import traceback
+            traceback.print_exc()
+            return self._generate_empty_multi_level_result(symbol, levels)
+    
+    def _analyze_level_data(self, symbol: str, levels: List[str], days: int,
+                            level_data: Dict[TimeLevel, List[Dict]]) -> Dict[str, Any]:
+        """对已获取的多级别数据执行分析并转换为前端格式"""
+        try:
             if not level_data:
                 logger.warning(f"⚠️ 无任何级别数据可用于 {symbol}")
                 return self._generate_empty_multi_level_result(symbol, levels)
             
             # 执行多级别分析
             results = self.chan_engine.analyze_multi_level(level_data, symbol)
+            for time_level, result in results.items():
+                record_engine_stages(result.stage_timings, time_level.value)
             
             # 转换为前端格式
-            frontend_data = self._convert_multi_level_to_frontend(results, symbol, levels, days)
+            with engine_stage_duration.time(stage="frontend_conversion", level="multi"):
+                frontend_data = self._convert_multi_level_to_frontend(results, symbol, levels, days)
             
             logger.info(f"✅ {symbol} 多级别分析完成，共{len(results)}个级别")
             return frontend_data
@@ -189,6 +338,234 @@ class ChanDataAPIv2:
             traceback.print_exc()
             return self._generate_empty_multi_level_result(symbol, levels)
     
+    def analyze_batch(self,
+                      symbols: List[str],
+                      timeframe: str = "daily",
+                      days: int = 90,
+                      include_payload: bool = False) -> Dict[str, Any]:
+        """
+        多股票批量分析：一次批量获取K线，多进程并行分析，返回紧凑结构摘要
+        
+        Args:
+            symbols: 股票代码列表（最多 BATCH_MAX_SYMBOLS 个）
+            timeframe: 时间级别 ("5min", "30min", "daily")
+            days: 分析天数
+            include_payload: 是否同时返回完整的前端数据（体积较大）
+            
+        Returns:
+            {"meta": {...}, "results": [{"symbol", "status", "summary", "payload"?, "error"?}, ...]}
+            单只股票失败只体现在对应条目的 status/error 中，不影响整批结果
+        """
+        started = time.perf_counter()
+        symbols = self._normalize_batch_symbols(symbols)
+        data_by_symbol = self._fetch_stock_data_bulk(symbols, self._get_time_level(timeframe), days)
+        return self._finish_batch(symbols, data_by_symbol, timeframe, days, include_payload, started)
+    
+    async def analyze_batch_async(self,
+                                  symbols: List[str],
+                                  timeframe: str = "daily",
+                                  days: int = 90,
+                                  include_payload: bool = False) -> Dict[str, Any]:
+        """
+        多股票批量分析（异步版本）：各分块查询在异步连接池上并发执行，分析在线程池中执行
+        参数与返回值同 analyze_batch
+        """
+        started = time.perf_counter()
+        symbols = self._normalize_batch_symbols(symbols)
+        data_by_symbol = await self._fetch_stock_data_bulk_async(symbols, self._get_time_level(timeframe), days)
+        return await asyncio.to_thread(self._finish_batch, symbols, data_by_symbol, timeframe, days,
+                                       include_payload, started)
+    
+    def _normalize_batch_symbols(self, symbols: List[str]) -> List[str]:
+        """去重、标准化股票代码并检查数量上限"""
+        symbols = list(dict.fromkeys(s.strip().upper() for s in symbols if s and s.strip()))
+        if len(symbols) > BATCH_MAX_SYMBOLS:
+            raise ValueError(f"单次最多分析 {BATCH_MAX_SYMBOLS} 只股票，当前 {len(symbols)} 只")
+        return symbols
+    
+    def _finish_batch(self, symbols: List[str], data_by_symbol: Dict[str, List[Dict]], timeframe: str,
+                      days: int, include_payload: bool, started: float) -> Dict[str, Any]:
+        """对已获取的批量数据执行分析并组装结果"""
+        fetched = time.perf_counter()
+        
+        entries: Dict[str, Dict[str, Any]] = {}
+        pending = []
+        for symbol in symbols:
+            if data_by_symbol.get(symbol):
+                pending.append(symbol)
+            else:
+                entries[symbol] = {"symbol": symbol, "status": "error", "error": "无可用K线数据"}
+        
+        for symbol, entry, stage_timings in self._run_batch_analysis(pending, data_by_symbol, timeframe, days, include_payload):
+            entries[symbol] = entry
+            record_engine_stages(stage_timings, timeframe)
+        
+        results = [entries[symbol] for symbol in symbols]
+        succeeded = sum(1 for entry in results if entry["status"] == "ok")
+        logger.info(f"✅ 批量分析完成: {succeeded}/{len(symbols)} 只成功, "
+                    f"取数 {(fetched - started) * 1000:.0f}ms, 总耗时 {(time.perf_counter() - started) * 1000:.0f}ms")
+        
+        return {
+            "meta": {
+                "timeframe": timeframe,
+                "days": days,
+                "requested": len(symbols),
+                "succeeded": succeeded,
+                "failed": len(symbols) - succeeded,
+                "fetch_ms": round((fetched - started) * 1000, 1),
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+                "generated_at": datetime.now().isoformat()
+            },
+            "results": results
+        }
+    
+    def _run_batch_analysis(self, symbols: List[str], data_by_symbol: Dict[str, List[Dict]],
+                            timeframe: str, days: int, include_payload: bool):
+        """在进程池中分析，逐个产出 (symbol, entry, stage_timings)；进程池不可用时退回当前进程"""
+        futures = None
+        if len(symbols) > 1 and BATCH_WORKERS > 1:
+            # 空闲期间子进程退出的进程池在提交时即报错，关闭后重建一次
+            for _ in range(2):
+                pool = self._get_batch_pool()
+                if pool is None:
+                    break
+                try:
+                    futures = {
+                        pool.submit(_analyze_batch_item, symbol, data_by_symbol[symbol], timeframe, days,
+                                    include_payload): symbol
+                        for symbol in symbols
+                    }
+                    break
+                except BrokenProcessPool:
+                    self._discard_batch_pool(pool)
+        
+        if futures is None:
+            for symbol in symbols:
+                yield (symbol, *self.analyze_loaded(symbol, data_by_symbol[symbol], timeframe, days, include_payload))
+            return
+        
+        for future in as_completed(futures):
+            symbol = futures[future]
+            try:
+                entry, stage_timings = future.result()
+            except BrokenProcessPool as e:
+                self._discard_batch_pool(pool)
+                entry, stage_timings = {"symbol": symbol, "status": "error", "error": f"分析进程异常退出: {e}"}, {}
+            except Exception as e:
+                entry, stage_timings = {"symbol": symbol, "status": "error", "error": str(e)}, {}
+            yield symbol, entry, stage_timings
+    
+    def _get_batch_pool(self) -> Optional[ProcessPoolExecutor]:
+        """批量分析进程池（首次使用时创建），无法创建时返回None"""
+        if self._batch_pool is None:
+            try:
+                # API进程是多线程的（uvicorn线程池），fork 可能复制持有中的锁，改用 spawn 启动子进程
+                self._batch_pool = ProcessPoolExecutor(max_workers=BATCH_WORKERS,
+                                                       mp_context=multiprocessing.get_context('spawn'))
+            except (OSError, NotImplementedError) as e:
+                logger.warning(f"⚠️ 无法创建批量分析进程池，改为单进程分析: {e}")
+        return self._batch_pool
+    
+    def _discard_batch_pool(self, pool: ProcessPoolExecutor):
+        """关闭已损坏的进程池并回收其子进程，下一次批量分析时重新创建"""
+        if self._batch_pool is pool:
+            self._batch_pool = None
+            logger.warning("⚠️ 批量分析进程池已损坏，关闭后将重新创建")
+            pool.shutdown(wait=False, cancel_futures=True)
+    
+    def analyze_loaded(self, symbol: str, data: List[Dict], timeframe: str, days: int,
+                       include_payload: bool = False) -> Tuple[Dict[str, Any], Dict[str, float]]:
+        """
+        分析已获取的K线数据
+        
+        Returns:
+            (结果条目, 引擎各阶段耗时)
+        """
+        try:
+            result = self.chan_engine.analyze(
+                data=data,
+                symbol=symbol,
+                time_level=self._get_time_level(timeframe),
+                analysis_level=AnalysisLevel.COMPLETE if include_payload else AnalysisLevel.STANDARD
+            )
+            entry = {"symbol": symbol, "status": "ok", "summary": self._build_structure_summary(result)}
+            if include_payload:
+                entry["payload"] = self._convert_to_frontend_format(result, timeframe, days)
+            return entry, result.stage_timings
+        except Exception as e:
+            return {"symbol": symbol, "status": "error", "error": str(e)}, {}
+    
+    def _build_structure_summary(self, result: ChanAnalysisResult) -> Dict[str, Any]:
+        """
+        紧凑结构摘要：最新笔/线段方向、最近中枢边界、最新买卖点与背驰
+        时间统一为 '%Y-%m-%d %H:%M' 字符串，与前端图表数据一致
+        """
+        def fmt(ts: datetime) -> str:
+            return ts.strftime('%Y-%m-%d %H:%M')
+        
+        def line_summary(line) -> Dict[str, Any]:
+            return {
+                "direction": line.direction.value,
+                "start_time": fmt(line.start_time),
+                "start_price": float(line.start_price),
+                "end_time": fmt(line.end_time),
+                "end_price": float(line.end_price)
+            }
+        
+        last_kline = result.klines[-1]
+        last_close = float(last_kline.close)
+        summary: Dict[str, Any] = {
+            "bar_count": len(result.klines),
+            "last_time": fmt(last_kline.timestamp),
+            "last_close": last_close,
+            "latest_bi": line_summary(result.bis[-1]) if len(result.bis) else None,
+            "latest_seg": line_summary(result.segs[-1]) if len(result.segs) else None,
+            "zhongshu": None,
+            "latest_buy_sell_points": [],
+            "latest_backchi": None
+        }
+        
+        if len(result.zhongshus):
+            zs = result.zhongshus[-1]
+            forming = list(zs.forming_segs or [])
+            if last_close > zs.high:
+                position = "above"
+            elif last_close < zs.low:
+                position = "below"
+            else:
+                position = "inside"
+            summary["zhongshu"] = {
+                "zg": float(zs.high),
+                "zd": float(zs.low),
+                "gg": float(max(seg.high_price for seg in forming)) if forming else float(zs.high),
+                "dd": float(min(seg.low_price for seg in forming)) if forming else float(zs.low),
+                "start_time": fmt(zs.start_time),
+                "end_time": fmt(zs.end_time),
+                "is_active": zs.is_active,
+                "position": position
+            }
+        
+        for point in sorted(result.buy_sell_points, key=lambda p: p.timestamp)[-3:]:
+            summary["latest_buy_sell_points"].append({
+                "type": point.point_type.value,
+                "side": "buy" if point.point_type.is_buy() else "sell",
+                "time": fmt(point.timestamp),
+                "price": float(point.price),
+                "reliability": float(point.reliability)
+            })
+        
+        valid_backchi = [b for b in result.backchi_analyses if b.is_valid_backchi()]
+        if valid_backchi:
+            backchi = max(valid_backchi, key=lambda b: b.current_seg.end_time)
+            summary["latest_backchi"] = {
+                "type": backchi.backchi_type.value,
+                "time": fmt(backchi.current_seg.end_time),
+                "price": float(backchi.current_seg.end_price),
+                "reliability": float(backchi.reliability)
+            }
+        
+        return summary
+    
     def get_trading_signals(self, symbol: str, timeframe: str = "daily", days: int = 30) -> Dict[str, Any]:
         """
         获取交易信号
@@ -234,19 +611,6 @@ class ChanDataAPIv2:
     def _fetch_stock_data(self, symbol: str, time_level: TimeLevel, days: int) -> List[Dict]:
         """获取股票数据"""
         try:
-            # 根据时间级别选择集合
-            collection_mapping = {
-                TimeLevel.MIN_5: "stock_kline_5min",
-                TimeLevel.MIN_30: "stock_kline_30min", 
-                TimeLevel.DAILY: "stock_kline_daily"
-            }
-            
-            collection_name = collection_mapping.get(time_level, "stock_kline_daily")
-            collection = self.db[collection_name]
-            
-            # 构建查询
-            query = {"ts_code": symbol}
-            
             # 计算数据量（根据级别调整）
             if time_level == TimeLevel.MIN_5:
                 limit = days * 48  # 5分钟: 每天约48个数据点
@@ -255,70 +619,13 @@ class ChanDataAPIv2:
             else:
                 limit = days       # 日线: 每天1个数据点
             
-            # 获取数据
+            # 获取数据（KLINE_SOURCE=mirror 时优先读取本地列式镜像，按时间升序返回）
             if time_level == TimeLevel.DAILY:
-                # 使用交易日历获取交易日范围
-                from datetime import datetime, timedelta
-                from chan_theory_v2.core import get_trading_dates, get_nearest_trading_date
-                
-                # 获取当前日期的最近交易日作为结束日期
-                end_date = get_nearest_trading_date(datetime.now(), direction='backward')
-                if not end_date:
-                    end_date = datetime.now()
-                    
-                # 获取指定天数范围内的所有交易日
-                trading_dates = get_trading_dates(end_date - timedelta(days=days*2), end_date)
-                
-                # 如果交易日数量不足，则扩大范围再次查询
-                if len(trading_dates) < days:
-                    trading_dates = get_trading_dates(end_date - timedelta(days=days*3), end_date)
-                
-                # 取最近的days个交易日
-                trading_dates = trading_dates[-days:] if len(trading_dates) >= days else trading_dates
-                
-                if trading_dates:
-                    # 设置查询的起止日期
-                    start_date = trading_dates[0]
-                    # 将日期转换为字符串格式，与数据库中的格式匹配
-                    end_date_str = end_date.strftime('%Y%m%d')
-                    start_date_str = start_date.strftime('%Y%m%d')
-                    
-                    # 确保使用字符串格式的日期进行查询，与数据库中的格式匹配
-                    query.update({
-                        'trade_date': {
-                            '$gte': start_date_str,
-                            '$lte': end_date_str
-                        }
-                    })
-                    
-                    logger.info(f"📅 日K查询范围: {start_date_str} 至 {end_date_str} (交易日总数: {len(trading_dates)})")                
-                else:
-                    # 如果无法获取交易日，则使用自然日作为备选
-                    end_date = datetime.now()
-                    start_date = end_date - timedelta(days=days)
-                    
-                    # 将日期转换为字符串格式
-                    end_date_str = end_date.strftime('%Y%m%d')
-                    start_date_str = start_date.strftime('%Y%m%d')
-                    
-                    query.update({
-                        'trade_date': {
-                            '$gte': start_date_str,
-                            '$lte': end_date_str
-                        }
-                    })
-                    
-                    logger.info(f"📅 日K查询范围(自然日): {start_date_str} 至 {end_date_str}")
-                
-                # 按日期升序排序，获取指定日期范围内的数据
-                cursor = collection.find(query).sort("trade_date", 1)
+                start_date_str, end_date_str = self._daily_date_range(days)
+                raw_data = find_klines("daily", symbol, start=start_date_str, end=end_date_str,
+                                       db_handler=self.db_handler)
             else:
-                cursor = collection.find(query).sort("trade_time", -1).limit(limit)
-                
-            raw_data = list(cursor)
-            
-            if time_level != TimeLevel.DAILY:
-                raw_data.reverse()  # 分钟数据转为升序
+                raw_data = find_klines(time_level.value, symbol, last_n=limit, db_handler=self.db_handler)
             
             # 转换数据格式
             converted_data = self._convert_data_format(raw_data, time_level)
@@ -337,19 +644,196 @@ class ChanDataAPIv2:
             logger.error(f"❌ 获取数据失败: {e}")
             return []
     
+    def _fetch_stock_data_bulk(self, symbols: List[str], time_level: TimeLevel, days: int) -> Dict[str, List[Dict]]:
+        """
+        批量获取多只股票的K线数据（按 $in 分块查询，替代逐只查询）
+        每只股票的K线与 _fetch_stock_data 完全相同，时间窗口见 _bulk_fetch_window
+        
+        Returns:
+            {symbol: 与 _fetch_stock_data 相同格式的K线列表}
+        """
+        data_by_symbol: Dict[str, List[Dict]] = {}
+        if use_mirror():
+            # 镜像按股票分目录存储，逐只读取列式文件即可（过期的股票在 find_klines 内回退MongoDB）
+            for symbol in symbols:
+                data = self._fetch_stock_data(symbol, time_level, days)
+                if data:
+                    data_by_symbol[symbol] = data
+            logger.info(f"📊 批量获取 {time_level.value} 数据(镜像): {len(data_by_symbol)}/{len(symbols)} 只股票")
+            return data_by_symbol
+        
+        collection_name, start, end, limit = self._bulk_fetch_window(time_level, days)
+        collection = self.db[collection_name]
+        # 迁移完成后按原生 trade_dt 字段过滤与排序
+        sort_field, time_filter = time_range_query(self.db, collection_name, start, end)
+        projection = self._bulk_projection(time_level)
+        chunk_size = BATCH_FETCH_CHUNK.get(time_level.value, 50)
+        
+        short: List[str] = []
+        for i in range(0, len(symbols), chunk_size):
+            chunk = symbols[i:i + chunk_size]
+            try:
+                cursor = collection.find(
+                    {"ts_code": {"$in": chunk}, sort_field: time_filter},
+                    projection
+                ).sort([("ts_code", 1), (sort_field, 1)])
+                raw_by_symbol: Dict[str, List[Dict]] = {}
+                for doc in cursor:
+                    raw_by_symbol.setdefault(doc["ts_code"], []).append(doc)
+            except Exception as e:
+                logger.error(f"❌ 批量获取数据失败 ({len(chunk)} 只): {e}")
+                continue
+            
+            for symbol in chunk:
+                raw_data = raw_by_symbol.get(symbol, [])
+                if limit is not None and len(raw_data) < limit:
+                    short.append(symbol)
+                elif raw_data:
+                    data_by_symbol[symbol] = self._convert_data_format(raw_data[-limit:] if limit else raw_data,
+                                                                       time_level)
+        
+        # 窗口内不足 limit 根的股票（停牌、数据稀疏）逐只按 last_n 补查
+        for symbol in short:
+            data = self._fetch_stock_data(symbol, time_level, days)
+            if data:
+                data_by_symbol[symbol] = data
+        
+        logger.info(f"📊 批量获取 {time_level.value} 数据: {len(data_by_symbol)}/{len(symbols)} 只股票"
+                    f"{f'（{len(short)} 只逐只补查）' if short else ''}")
+        return data_by_symbol
+    
+    async def _fetch_stock_data_async(self, symbol: str, time_level: TimeLevel, days: int) -> List[Dict]:
+        """获取股票数据（异步版本，结果与 _fetch_stock_data 相同）"""
+        if use_mirror():
+            # 本地镜像读取不经过MongoDB，放到线程中执行
+            return await asyncio.to_thread(self._fetch_stock_data, symbol, time_level, days)
+        try:
+            adb = get_async_db_handler()
+            if time_level == TimeLevel.DAILY:
+                start_date_str, end_date_str = await asyncio.to_thread(self._daily_date_range, days)
+                raw_data = await adb.find_klines("daily", symbol, start=start_date_str, end=end_date_str)
+            else:
+                bars_per_day = 48 if time_level == TimeLevel.MIN_5 else 8
+                raw_data = await adb.find_klines(time_level.value, symbol, last_n=days * bars_per_day)
+            
+            converted_data = self._convert_data_format(raw_data, time_level)
+            logger.info(f"📊 获取 {symbol} {time_level.value} 数据: {len(converted_data)} 条")
+            return converted_data
+        except Exception as e:
+            logger.error(f"❌ 获取数据失败: {e}")
+            return []
+    
+    async def _fetch_stock_data_bulk_async(self, symbols: List[str], time_level: TimeLevel,
+                                           days: int) -> Dict[str, List[Dict]]:
+        """批量获取多只股票的K线数据（异步版本：各 $in 分块并发查询，结果与 _fetch_stock_data_bulk 相同）"""
+        if use_mirror():
+            return await asyncio.to_thread(self._fetch_stock_data_bulk, symbols, time_level, days)
+        
+        collection_name, start, end, limit = await asyncio.to_thread(self._bulk_fetch_window, time_level, days)
+        try:
+            raw_by_symbol = await get_async_db_handler().find_klines_bulk(
+                time_level.value, symbols, start=start, end=end,
+                chunk_size=BATCH_FETCH_CHUNK.get(time_level.value, 50),
+                projection=self._bulk_projection(time_level)
+            )
+        except Exception as e:
+            logger.error(f"❌ 批量获取数据失败 ({len(symbols)} 只): {e}")
+            return {}
+        
+        data_by_symbol: Dict[str, List[Dict]] = {}
+        short: List[str] = []
+        for symbol in symbols:
+            raw_data = raw_by_symbol.get(symbol, [])
+            if limit is not None and len(raw_data) < limit:
+                short.append(symbol)
+            elif raw_data:
+                data_by_symbol[symbol] = self._convert_data_format(raw_data[-limit:] if limit else raw_data,
+                                                                   time_level)
+        
+        # 窗口内不足 limit 根的股票逐只按 last_n 并发补查（同 _fetch_stock_data_bulk）
+        refetched = await asyncio.gather(*(self._fetch_stock_data_async(symbol, time_level, days) for symbol in short))
+        for symbol, data in zip(short, refetched):
+            if data:
+                data_by_symbol[symbol] = data
+        
+        logger.info(f"📊 批量获取 {time_level.value} 数据(异步): {len(data_by_symbol)}/{len(symbols)} 只股票"
+                    f"{f'（{len(short)} 只逐只补查）' if short else ''}")
+        return data_by_symbol
+    
+    def _bulk_fetch_window(self, time_level: TimeLevel, days: int) -> Tuple[str, str, Optional[str], Optional[int]]:
+        """
+        批量取数的集合与时间窗口
+        日线与单只查询使用同一日期区间，不截取；分钟级别单只查询取最近 days*每日K线数 根（last_n），
+        批量时先按最近days个交易日的窗口查询，窗口内K线数不少于 limit 的股票截取最后 limit 根即与 last_n 相同，
+        不足的股票（停牌、数据稀疏）由调用方逐只按 last_n 补查
+        
+        Returns:
+            (集合名, 起始时间, 结束时间, 每只股票保留的K线数；日线为None)
+        """
+        collection_mapping = {
+            TimeLevel.MIN_5: ("stock_kline_5min", 48),
+            TimeLevel.MIN_30: ("stock_kline_30min", 8),
+            TimeLevel.DAILY: ("stock_kline_daily", 1)
+        }
+        collection_name, bars_per_day = collection_mapping.get(time_level, collection_mapping[TimeLevel.DAILY])
+        
+        start_date_str, end_date_str = self._daily_date_range(days)
+        if time_level == TimeLevel.DAILY:
+            start, end = start_date_str, end_date_str
+        else:
+            start, end = datetime.strptime(start_date_str, '%Y%m%d').strftime('%Y-%m-%d 00:00:00'), None
+            return collection_name, start, end, days * bars_per_day
+        return collection_name, start, end, None
+    
+    def _bulk_projection(self, time_level: TimeLevel) -> Dict[str, int]:
+        """批量取数只返回分析需要的字段"""
+        time_field = "trade_date" if time_level == TimeLevel.DAILY else "trade_time"
+        return {"_id": 0, "ts_code": 1, time_field: 1, NATIVE_TIME_FIELD: 1, "open": 1, "high": 1, "low": 1,
+                "close": 1, "vol": 1, "volume": 1, "amount": 1}
+    
+    def _daily_date_range(self, days: int) -> Tuple[str, str]:
+        """
+        最近days个交易日的起止日期（YYYYMMDD，与数据库中的格式匹配）
+        交易日历不可用时退回到自然日
+        """
+        from chan_theory_v2.core import get_trading_dates, get_nearest_trading_date
+        
+        # 获取当前日期的最近交易日作为结束日期
+        end_date = get_nearest_trading_date(datetime.now(), direction='backward')
+        if not end_date:
+            end_date = datetime.now()
+            
+        # 获取指定天数范围内的所有交易日
+        trading_dates = get_trading_dates(end_date - timedelta(days=days*2), end_date)
+        
+        # 如果交易日数量不足，则扩大范围再次查询
+        if len(trading_dates) < days:
+            trading_dates = get_trading_dates(end_date - timedelta(days=days*3), end_date)
+        
+        # 取最近的days个交易日
+        trading_dates = trading_dates[-days:] if len(trading_dates) >= days else trading_dates
+        
+        if trading_dates:
+            start_date_str = trading_dates[0].strftime('%Y%m%d')
+            end_date_str = end_date.strftime('%Y%m%d')
+            logger.info(f"📅 日K查询范围: {start_date_str} 至 {end_date_str} (交易日总数: {len(trading_dates)})")
+        else:
+            # 如果无法获取交易日，则使用自然日作为备选
+            end_date = datetime.now()
+            start_date_str = (end_date - timedelta(days=days)).strftime('%Y%m%d')
+            end_date_str = end_date.strftime('%Y%m%d')
+            logger.info(f"📅 日K查询范围(自然日): {start_date_str} 至 {end_date_str}")
+        
+        return start_date_str, end_date_str
+    
     def _convert_data_format(self, raw_data: List[Dict], time_level: TimeLevel) -> List[Dict]:
         """转换数据格式"""
         converted_data = []
         
         for item in raw_data:
             try:
-                # 处理时间戳
-                if time_level == TimeLevel.DAILY:
-                    trade_date_str = str(item['trade_date'])
-                    timestamp = datetime.strptime(trade_date_str, '%Y%m%d')
-                else:
-                    trade_time_str = str(item['trade_time'])
-                    timestamp = datetime.strptime(trade_time_str, '%Y-%m-%d %H:%M:%S')
+                # 处理时间戳（优先使用原生 trade_dt 字段）
+                timestamp = parse_kline_time(item, 'trade_date' if time_level == TimeLevel.DAILY else 'trade_time')
                 
                 converted_item = {
                     'timestamp': timestamp,
@@ -1579,8 +2063,18 @@ class ChanDataAPIv2:
             }
 
 
-# 创建全局API实例
-chan_api_v2 = ChanDataAPIv2()
+# 批量分析工作进程内的API实例（构造不连接数据库，见 ChanDataAPIv2.__init__）
+_worker_api: Optional[ChanDataAPIv2] = None
+
+
+def _analyze_batch_item(symbol: str, data: List[Dict], timeframe: str, days: int,
+                        include_payload: bool) -> Tuple[Dict[str, Any], Dict[str, float]]:
+    """进程池任务：分析单只股票"""
+    global _worker_api
+    if _worker_api is None:
+        _worker_api = ChanDataAPIv2()
+    return _worker_api.analyze_loaded(symbol, data, timeframe, days, include_payload)
+
 
 if __name__ == '__main__':
     # 命令行使用示例
@@ -1596,6 +2090,8 @@ if __name__ == '__main__':
     
     args = parser.parse_args()
     
+    chan_api_v2 = ChanDataAPIv2()
+    
     print(f"🔍 缠论v2分析 {args.symbol} ({args.timeframe}, {args.days}天, {args.level}级别)")
     
     if args.multi_level:
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+长周期K线的服务端降采样（LOD）
+1. K线按桶聚合，保持OHLC语义：开=首根开、收=末根收、高=最高、低=最低、量=求和
+2. 笔/线段/中枢端点所在K线各自起始一个桶，保证端点仍落在真实极值K线上；
+   分型/买卖点/背驰标记移到包含其极值K线的桶上（桶的高低点包含该极值），不额外占用点数
+3. MACD在同一组桶上使用LTTB（最大三角形面积）选点，保持形态并与K线横轴对齐
+4. 返回每个桶对应的原始K线下标范围，供前端放大时请求全分辨率数据
+"""
+
+import logging
+from bisect import bisect_right
+from typing import Dict, List, Any, Optional, Tuple
+
+from api.response_format import TimeAxis
+
+logger = logging.getLogger(__name__)
+
+Bucket = Tuple[int, int]  # [start, end) 原始K线下标区间
+
+
+def plan_buckets(length: int, max_points: int, anchors: List[int]) -> List[Bucket]:
+    """
+    规划降采样桶
+    锚点（笔/线段/中枢端点）各自起始一个桶，剩余预算按区间长度分配给锚点之间的K线；
+    预算不足以覆盖全部区间时，未分到桶的区间并入其前一个锚点的桶
+
+    Args:
+        length: 原始K线数量
+        max_points: 目标点数
+        anchors: 必须作为桶起点保留的K线下标
+
+    Returns:
+        按时间顺序排列的桶列表，桶数不超过 max_points + 锚点数
+    """
+    anchor_set = sorted({i for i in anchors if 0 <= i < length})
+
+    # 锚点之间的普通区间，(起点, 终点, 前一个锚点下标；首个锚点之前的区间为None)
+    gaps: List[Tuple[int, int, Optional[int]]] = []
+    previous, owner = 0, None
+    for anchor in anchor_set:
+        if anchor > previous:
+            gaps.append((previous, anchor, owner))
+        previous, owner = anchor + 1, anchor
+    if previous < length:
+        gaps.append((previous, length, owner))
+
+    counts = _allocate_gap_buckets([end - start for start, end, _ in gaps],
+                                   max(max_points - len(anchor_set), 0),
+                                   must_keep=[owner is None for _, _, owner in gaps])
+
+    anchor_end = {anchor: anchor + 1 for anchor in anchor_set}
+    buckets: List[Bucket] = []
+    for (start, end, owner), count in zip(gaps, counts):
+        if count == 0:
+            anchor_end[owner] = end
+            continue
+        size = end - start
+        for k in range(count):
+            buckets.append((start + size * k // count, start + size * (k + 1) // count))
+    buckets.extend(anchor_end.items())
+
+    buckets.sort()
+    return buckets
+
+
+def _allocate_gap_buckets(sizes: List[int], budget: int, must_keep: List[bool]) -> List[int]:
+    """
+    按区间长度把预算分配为各区间的桶数（最大余数法，单个区间不超过其K线数）
+    must_keep 的区间至少分到1个桶；预算足够时每个区间都至少1个桶
+    """
+    counts = [1 if keep else 0 for keep in must_keep]
+    if budget >= len(sizes):
+        counts = [1] * len(sizes)
+    remaining = budget - sum(counts)
+    capacity = [size - count for size, count in zip(sizes, counts)]
+    total = sum(capacity)
+    if remaining <= 0 or total <= 0:
+        return counts
+
+    remaining = min(remaining, total)
+    shares = [cap * remaining / total for cap in capacity]
+    extra = [int(share) for share in shares]
+    order = sorted(range(len(sizes)), key=lambda i: extra[i] - shares[i])
+    for i in order[:remaining - sum(extra)]:
+        extra[i] += 1
+    return [count + add for count, add in zip(counts, extra)]
+
+
+def aggregate_ohlc(values: List[List[float]], volumes: List[float],
+                   buckets: List[Bucket]) -> Tuple[List[List[float]], List[float]]:
+    """
+    按桶聚合K线
+
+    Args:
+        values: ECharts K线数据，每项为 [open, close, low, high]
+        volumes: 成交量
+        buckets: 桶列表
+
+    Returns:
+        (聚合后的K线, 聚合后的成交量)
+    """
+    out_values = []
+    out_volumes = []
+    for start, end in buckets:
+        window = values[start:end]
+        out_values.append([
+            window[0][0],
+            window[-1][1],
+            min(v[2] for v in window),
+            max(v[3] for v in window),
+        ])
+        out_volumes.append(sum(volumes[start:end]) if volumes else 0.0)
+    return out_values, out_volumes
+
+
+def lttb_select(series: List[float], buckets: List[Bucket]) -> List[int]:
+    """
+    在给定桶上执行LTTB（Largest-Triangle-Three-Buckets）选点
+    每个桶选出与上一个已选点、下一个桶均值构成三角形面积最大的点
+
+    Returns:
+        每个桶选中的原始下标
+    """
+    if not buckets:
+        return []
+
+    selected = [buckets[0][0]]
+    for b in range(1, len(buckets)):
+        start, end = buckets[b]
+        if end - start == 1:
+            selected.append(start)
+            continue
+
+        # 下一个桶的均值点（最后一个桶使用末点）
+        if b + 1 < len(buckets):
+            next_start, next_end = buckets[b + 1]
+            avg_x = (next_start + next_end - 1) / 2.0
+            avg_y = sum(series[next_start:next_end]) / (next_end - next_start)
+        else:
+            avg_x = float(end - 1)
+            avg_y = series[end - 1]
+
+        prev_x = selected[-1]
+        prev_y = series[prev_x]
+        best_index = start
+        best_area = -1.0
+        for i in range(start, end):
+            area = abs((prev_x - avg_x) * (series[i] - prev_y) - (prev_x - i) * (avg_y - prev_y))
+            if area > best_area:
+                best_area = area
+                best_index = i
+        selected.append(best_index)
+
+    return selected
+
+
+def _structure_anchors(chart_data: Dict[str, Any], axis: TimeAxis) -> List[int]:
+    """收集笔/线段/中枢端点对应的K线下标"""
+    anchors = []
+    structures = chart_data.get("chan_structures", {})
+    for name in ("bi", "seg", "zhongshu"):
+        for line in structures.get(name, []):
+            for timestamp, _ in line["coords"]:
+                anchors.append(axis.locate(timestamp))
+    return anchors
+
+
+def _snap_markers(chart_data: Dict[str, Any], axis: TimeAxis, buckets: List[Bucket],
+                  categories: List[str]) -> Dict[str, Any]:
+    """分型/买卖点/背驰标记移到包含其极值K线的桶上（桶的时间为桶内首根K线时间）"""
+    bucket_starts = [start for start, _ in buckets]
+
+    def snap(points: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        snapped = []
+        for point in points:
+            bucket_start = bucket_starts[bisect_right(bucket_starts, axis.locate(point["coord"][0])) - 1]
+            snapped.append({**point, "coord": [categories[bucket_start], *point["coord"][1:]]})
+        return snapped
+
+    structures = dict(chart_data.get("chan_structures", {}))
+    if "fenxing" in structures:
+        structures["fenxing"] = snap(structures["fenxing"])
+    dynamics = dict(chart_data.get("dynamics", {}))
+    for name in ("buy_sell_points", "backchi"):
+        if name in dynamics:
+            dynamics[name] = snap(dynamics[name])
+    return {**chart_data, "chan_structures": structures, "dynamics": dynamics}
+
+
+def apply_level_of_detail(frontend_data: Dict[str, Any], max_points: Optional[int]) -> Dict[str, Any]:
+    """
+    对分析结果执行降采样
+
+    Args:
+        frontend_data: analyze_symbol_complete 的返回结果（逐元素格式）
+        max_points: 目标K线点数，None或不超过原始数量时原样返回
+
+    Returns:
+        降采样后的结果，新增顶层 "lod" 字段记录桶与原始下标的映射
+    """
+    chart_data = frontend_data.get("chart_data", {})
+    kline = chart_data.get("kline", {})
+    categories = kline.get("categories", [])
+    length = len(categories)
+
+    if not max_points or max_points <= 0 or length <= max_points:
+        return frontend_data
+
+    axis = TimeAxis(categories)
+    buckets = plan_buckets(length, max_points, _structure_anchors(chart_data, axis))
+
+    values, volumes = aggregate_ohlc(kline.get("values", []), kline.get("volumes", []), buckets)
+    new_kline = {
+        "categories": [categories[start] for start, _ in buckets],
+        "values": values,
+        "volumes": volumes,
+    }
+
+    indicators = dict(chart_data.get("indicators", {}))
+    macd = indicators.get("macd")
+    if macd and all(len(macd.get(name, [])) == length for name in ("dif", "dea", "macd")):
+        indicators["macd"] = {
+            name: [macd[name][i] for i in lttb_select(macd[name], buckets)]
+            for name in ("dif", "dea", "macd")
+        }
+
+    downsampled = dict(frontend_data)
+    downsampled["chart_data"] = {**_snap_markers(chart_data, axis, buckets, categories),
+                                 "kline": new_kline, "indicators": indicators}
+    downsampled["lod"] = {
+        "max_points": max_points,
+        "original_count": length,
+        "point_count": len(buckets),
+        "bucket_start": [start for start, _ in buckets],
+        "bucket_end": [end for _, end in buckets],
+        "bucket_end_time": [categories[end - 1] for _, end in buckets],
+    }
+
+    logger.info(f"📉 K线降采样: {length} → {len(buckets)} 点 (max_points={max_points})")
+    return downsampled
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+最新结构物化表
+每只股票、每个级别一条记录（MongoDB集合 analysis_latest_structure），字段打平并建索引，
+用于跨市场筛选（如“处于30分钟中枢内且刚出现二买”），筛选时无需重新运行引擎
+
+写入方：
+    daily_structure_precompute.py  收盘后全市场刷新
+    api/live_push.py               实时推送流每根K线收盘后增量更新
+
+盘中只有存在实时推送订阅的(股票, 级别)会随新K线增量更新；K线由外部程序写入MongoDB，
+本仓库没有可挂接的入库流程，其余股票的记录为上一次收盘后预计算的结果（见 updated_at）
+"""
+
+import logging
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+LATEST_STRUCTURE_COLLECTION = "analysis_latest_structure"
+
+# 可筛选/排序的字段
+SORTABLE_FIELDS = {
+    "ts_code", "last_time", "last_close", "zs_distance", "zs_height",
+    "bsp_time", "bsp_reliability", "backchi_time", "backchi_reliability", "updated_at"
+}
+MAX_SCREEN_LIMIT = 1000
+
+
+def flatten_summary(symbol: str, level: str, summary: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    把 ChanDataAPIv2._build_structure_summary 的结果打平为物化表记录
+
+    zs_distance: 最新收盘价相对中枢的距离（中枢内为0，上方为相对ZG的涨幅，下方为相对ZD的跌幅，负数）
+    """
+    latest_bi = summary.get("latest_bi") or {}
+    latest_seg = summary.get("latest_seg") or {}
+    zhongshu = summary.get("zhongshu") or {}
+    points = summary.get("latest_buy_sell_points") or []
+    latest_point = points[-1] if points else {}
+    backchi = summary.get("latest_backchi") or {}
+    last_close = summary.get("last_close")
+
+    doc = {
+        "ts_code": symbol,
+        "level": level,
+        "last_time": summary.get("last_time"),
+        "last_close": last_close,
+        "bar_count": summary.get("bar_count"),
+
+        "bi_direction": latest_bi.get("direction"),
+        "bi_end_time": latest_bi.get("end_time"),
+        "seg_direction": latest_seg.get("direction"),
+        "seg_end_time": latest_seg.get("end_time"),
+
+        "zg": zhongshu.get("zg"),
+        "zd": zhongshu.get("zd"),
+        "gg": zhongshu.get("gg"),
+        "dd": zhongshu.get("dd"),
+        "zs_active": zhongshu.get("is_active"),
+        "zs_position": zhongshu.get("position"),
+        "zs_height": None,
+        "zs_distance": None,
+
+        "bsp_type": latest_point.get("type"),
+        "bsp_side": latest_point.get("side"),
+        "bsp_time": latest_point.get("time"),
+        "bsp_price": latest_point.get("price"),
+        "bsp_reliability": latest_point.get("reliability"),
+        "recent_bsp_types": [point.get("type") for point in points],
+
+        "backchi_type": backchi.get("type"),
+        "backchi_time": backchi.get("time"),
+        "backchi_reliability": backchi.get("reliability"),
+        "has_top_backchi": backchi.get("type") == "top",
+        "has_bottom_backchi": backchi.get("type") == "bottom",
+
+        "updated_at": datetime.now()
+    }
+
+    zg, zd = doc["zg"], doc["zd"]
+    if zg and zd and last_close:
+        doc["zs_height"] = round((zg - zd) / zd, 6)
+        if last_close > zg:
+            doc["zs_distance"] = round((last_close - zg) / zg, 6)
+        elif last_close < zd:
+            doc["zs_distance"] = round((last_close - zd) / zd, 6)
+        else:
+            doc["zs_distance"] = 0.0
+    return doc
+
+
+class LatestStructureStore:
+    """最新结构物化表读写"""
+
+    def __init__(self, db):
+        self.collection = db[LATEST_STRUCTURE_COLLECTION]
+
+    def ensure_indexes(self):
+        """创建物化表索引（覆盖常用筛选组合）"""
+        self.collection.create_index([("ts_code", 1), ("level", 1)], unique=True, background=True)
+        # 默认筛选：只按级别过滤，按最新买卖点时间倒序
+        self.collection.create_index([("level", 1), ("bsp_time", -1), ("ts_code", 1)], background=True)
+        self.collection.create_index([("level", 1), ("zs_position", 1), ("bsp_type", 1), ("bsp_time", -1)], background=True)
+        self.collection.create_index([("level", 1), ("bsp_type", 1), ("bsp_time", -1)], background=True)
+        self.collection.create_index([("level", 1), ("backchi_type", 1), ("backchi_time", -1)], background=True)
+        self.collection.create_index([("level", 1), ("zs_distance", 1)], background=True)
+
+    def upsert(self, symbol: str, level: str, summary: Dict[str, Any]):
+        """更新单只股票的最新结构"""
+        self.collection.replace_one(
+            {"ts_code": symbol, "level": level},
+            flatten_summary(symbol, level, summary),
+            upsert=True
+        )
+
+    def upsert_many(self, level: str, summaries: Dict[str, Dict[str, Any]]) -> int:
+        """批量更新，返回写入条数"""
+        if not summaries:
+            return 0
+        from pymongo import ReplaceOne
+
+        operations = [
+            ReplaceOne({"ts_code": symbol, "level": level}, flatten_summary(symbol, level, summary), upsert=True)
+            for symbol, summary in summaries.items()
+        ]
+        result = self.collection.bulk_write(operations, ordered=False)
+        return result.upserted_count + result.modified_count
+
+    def screen(self,
+               level: str,
+               zs_position: Optional[str] = None,
+               bsp_types: Optional[List[str]] = None,
+               bsp_side: Optional[str] = None,
+               bsp_since: Optional[str] = None,
+               backchi_type: Optional[str] = None,
+               bi_direction: Optional[str] = None,
+               seg_direction: Optional[str] = None,
+               min_distance: Optional[float] = None,
+               max_distance: Optional[float] = None,
+               sort: str = "-bsp_time",
+               limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        按结构条件筛选
+
+        Args:
+            level: 时间级别
+            zs_position: 相对最新中枢的位置 above / inside / below
+            bsp_types: 最新买卖点类型，如 ["2buy", "3buy"]
+            bsp_side: buy / sell
+            bsp_since: 最新买卖点不早于该时间（'%Y-%m-%d %H:%M'）
+            backchi_type: top / bottom
+            bi_direction, seg_direction: 最新笔/线段方向
+            min_distance, max_distance: zs_distance 范围
+            sort: 排序字段，前缀 '-' 表示降序
+            limit: 返回数量
+
+        Returns:
+            物化表记录列表
+        """
+        query: Dict[str, Any] = {"level": level}
+        if zs_position:
+            query["zs_position"] = zs_position
+        if bsp_types:
+            query["bsp_type"] = bsp_types[0] if len(bsp_types) == 1 else {"$in": bsp_types}
+        if bsp_side:
+            query["bsp_side"] = bsp_side
+        if bsp_since:
+            query["bsp_time"] = {"$gte": bsp_since}
+        if backchi_type:
+            query["backchi_type"] = backchi_type
+        if bi_direction:
+            query["bi_direction"] = bi_direction
+        if seg_direction:
+            query["seg_direction"] = seg_direction
+        if min_distance is not None or max_distance is not None:
+            distance: Dict[str, float] = {}
+            if min_distance is not None:
+                distance["$gte"] = min_distance
+            if max_distance is not None:
+                distance["$lte"] = max_distance
+            query["zs_distance"] = distance
+
+        field = sort.lstrip("-+")
+        if field not in SORTABLE_FIELDS:
+            raise ValueError(f"不支持的排序字段: {field}，可选: {', '.join(sorted(SORTABLE_FIELDS))}")
+        direction = -1 if sort.startswith("-") else 1
+
+        cursor = self.collection.find(query, {"_id": 0}).sort([(field, direction), ("ts_code", 1)])
+        return list(cursor.limit(max(1, min(limit, MAX_SCREEN_LIMIT))))
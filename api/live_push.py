@@ -0,0 +1,508 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+缠论结构实时推送
+通过WebSocket按订阅的股票和级别推送新K线、笔/线段/中枢端点变化以及新的买卖点/背驰信号
+
+设计要点：
+1. 每个(股票, 级别)只计算一次，与订阅者数量无关
+2. 推送消息只序列化一次，所有连接共享同一份文本
+3. 每个连接独立的发送队列，慢消费者丢弃旧消息，持续积压则断开
+4. K线来源通过BarFeed抽象，默认使用本地回放源（LocalBarFeed）作为实时行情替身
+"""
+
+import asyncio
+import json
+import logging
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Set, Tuple, Callable, Awaitable
+
+from chan_theory_v2.core.chan_engine import ChanEngine, AnalysisLevel
+from api.metrics import record_engine_stages
+
+logger = logging.getLogger(__name__)
+
+StreamKey = Tuple[str, str]  # (symbol, level)
+BarCallback = Callable[[str, str, Dict[str, Any]], Awaitable[None]]
+
+
+class BarFeed(ABC):
+    """K线行情源接口"""
+
+    @abstractmethod
+    async def start(self, on_bar: BarCallback) -> None:
+        """启动行情源，每根K线收盘时回调 on_bar(symbol, level, bar)"""
+        pass
+
+    @abstractmethod
+    async def stop(self) -> None:
+        """停止行情源"""
+        pass
+
+    @abstractmethod
+    async def watch(self, symbol: str, level: str) -> List[Dict[str, Any]]:
+        """开始关注某个股票级别，返回用于初始化分析窗口的历史K线"""
+        pass
+
+    @abstractmethod
+    def unwatch(self, symbol: str, level: str) -> None:
+        """取消关注"""
+        pass
+
+
+class LocalBarFeed(BarFeed):
+    """
+    本地K线回放源（实时行情替身）
+    关注时从数据库读取历史K线，前段作为初始窗口，后段按固定间隔逐根“收盘”推送；
+    也可以通过 push_bar 手动注入K线，便于测试和联调
+    """
+
+    def __init__(self, chan_api=None, history_days: int = 30,
+                 replay_bars: int = 20, interval: float = 1.0):
+        """
+        Args:
+            chan_api: ChanDataAPIv2实例，用于读取历史数据（为None时只支持手动注入）
+            history_days: 读取历史数据的天数
+            replay_bars: 留作回放的尾部K线数量
+            interval: 回放间隔（秒）
+        """
+        self.chan_api = chan_api
+        self.history_days = history_days
+        self.replay_bars = replay_bars
+        self.interval = interval
+
+        self._pending: Dict[StreamKey, List[Dict[str, Any]]] = {}
+        self._on_bar: Optional[BarCallback] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, on_bar: BarCallback) -> None:
+        self._on_bar = on_bar
+        if self._task is None:
+            self._task = asyncio.create_task(self._replay_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def watch(self, symbol: str, level: str) -> List[Dict[str, Any]]:
+        history: List[Dict[str, Any]] = []
+        if self.chan_api is not None:
+            loop = asyncio.get_running_loop()
+            time_level = self.chan_api._get_time_level(level)
+            history = await loop.run_in_executor(
+                None, self.chan_api._fetch_stock_data, symbol, time_level, self.history_days
+            )
+
+        split = max(len(history) - self.replay_bars, 0)
+        self._pending[(symbol, level)] = list(history[split:])
+        return list(history[:split])
+
+    def unwatch(self, symbol: str, level: str) -> None:
+        self._pending.pop((symbol, level), None)
+
+    async def push_bar(self, symbol: str, level: str, bar: Dict[str, Any]) -> None:
+        """手动注入一根已收盘的K线"""
+        if self._on_bar is not None:
+            await self._on_bar(symbol, level, bar)
+
+    async def _replay_loop(self) -> None:
+        """按间隔为每个关注的股票级别推送一根K线"""
+        while True:
+            await asyncio.sleep(self.interval)
+            for key in list(self._pending.keys()):
+                bars = self._pending.get(key)
+                if not bars:
+                    continue
+                bar = bars.pop(0)
+                try:
+                    await self._on_bar(key[0], key[1], bar)
+                except Exception as e:
+                    logger.error(f"❌ 回放K线失败 {key}: {e}")
+
+
+class LiveConnection:
+    """单个WebSocket连接：独立发送队列 + 慢消费者处理"""
+
+    def __init__(self, websocket, queue_size: int = 64, max_dropped: int = 256):
+        """
+        Args:
+            websocket: Starlette/FastAPI WebSocket对象
+            queue_size: 发送队列长度
+            max_dropped: 累计丢弃消息数超过该值时断开连接
+        """
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.max_dropped = max_dropped
+        self.dropped = 0
+        self.closed = False
+        self.subscriptions: Set[StreamKey] = set()
+
+    def offer(self, text: str) -> bool:
+        """
+        非阻塞投递消息；队列满时丢弃最旧的一条
+
+        Returns:
+            连接是否仍然健康
+        """
+        if self.closed:
+            return False
+        if self.queue.full():
+            try:
+                self.queue.get_nowait()
+                self.dropped += 1
+            except asyncio.QueueEmpty:
+                pass
+        self.queue.put_nowait(text)
+
+        if self.dropped > self.max_dropped:
+            logger.warning(f"⚠️ 慢消费者累计丢弃 {self.dropped} 条消息，断开连接")
+            self.closed = True
+            return False
+        return True
+
+    async def writer(self) -> None:
+        """发送循环；发送失败时标记连接关闭并结束（由 handle_connection 负责退订和清理）"""
+        while not self.closed:
+            text = await self.queue.get()
+            try:
+                await self.websocket.send_text(text)
+            except Exception as e:
+                logger.warning(f"⚠️ WebSocket发送失败，关闭连接: {e}")
+                self.closed = True
+                try:
+                    await self.websocket.close(code=1011)
+                except Exception:
+                    pass
+
+
+class SymbolStream:
+    """单个(股票, 级别)的分析流：维护K线窗口、上次推送的结构快照和订阅者"""
+
+    def __init__(self, symbol: str, level: str, chan_api, max_bars: int = 2000):
+        self.symbol = symbol
+        self.level = level
+        self.chan_api = chan_api
+        self.time_level = chan_api._get_time_level(level)
+        self.max_bars = max_bars
+
+        # 每个流独立的引擎，避免线程池并发共享内部缓存
+        self.engine = ChanEngine()
+        self.bars: List[Dict[str, Any]] = []
+        self.subscribers: Set[LiveConnection] = set()
+        self.lock = asyncio.Lock()
+
+        self._structures: Dict[str, List[Dict[str, Any]]] = {"bi": [], "seg": [], "zhongshu": []}
+        self._signal_keys: Set[str] = set()
+        self.seeded = False
+
+    def seed(self, bars: List[Dict[str, Any]]) -> None:
+        """使用历史K线初始化窗口（不推送）"""
+        self.bars = list(bars[-self.max_bars:])
+        if len(self.bars) >= 10:
+            self._diff(self._analyze())
+        self.seeded = True
+
+    def on_bar_closed(self, bar: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        追加一根收盘K线并重新计算结构（在线程池中执行）
+
+        Returns:
+            需要推送的增量消息
+        """
+        if self.bars and bar['timestamp'] < self.bars[-1]['timestamp']:
+            # 迟到的旧K线直接忽略
+            return None
+        if self.bars and bar['timestamp'] == self.bars[-1]['timestamp']:
+            # 同一根K线的更新，替换最后一根
+            self.bars[-1] = bar
+        else:
+            self.bars.append(bar)
+            if len(self.bars) > self.max_bars:
+                del self.bars[:len(self.bars) - self.max_bars]
+
+        message = {
+            "type": "update",
+            "symbol": self.symbol,
+            "level": self.level,
+            "timestamp": datetime.now().isoformat(),
+            "bar": self._convert_bar(bar),
+        }
+
+        if len(self.bars) >= 10:
+            message.update(self._diff(self._analyze()))
+        return message
+
+    def _analyze(self) -> Dict[str, List[Dict[str, Any]]]:
+        """对当前窗口执行缠论分析并转换为前端格式"""
+        result = self.engine.analyze(
+            data=self.bars,
+            symbol=self.symbol,
+            time_level=self.time_level,
+            analysis_level=AnalysisLevel.STANDARD
+        )
+        record_engine_stages(result.stage_timings, self.time_level.value)
+        api = self.chan_api
+        self._update_latest_structure(result)
+        return {
+            "bi": api._convert_bis_to_echarts(result.bis),
+            "seg": api._convert_segs_to_echarts(result.segs),
+            "zhongshu": api._convert_zhongshus_to_echarts(result.zhongshus),
+            "buy_sell_points": api._convert_buy_sell_points_to_echarts(result.buy_sell_points),
+            "backchi": api._convert_backchi_to_echarts(result.backchi_analyses),
+        }
+
+    def _update_latest_structure(self, result) -> None:
+        """增量更新最新结构物化表（失败不影响推送）"""
+        try:
+            summary = self.chan_api._build_structure_summary(result)
+            self.chan_api.latest_structure.upsert(self.symbol, self.level, summary)
+        except Exception as e:
+            logger.warning(f"⚠️ 更新 {self.symbol} {self.level} 最新结构失败: {e}")
+
+    def _diff(self, current: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
+        """计算与上次推送快照的差异"""
+        changes: Dict[str, Any] = {}
+
+        for name in ("bi", "seg", "zhongshu"):
+            tail = _diff_tail(self._structures[name], current[name])
+            if tail is not None:
+                changes[name] = tail
+            self._structures[name] = current[name]
+
+        new_signals = []
+        signal_keys = set()
+        for kind in ("buy_sell_points", "backchi"):
+            for item in current[kind]:
+                key = f"{kind}|{item.get('name')}|{item.get('coord')}"
+                signal_keys.add(key)
+                if key not in self._signal_keys:
+                    new_signals.append({"kind": kind, **item})
+        self._signal_keys = signal_keys
+        if new_signals:
+            changes["signals"] = new_signals
+
+        return changes
+
+    def _convert_bar(self, bar: Dict[str, Any]) -> Dict[str, Any]:
+        """转换单根K线为ECharts格式"""
+        timestamp = bar['timestamp']
+        return {
+            "time": timestamp.strftime('%Y-%m-%d %H:%M') if hasattr(timestamp, 'strftime') else str(timestamp),
+            "value": [float(bar['open']), float(bar['close']), float(bar['low']), float(bar['high'])],
+            "volume": float(bar.get('volume', 0))
+        }
+
+
+def _diff_tail(previous: List[Dict[str, Any]], current: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    计算结构列表的尾部差异
+    结构只会在尾部发生变化（端点延伸、新增、被推翻），因此推送“从某个起点开始替换”的增量
+
+    Returns:
+        {"since": 起始时间, "items": 替换的结构列表}，无变化时返回None
+    """
+    def key(item):
+        return json.dumps(item.get("coords"), ensure_ascii=False)
+
+    previous_keys = [key(item) for item in previous]
+    current_keys = [key(item) for item in current]
+    if previous_keys == current_keys:
+        return None
+
+    # 窗口滑动会裁掉头部结构，先对齐到当前列表的第一个结构
+    offset = previous_keys.index(current_keys[0]) if current_keys and current_keys[0] in previous_keys else 0
+    common = 0
+    for old_key, new_key in zip(previous_keys[offset:], current_keys):
+        if old_key != new_key:
+            break
+        common += 1
+
+    if common < len(current):
+        since = current[common]["coords"][0][0]
+    elif offset + common < len(previous):
+        since = previous[offset + common]["coords"][0][0]
+    else:
+        return None
+
+    return {"since": since, "items": current[common:]}
+
+
+class LiveStructureHub:
+    """
+    实时结构推送中心
+    管理连接、订阅关系和分析流，负责扇出
+    """
+
+    def __init__(self, chan_api, feed: Optional[BarFeed] = None,
+                 max_workers: int = 4, queue_size: int = 64):
+        """
+        Args:
+            chan_api: ChanDataAPIv2实例（复用其数据获取与前端格式转换）
+            feed: K线行情源，默认使用本地回放源
+            max_workers: 分析线程数
+            queue_size: 每个连接的发送队列长度
+        """
+        self.chan_api = chan_api
+        self.feed = feed or LocalBarFeed(chan_api)
+        self.queue_size = queue_size
+        self.streams: Dict[StreamKey, SymbolStream] = {}
+        self.connections: Set[LiveConnection] = set()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="chan-live")
+        self._started = False
+
+    async def start(self) -> None:
+        """启动行情源"""
+        if not self._started:
+            await self.feed.start(self.on_bar)
+            self._started = True
+            logger.info("📡 实时结构推送已启动")
+
+    async def stop(self) -> None:
+        """停止行情源并关闭线程池"""
+        if self._started:
+            await self.feed.stop()
+            self._started = False
+        self._executor.shutdown(wait=False)
+
+    async def handle_connection(self, websocket) -> None:
+        """
+        处理一个WebSocket连接
+        客户端消息格式: {"action": "subscribe"|"unsubscribe", "symbols": [...], "levels": [...]}
+        """
+        await websocket.accept()
+        await self.start()
+
+        connection = LiveConnection(websocket, queue_size=self.queue_size)
+        self.connections.add(connection)
+        # 接收与发送任一结束（客户端断开或发送失败）即清理连接
+        reader = asyncio.create_task(self._read_messages(connection))
+        writer = asyncio.create_task(connection.writer())
+
+        try:
+            await asyncio.wait({reader, writer}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            connection.closed = True
+            reader.cancel()
+            writer.cancel()
+            for symbol, level in list(connection.subscriptions):
+                self.unsubscribe(connection, symbol, level)
+            self.connections.discard(connection)
+
+    async def _read_messages(self, connection: LiveConnection) -> None:
+        """接收并处理客户端的订阅消息，直到连接关闭"""
+        try:
+            while not connection.closed:
+                message = await connection.websocket.receive_json()
+                action = message.get("action")
+                symbols = message.get("symbols") or []
+                levels = message.get("levels") or ["30min"]
+
+                if action == "subscribe":
+                    for symbol in symbols:
+                        for level in levels:
+                            await self.subscribe(connection, symbol, level)
+                elif action == "unsubscribe":
+                    for symbol in symbols:
+                        for level in levels:
+                            self.unsubscribe(connection, symbol, level)
+                else:
+                    connection.offer(json.dumps({"type": "error", "message": f"未知操作: {action}"}, ensure_ascii=False))
+        except Exception as e:
+            logger.info(f"🔌 WebSocket连接结束: {e}")
+
+    async def subscribe(self, connection: LiveConnection, symbol: str, level: str) -> None:
+        """
+        订阅股票级别，首个订阅者触发行情源关注和窗口初始化
+        初始化失败时注销该分析流并向客户端返回错误消息，连接保持可用
+        """
+        key = (symbol, level)
+        stream = self.streams.get(key)
+        if stream is None:
+            stream = SymbolStream(symbol, level, self.chan_api)
+            self.streams[key] = stream
+
+        # 并发订阅同一流时，后来者等待初始化完成
+        async with stream.lock:
+            if self.streams.get(key) is not stream:
+                # 等待期间前一个订阅者初始化失败，分析流已注销
+                stream = None
+            elif not stream.seeded:
+                try:
+                    history = await self.feed.watch(symbol, level)
+                    loop = asyncio.get_running_loop()
+                    await loop.run_in_executor(self._executor, stream.seed, history)
+                except Exception as e:
+                    logger.error(f"❌ 初始化推送 {symbol} {level} 失败: {e}")
+                    if not stream.subscribers:
+                        self.streams.pop(key, None)
+                        self.feed.unwatch(symbol, level)
+                    connection.offer(json.dumps(
+                        {"type": "error", "symbol": symbol, "level": level, "message": f"订阅失败: {e}"},
+                        ensure_ascii=False))
+                    return
+                logger.info(f"📈 开始推送 {symbol} {level}，初始窗口 {len(stream.bars)} 根K线")
+
+            if stream is not None:
+                # 在锁内登记订阅并投递快照：等待中的 on_bar 随后推送的增量一定晚于快照
+                stream.subscribers.add(connection)
+                connection.subscriptions.add(key)
+                snapshot = {
+                    "type": "snapshot",
+                    "symbol": symbol,
+                    "level": level,
+                    "bar_count": len(stream.bars),
+                    **{name: {"since": None, "items": items} for name, items in stream._structures.items()},
+                }
+                connection.offer(json.dumps(snapshot, ensure_ascii=False, default=str))
+
+        if stream is None:
+            await self.subscribe(connection, symbol, level)
+
+    def unsubscribe(self, connection: LiveConnection, symbol: str, level: str) -> None:
+        """取消订阅，最后一个订阅者离开时释放分析流"""
+        key = (symbol, level)
+        connection.subscriptions.discard(key)
+        stream = self.streams.get(key)
+        if stream is None:
+            return
+        stream.subscribers.discard(connection)
+        if not stream.subscribers:
+            self.streams.pop(key, None)
+            self.feed.unwatch(symbol, level)
+            logger.info(f"📉 停止推送 {symbol} {level}")
+
+    async def on_bar(self, symbol: str, level: str, bar: Dict[str, Any]) -> None:
+        """行情源回调：一次计算，扇出给所有订阅者"""
+        # 初始化中的流（尚无订阅者）等待初始化完成后再处理，避免丢失初始化期间收盘的K线
+        stream = self.streams.get((symbol, level))
+        if stream is None:
+            return
+
+        async with stream.lock:
+            if self.streams.get((symbol, level)) is not stream:
+                return  # 等待期间初始化失败或最后一个订阅者已离开
+            loop = asyncio.get_running_loop()
+            try:
+                message = await loop.run_in_executor(self._executor, stream.on_bar_closed, bar)
+            except Exception as e:
+                logger.error(f"❌ 实时分析 {symbol} {level} 失败: {e}")
+                return
+
+        if not message:
+            return
+
+        text = json.dumps(message, ensure_ascii=False, default=str)
+        for connection in list(stream.subscribers):
+            if not connection.offer(text):
+                self.unsubscribe(connection, symbol, level)
+                try:
+                    await connection.websocket.close(code=1013)
+                except Exception:
+                    pass
@@ -5,13 +5,17 @@ KK缠论分析API - 应用入口
 标准FastAPI应用结构
 """
 
+import threading
+import time
 from datetime import datetime
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, WebSocket
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
-# 导入路由
-from routers import router
+# 导入路由（分析服务在首次请求时才创建，见 routers.get_chan_api）
+from routers import router, get_chan_api
+from api.metrics import http_request_duration, http_requests_in_flight
 
 # 创建FastAPI应用实例
 app = FastAPI(
@@ -31,9 +35,65 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 请求耗时与并发数指标（路由模板作为标签，避免路径参数导致标签爆炸）
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    http_requests_in_flight.inc()
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        http_requests_in_flight.dec()
+        route = request.scope.get("route")
+        http_request_duration.observe(
+            time.perf_counter() - started,
+            route=getattr(route, "path", "unmatched"),
+            method=request.method,
+            status=status
+        )
+
 # 包含路由
 app.include_router(router, prefix="", tags=["API"])
 
+# 实时结构推送（首个订阅连接时创建，默认使用本地K线回放源作为行情替身）
+live_hub = None
+_live_hub_lock = threading.Lock()
+
+def get_live_hub():
+    """获取实时推送中心（首次调用会创建分析服务，应在线程池中执行）"""
+    global live_hub
+    if live_hub is None:
+        with _live_hub_lock:
+            if live_hub is None:
+                from api.live_push import LiveStructureHub, LocalBarFeed
+                chan_api = get_chan_api()
+                live_hub = LiveStructureHub(chan_api, feed=LocalBarFeed(chan_api))
+    return live_hub
+
+@app.websocket("/ws/live")
+async def live_structure_updates(websocket: WebSocket):
+    """
+    订阅缠论结构实时推送
+    客户端发送: {"action": "subscribe", "symbols": ["000001.SZ"], "levels": ["30min"]}
+    """
+    hub = await run_in_threadpool(get_live_hub)
+    await hub.handle_connection(websocket)
+
+@app.on_event("shutdown")
+async def shutdown_live_hub():
+    """停止实时推送"""
+    if live_hub is not None:
+        await live_hub.stop()
+
+@app.on_event("shutdown")
+async def shutdown_async_db():
+    """关闭异步MongoDB连接池（未使用过时不会创建）"""
+    from database.async_db_handler import close_async_db_handler
+    close_async_db_handler()
+
 # 全局异常处理
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
@@ -69,6 +129,9 @@ if __name__ == "__main__":
     print("📍 服务地址: http://localhost:8000")
     print("📋 API文档: http://localhost:8000/docs")
     print("🔧 健康检查: http://localhost:8000/health")
+    print("🚦 就绪检查: http://localhost:8000/ready")
+    print("📈 运行指标: http://localhost:8000/metrics")
+    print("📡 实时推送: ws://localhost:8000/ws/live")
     
     uvicorn.run(
         "main:app",
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运行指标采集（Prometheus文本格式）
+1. 每个线程写入自己的分片，记录指标时不加锁；导出时汇总所有分片
+2. 计数器、仪表（可增减）、固定桶直方图
+3. MongoDB命令监听：按集合统计查询耗时与返回文档数
+4. 缠论引擎各阶段耗时、缓存命中率
+
+导出格式参见 https://prometheus.io/docs/instrumenting/exposition_formats/
+"""
+
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, List, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 默认耗时桶（秒）
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class _Shard:
+    """单线程独占的指标分片，只有所属线程写入"""
+
+    def __init__(self, thread: threading.Thread):
+        self.thread = thread
+        self.values: Dict[Tuple[str, LabelKey], Any] = {}
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards: List[_Shard] = []
+        self._retired = _Shard(threading.current_thread())  # 已退出线程的分片合并到这里
+        self._lock = threading.Lock()  # 只在新线程首次写入和导出时使用
+        self._metrics: Dict[str, "_Metric"] = {}
+
+    def _shard(self) -> _Shard:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = _Shard(threading.current_thread())
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+        return shard
+
+    def _register(self, metric: "_Metric") -> "_Metric":
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str) -> "Counter":
+        return self._register(Counter(self, name, documentation))
+
+    def gauge(self, name: str, documentation: str) -> "Gauge":
+        return self._register(Gauge(self, name, documentation))
+
+    def histogram(self, name: str, documentation: str, buckets=LATENCY_BUCKETS) -> "Histogram":
+        return self._register(Histogram(self, name, documentation, buckets))
+
+    def _collect(self) -> Dict[Tuple[str, LabelKey], Any]:
+        """汇总所有分片（已退出线程的分片先并入 retired）"""
+        with self._lock:
+            alive = []
+            for shard in self._shards:
+                if shard.thread.is_alive():
+                    alive.append(shard)
+                else:
+                    _merge_into(self._retired.values, shard.values.copy())
+            self._shards = alive
+            snapshots = [self._retired.values.copy()] + [shard.values.copy() for shard in alive]
+
+        totals: Dict[Tuple[str, LabelKey], Any] = {}
+        for snapshot in snapshots:
+            _merge_into(totals, snapshot)
+        return totals
+
+    def render(self) -> str:
+        """导出为Prometheus文本格式"""
+        totals = self._collect()
+        by_metric: Dict[str, List[Tuple[LabelKey, Any]]] = {}
+        for (name, labels), value in totals.items():
+            by_metric.setdefault(name, []).append((labels, value))
+
+        lines = []
+        for name in sorted(self._metrics):
+            metric = self._metrics[name]
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for labels, value in sorted(by_metric.get(name, []), key=lambda item: item[0]):
+                lines.extend(metric.expose(labels, value))
+        return "\n".join(lines) + "\n"
+
+
+def _merge_into(target: Dict[Tuple[str, LabelKey], Any], source: Dict[Tuple[str, LabelKey], Any]):
+    for key, value in source.items():
+        if isinstance(value, list):
+            current = target.get(key)
+            if current is None:
+                target[key] = list(value)
+            else:
+                for i, item in enumerate(value):
+                    current[i] += item
+        else:
+            target[key] = target.get(key, 0) + value
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, registry: MetricsRegistry, name: str, documentation: str):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+
+    def expose(self, labels: LabelKey, value: Any) -> List[str]:
+        return [f"{self.name}{_format_labels(labels)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    """单调递增计数器"""
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        values = self.registry._shard().values
+        key = (self.name, _label_key(labels))
+        values[key] = values.get(key, 0) + amount
+
+
+class Gauge(Counter):
+    """可增减的仪表（各分片求和，适合并发数等）"""
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """固定桶直方图"""
+    kind = "histogram"
+
+    def __init__(self, registry: MetricsRegistry, name: str, documentation: str, buckets):
+        super().__init__(registry, name, documentation)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        values = self.registry._shard().values
+        key = (self.name, _label_key(labels))
+        slots = values.get(key)
+        if slots is None:
+            # 各桶计数 + 溢出桶 + 总和 + 次数
+            slots = [0] * (len(self.buckets) + 3)
+            values[key] = slots
+        slots[bisect_left(self.buckets, value)] += 1
+        slots[-2] += value
+        slots[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def expose(self, labels: LabelKey, value: Any) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, value):
+            cumulative += count
+            lines.append(f"{self.name}_bucket{_format_labels(labels, ('le', _format_value(float(bound))))} {cumulative}")
+        cumulative += value[len(self.buckets)]
+        lines.append(f"{self.name}_bucket{_format_labels(labels, ('le', '+Inf'))} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(value[-2])}")
+        lines.append(f"{self.name}_count{_format_labels(labels)} {value[-1]}")
+        return lines
+
+
+# ==================== 全局注册表与标准指标 ====================
+
+registry = MetricsRegistry()
+
+http_request_duration = registry.histogram(
+    "kk_http_request_duration_seconds", "HTTP请求耗时（按路由模板、方法、状态码）")
+http_requests_in_flight = registry.gauge(
+    "kk_http_requests_in_flight", "正在处理的HTTP请求数")
+
+mongo_command_duration = registry.histogram(
+    "kk_mongo_command_duration_seconds", "MongoDB命令耗时（按集合、命令）")
+mongo_documents_returned = registry.counter(
+    "kk_mongo_documents_returned_total", "MongoDB查询返回的文档数（按集合）")
+mongo_command_failures = registry.counter(
+    "kk_mongo_command_failures_total", "MongoDB命令失败次数（按集合、命令）")
+
+cache_requests = registry.counter(
+    "kk_cache_requests_total", "缓存访问次数（按缓存名、是否命中），命中率 = hit / (hit + miss)")
+
+engine_stage_duration = registry.histogram(
+    "kk_engine_stage_duration_seconds", "缠论引擎各阶段耗时（按阶段、级别）")
+
+
+def record_cache(cache: str, hit: bool):
+    """记录一次缓存访问"""
+    cache_requests.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def record_engine_stages(stage_timings: Dict[str, float], time_level: str):
+    """记录 ChanAnalysisResult.stage_timings"""
+    for stage, seconds in stage_timings.items():
+        engine_stage_duration.observe(seconds, stage=stage, level=time_level)
+
+
+# ==================== MongoDB命令监听 ====================
+
+_MONGO_COMMANDS = {"find", "getMore", "aggregate", "count", "countDocuments", "distinct",
+                   "insert", "update", "delete", "findAndModify"}
+
+
+def _create_mongo_listener():
+    from pymongo import monitoring
+
+    class MongoCommandMetrics(monitoring.CommandListener):
+        """按集合统计命令耗时与返回文档数（pymongo在执行线程内回调）"""
+
+        def __init__(self):
+            self._collections: Dict[Tuple[Any, int], str] = {}
+
+        def started(self, event):
+            if event.command_name not in _MONGO_COMMANDS:
+                return
+            command = event.command
+            collection = command.get("collection") if event.command_name == "getMore" else command.get(event.command_name)
+            self._collections[(event.connection_id, event.request_id)] = str(collection)
+
+        def succeeded(self, event):
+            collection = self._collections.pop((event.connection_id, event.request_id), None)
+            if collection is None:
+                return
+            mongo_command_duration.observe(event.duration_micros / 1e6, collection=collection, command=event.command_name)
+            cursor = event.reply.get("cursor") if hasattr(event.reply, "get") else None
+            if cursor:
+                batch = cursor.get("firstBatch", cursor.get("nextBatch", ()))
+                mongo_documents_returned.inc(len(batch), collection=collection)
+
+        def failed(self, event):
+            collection = self._collections.pop((event.connection_id, event.request_id), None)
+            if collection is not None:
+                mongo_command_failures.inc(collection=collection, command=event.command_name)
+
+    return MongoCommandMetrics()
+
+
+_mongo_listener_installed = False
+
+
+def install_mongo_listener() -> bool:
+    """
+    注册全局MongoDB命令监听器
+    只对之后创建的MongoClient生效，需在首次连接数据库之前调用
+    """
+    global _mongo_listener_installed
+    if _mongo_listener_installed:
+        return True
+    try:
+        from pymongo import monitoring
+        monitoring.register(_create_mongo_listener())
+        _mongo_listener_installed = True
+    except ImportError:
+        logger.warning("⚠️ 未安装pymongo，跳过MongoDB指标采集")
+    return _mongo_listener_installed
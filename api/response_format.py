@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分析结果响应格式
+1. 列式紧凑格式：K线/MACD使用平行数组，缠论结构端点使用K线下标（整数数组）代替时间字符串
+2. 内容协商编码：JSON（优先orjson）、MessagePack、Arrow IPC
+
+msgpack、pyarrow、orjson均为可选依赖，未安装时自动回退到标准JSON；
+pyarrow导入较慢（约100ms），只在首次Arrow编码时导入，不计入API启动耗时
+"""
+
+import importlib.util
+import json
+import logging
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Dict, List, Any, Tuple, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - 可选依赖
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - 可选依赖
+    msgpack = None
+
+# 支持的媒体类型
+MEDIA_JSON = "application/json"
+MEDIA_MSGPACK = "application/x-msgpack"
+MEDIA_ARROW = "application/vnd.apache.arrow.stream"
+
+# 响应格式
+FORMAT_ROWS = "rows"          # 现有的逐元素字典格式（默认，兼容前端）
+FORMAT_COLUMNAR = "columnar"  # 列式紧凑格式
+
+
+class TimeAxis:
+    """时间轴：把结构端点时间映射为K线下标"""
+
+    def __init__(self, categories: List[str]):
+        self.categories = categories
+        self._index = {category: i for i, category in enumerate(categories)}
+
+    def locate(self, timestamp: str) -> int:
+        """返回时间对应的K线下标，不在轴上时取其后最近的一根"""
+        index = self._index.get(timestamp)
+        if index is not None:
+            return index
+        if not self.categories:
+            return -1
+        return min(bisect_left(self.categories, timestamp), len(self.categories) - 1)
+
+
+def to_columnar(frontend_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    将 ChanDataAPIv2 输出的逐元素格式转换为列式紧凑格式
+
+    Args:
+        frontend_data: analyze_symbol_complete 的返回结果
+
+    Returns:
+        列式格式结果（meta/analysis/chart_config保持不变）
+    """
+    chart_data = frontend_data.get("chart_data", {})
+    kline = chart_data.get("kline", {})
+    categories = kline.get("categories", [])
+    values = kline.get("values", [])
+    axis = TimeAxis(categories)
+
+    # K线: values中每项为 [open, close, low, high]
+    columnar_kline = {
+        "time": categories,
+        "open": [v[0] for v in values],
+        "close": [v[1] for v in values],
+        "low": [v[2] for v in values],
+        "high": [v[3] for v in values],
+        "volume": kline.get("volumes", []),
+    }
+
+    structures = chart_data.get("chan_structures", {})
+    dynamics = chart_data.get("dynamics", {})
+
+    columnar = {
+        key: value for key, value in frontend_data.items() if key != "chart_data"
+    }
+    columnar["meta"] = {**frontend_data.get("meta", {}), "format": FORMAT_COLUMNAR}
+    columnar["chart_data"] = {
+        "kline": columnar_kline,
+        "indicators": chart_data.get("indicators", {}),
+        "chan_structures": {
+            "fenxing": _point_columns(structures.get("fenxing", []), axis, {
+                "type": lambda p: p["type"],
+                "strength": lambda p: p["strength"],
+                "confirmed": lambda p: p["confirmed"],
+            }),
+            "bi": _line_columns(structures.get("bi", []), axis, {
+                "direction": lambda l: l["direction"],
+                "amplitude": lambda l: l["amplitude"],
+                "strength": lambda l: l["strength"],
+                "duration": lambda l: l["duration"],
+            }),
+            "seg": _line_columns(structures.get("seg", []), axis, {
+                "direction": lambda l: l["direction"],
+                "amplitude": lambda l: l["amplitude"],
+                "strength": lambda l: l["strength"],
+                "integrity": lambda l: l["integrity"],
+                "bi_count": lambda l: l["bi_count"],
+                "duration": lambda l: l["duration"],
+            }),
+            "zhongshu": _line_columns(structures.get("zhongshu", []), axis, {
+                "high": lambda z: z["high"],
+                "low": lambda z: z["low"],
+                "center": lambda z: z["center"],
+                "strength": lambda z: z["strength"],
+                "stability": lambda z: z["stability"],
+                "seg_count": lambda z: z["seg_count"],
+                "extend_count": lambda z: z["extend_count"],
+                "is_active": lambda z: z["is_active"],
+            }),
+        },
+        "dynamics": {
+            "buy_sell_points": _point_columns(dynamics.get("buy_sell_points", []), axis, {
+                "name": lambda p: p["name"],
+                "type": lambda p: p["type"],
+                "point_level": lambda p: p["point_level"],
+                "strength": lambda p: p["strength"],
+                "reliability": lambda p: p["reliability"],
+                "confirmed_higher": lambda p: p["confirmed_higher"],
+                "confirmed_lower": lambda p: p["confirmed_lower"],
+            }),
+            "backchi": _point_columns(dynamics.get("backchi", []), axis, {
+                "type": lambda p: p["type"],
+                "reliability": lambda p: p["reliability"],
+                "strength_ratio": lambda p: p["strength_ratio"],
+                "macd_divergence": lambda p: p["macd_divergence"],
+            }),
+        },
+    }
+    return columnar
+
+
+def _point_columns(points: List[Dict[str, Any]], axis: TimeAxis, fields: Dict[str, Any]) -> Dict[str, List]:
+    """标记点（分型、买卖点、背驰）转为列：index + price + 附加字段"""
+    columns: Dict[str, List] = {"index": [], "price": []}
+    columns.update({name: [] for name in fields})
+    for point in points:
+        timestamp, price = point["coord"]
+        columns["index"].append(axis.locate(timestamp))
+        columns["price"].append(price)
+        for name, getter in fields.items():
+            columns[name].append(getter(point))
+    return columns
+
+
+def _line_columns(lines: List[Dict[str, Any]], axis: TimeAxis, fields: Dict[str, Any]) -> Dict[str, List]:
+    """线条/区域（笔、线段、中枢）转为列：起止下标 + 起止价格 + 附加字段"""
+    columns: Dict[str, List] = {"start_index": [], "start_price": [], "end_index": [], "end_price": []}
+    columns.update({name: [] for name in fields})
+    for line in lines:
+        (start_time, start_price), (end_time, end_price) = line["coords"]
+        columns["start_index"].append(axis.locate(start_time))
+        columns["start_price"].append(start_price)
+        columns["end_index"].append(axis.locate(end_time))
+        columns["end_price"].append(end_price)
+        for name, getter in fields.items():
+            columns[name].append(getter(line))
+    return columns
+
+
+def negotiate_media_type(accept: Optional[str]) -> str:
+    """根据Accept头选择编码，依赖缺失时回退到JSON"""
+    accept = (accept or "").lower()
+    if MEDIA_ARROW in accept and arrow_available():
+        return MEDIA_ARROW
+    if ("msgpack" in accept) and msgpack is not None:
+        return MEDIA_MSGPACK
+    return MEDIA_JSON
+
+
+@lru_cache(maxsize=None)
+def arrow_available() -> bool:
+    """是否安装了pyarrow（只查找模块，不导入）"""
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def encode_json(payload: Dict[str, Any]) -> bytes:
+    """JSON编码（优先使用orjson；与标准json一致，允许非字符串键和numpy数值）"""
+    if orjson is not None:
+        return orjson.dumps(payload, default=str,
+                            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+
+
+def encode_msgpack(payload: Dict[str, Any]) -> bytes:
+    """MessagePack编码"""
+    return msgpack.packb(payload, use_bin_type=True, default=str)
+
+
+def encode_arrow(payload: Dict[str, Any]) -> bytes:
+    """
+    Arrow IPC流编码
+    K线与MACD组成一张记录批次表，其余内容（结构、摘要）以JSON写入schema元数据
+    """
+    import pyarrow as pa
+
+    if payload.get("meta", {}).get("format") != FORMAT_COLUMNAR:
+        payload = to_columnar(payload)
+
+    chart_data = payload["chart_data"]
+    kline = chart_data["kline"]
+    macd = chart_data.get("indicators", {}).get("macd", {})
+    length = len(kline["time"])
+
+    columns = {
+        "time": pa.array(kline["time"], type=pa.string()),
+        "open": pa.array(kline["open"], type=pa.float64()),
+        "close": pa.array(kline["close"], type=pa.float64()),
+        "low": pa.array(kline["low"], type=pa.float64()),
+        "high": pa.array(kline["high"], type=pa.float64()),
+        "volume": pa.array(kline["volume"], type=pa.float64()),
+    }
+    for name in ("dif", "dea", "macd"):
+        series = macd.get(name, [])
+        if len(series) == length:
+            columns[name] = pa.array(series, type=pa.float64())
+
+    rest = {key: value for key, value in payload.items() if key != "chart_data"}
+    rest["chart_data"] = {key: value for key, value in chart_data.items() if key != "kline"}
+    rest["chart_data"]["indicators"] = {}
+
+    table = pa.table(columns).replace_schema_metadata({"payload": encode_json(rest)})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def encode_payload(payload: Dict[str, Any], media_type: str) -> bytes:
+    """按媒体类型编码"""
+    if media_type == MEDIA_ARROW:
+        return encode_arrow(payload)
+    if media_type == MEDIA_MSGPACK:
+        return encode_msgpack(payload)
+    return encode_json(payload)
+
+
+def render(payload: Dict[str, Any], response_format: str = FORMAT_ROWS,
+           accept: Optional[str] = None) -> Tuple[bytes, str]:
+    """
+    按请求的格式和Accept头编码分析结果
+
+    Args:
+        payload: analyze_symbol_complete 的返回结果
+        response_format: "rows" 或 "columnar"
+        accept: HTTP Accept头
+
+    Returns:
+        (编码后的字节, 媒体类型)
+    """
+    if response_format == FORMAT_COLUMNAR:
+        payload = to_columnar(payload)
+    media_type = negotiate_media_type(accept)
+    return encode_payload(payload, media_type), media_type
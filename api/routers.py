@@ -7,21 +7,46 @@ API路由定义
 
 import os
 import sys
+import threading
 from datetime import datetime
 from typing import Dict, List, Any, Optional
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel
 
 # 将项目根目录添加到Python路径
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, project_root)
 
-# 导入现有的缠论分析模块
-from api.chan_api_v2 import ChanDataAPIv2
+from api.response_format import render, FORMAT_ROWS, FORMAT_COLUMNAR
+from api.downsample import apply_level_of_detail
+from api import metrics
 
-# 初始化缠论API（使用现有业务逻辑）
-chan_api = ChanDataAPIv2()
+# 缠论API实例（首次请求时创建，避免导入路由时加载分析引擎和连接数据库）
+_chan_api = None
+_chan_api_lock = threading.Lock()
+
+def get_chan_api():
+    """获取缠论API单例（使用现有业务逻辑）"""
+    global _chan_api
+    if _chan_api is None:
+        with _chan_api_lock:
+            if _chan_api is None:
+                from api.chan_api_v2 import ChanDataAPIv2
+                # 监听器需在首次连接数据库之前注册
+                metrics.install_mongo_listener()
+                _chan_api = ChanDataAPIv2()
+    return _chan_api
+
+async def get_chan_api_async():
+    """
+    在线程池中获取缠论API单例
+    首次调用会加载分析引擎并连接数据库（最长等待服务器选择超时），不能阻塞事件循环；
+    路由对其同步方法的调用同样通过 run_in_threadpool 执行
+    """
+    return await run_in_threadpool(get_chan_api)
 
 # 创建路由实例
 router = APIRouter()
@@ -34,6 +59,8 @@ class AnalysisRequest(BaseModel):
     min_bi_length: Optional[int] = 5
     min_xd_bi_count: Optional[int] = 3
     fenxing_threshold: Optional[float] = 0.001
+    response_format: str = FORMAT_ROWS
+    max_points: Optional[int] = None
 
 class StockInfo(BaseModel):
     value: str
@@ -44,6 +71,12 @@ class StockSelectionRequest(BaseModel):
     max_results: int = 50
     custom_config: Optional[Dict[str, Any]] = None
 
+class BatchAnalysisRequest(BaseModel):
+    symbols: List[str]
+    timeframe: str = "daily"
+    days: int = 90
+    include_payload: bool = False
+
 class StockSelectionConfigRequest(BaseModel):
     config: Dict[str, Any]
 
@@ -61,31 +94,120 @@ async def root():
 
 @router.get("/health")
 async def health_check():
-    """健康检查"""
+    """健康检查（存活探针，不依赖数据库）"""
     return {"status": "healthy", "timestamp": datetime.now().isoformat()}
 
+@router.get("/ready")
+async def readiness_check():
+    """就绪探针：分析服务已加载且数据库可用时返回200，否则返回503"""
+    try:
+        chan_api = await get_chan_api_async()
+        ready = await run_in_threadpool(chan_api.check_ready)
+    except Exception:
+        ready = False
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "not_ready", "timestamp": datetime.now().isoformat()}
+    )
+
+@router.get("/metrics")
+async def get_metrics():
+    """运行指标（Prometheus文本格式）"""
+    return Response(content=metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
 # ==================== 股票接口 ====================
 
 @router.get("/stocks", response_model=List[StockInfo])
 async def get_stocks(query: str = Query("", description="搜索关键字")):
     """获取股票列表"""
-    return chan_api.get_symbols_list(query)
+    chan_api = await get_chan_api_async()
+    return await run_in_threadpool(chan_api.get_symbols_list, query)
 
 # ==================== 分析接口 ====================
 
+def _analysis_response(data: Dict[str, Any], response_format: str, accept: Optional[str],
+                       max_points: Optional[int] = None) -> Response:
+    """按请求格式和Accept头编码分析结果，指定max_points时先对K线降采样"""
+    if response_format not in (FORMAT_ROWS, FORMAT_COLUMNAR):
+        raise HTTPException(status_code=400, detail=f"不支持的响应格式: {response_format}")
+    if max_points is not None and max_points < 2:
+        raise HTTPException(status_code=400, detail=f"max_points 至少为2: {max_points}")
+    data = apply_level_of_detail(data, max_points)
+    content, media_type = render(data, response_format, accept)
+    return Response(content=content, media_type=media_type)
+
 @router.get("/analysis")
 async def get_analysis(
+    request: Request,
     symbol: str = Query(..., description="股票代码"),
     timeframe: str = Query("daily", description="时间级别"),
-    days: int = Query(90, description="分析天数")
+    days: int = Query(90, description="分析天数"),
+    response_format: str = Query(FORMAT_ROWS, alias="format", description="响应格式: rows 或 columnar"),
+    max_points: Optional[int] = Query(None, description="K线最大点数，超过时服务端降采样（结构端点保留原K线）")
 ):
-    """获取缠论分析数据"""
-    return chan_api.analyze_symbol_complete(symbol, timeframe, days, "complete")
+    """获取缠论分析数据（Accept支持 application/json、application/x-msgpack、application/vnd.apache.arrow.stream）"""
+    chan_api = await get_chan_api_async()
+    data = await run_in_threadpool(chan_api.analyze_symbol_complete, symbol, timeframe, days, "complete")
+    return _analysis_response(data, response_format, request.headers.get("accept"), max_points)
 
 @router.post("/analysis")
-async def post_analysis(request: AnalysisRequest):
+async def post_analysis(request: AnalysisRequest, http_request: Request):
     """POST方式获取缠论分析数据"""
-    return chan_api.analyze_symbol_complete(request.symbol, request.timeframe, request.days, "complete")
+    chan_api = await get_chan_api_async()
+    data = await run_in_threadpool(chan_api.analyze_symbol_complete,
+                                   request.symbol, request.timeframe, request.days, "complete")
+    return _analysis_response(data, request.response_format, http_request.headers.get("accept"),
+                              request.max_points)
+
+@router.post("/analysis/batch")
+async def post_batch_analysis(request: BatchAnalysisRequest):
+    """
+    多股票批量分析（自选股页面）
+    一次批量取数、多进程并行分析，默认只返回结构摘要；include_payload=true 时附带完整图表数据
+    """
+    chan_api = await get_chan_api_async()
+    try:
+        return await chan_api.analyze_batch_async(
+            request.symbols, request.timeframe, request.days, request.include_payload
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/screen")
+async def screen_structures(
+    level: str = Query("30min", description="时间级别"),
+    zs_position: Optional[str] = Query(None, description="相对最新中枢位置: above / inside / below"),
+    bsp_type: Optional[str] = Query(None, description="最新买卖点类型，逗号分隔，如 2buy,3buy"),
+    bsp_side: Optional[str] = Query(None, description="buy / sell"),
+    bsp_since: Optional[str] = Query(None, description="最新买卖点不早于该时间，格式 YYYY-MM-DD HH:MM"),
+    backchi_type: Optional[str] = Query(None, description="背驰类型: top / bottom"),
+    bi_direction: Optional[str] = Query(None, description="最新笔方向"),
+    seg_direction: Optional[str] = Query(None, description="最新线段方向"),
+    min_distance: Optional[float] = Query(None, description="相对中枢距离下限"),
+    max_distance: Optional[float] = Query(None, description="相对中枢距离上限"),
+    sort: str = Query("-bsp_time", description="排序字段，前缀-表示降序"),
+    limit: int = Query(100, description="返回数量（最多1000）")
+):
+    """按最新缠论结构筛选股票（读取物化表，毫秒级返回）"""
+    chan_api = await get_chan_api_async()
+    try:
+        return await run_in_threadpool(
+            chan_api.screen_structures,
+            level,
+            zs_position=zs_position,
+            bsp_types=[t.strip() for t in bsp_type.split(",") if t.strip()] if bsp_type else None,
+            bsp_side=bsp_side,
+            bsp_since=bsp_since,
+            backchi_type=backchi_type,
+            bi_direction=bi_direction,
+            seg_direction=seg_direction,
+            min_distance=min_distance,
+            max_distance=max_distance,
+            sort=sort,
+            limit=limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/analysis/multi-level")
 async def get_multi_level_analysis(
@@ -95,17 +217,20 @@ async def get_multi_level_analysis(
 ):
     """获取多级别缠论分析数据"""
     level_list = [level.strip() for level in levels.split(",")]
-    return chan_api.analyze_multi_level(symbol, level_list, days)
+    chan_api = await get_chan_api_async()
+    return await chan_api.analyze_multi_level_async(symbol, level_list, days)
 
 @router.post("/analysis/save")
 async def save_analysis(data: Dict[str, Any]):
     """保存分析结果"""
-    return chan_api.save_analysis_result(data)
+    chan_api = await get_chan_api_async()
+    return await run_in_threadpool(chan_api.save_analysis_result, data)
 
 @router.get("/analysis/history")
 async def get_analysis_history():
     """获取历史分析记录"""
-    return chan_api.get_analysis_history()
+    chan_api = await get_chan_api_async()
+    return await run_in_threadpool(chan_api.get_analysis_history)
 
 # ==================== 选股接口 ====================
 
@@ -131,22 +256,27 @@ async def get_stock_selection(
     if death_cross_confirm_days is not None:
         custom_config['death_cross_confirm_days'] = death_cross_confirm_days
     
-    return chan_api.run_stock_selection(max_results, custom_config if custom_config else None)
+    chan_api = await get_chan_api_async()
+    return await run_in_threadpool(chan_api.run_stock_selection, max_results,
+                                   custom_config if custom_config else None)
 
 @router.post("/stock-selection")
 async def post_stock_selection(request: StockSelectionRequest):
     """POST方式执行缠论多级别背驰选股"""
-    return chan_api.run_stock_selection(request.max_results, request.custom_config)
+    chan_api = await get_chan_api_async()
+    return await run_in_threadpool(chan_api.run_stock_selection, request.max_results, request.custom_config)
 
 @router.get("/stock-selection/config")
 async def get_stock_selection_config():
     """获取当前选股配置"""
-    return chan_api.get_stock_selection_config()
+    chan_api = await get_chan_api_async()
+    return await run_in_threadpool(chan_api.get_stock_selection_config)
 
 @router.put("/stock-selection/config")
 async def update_stock_selection_config(request: StockSelectionConfigRequest):
     """更新选股配置"""
-    result = chan_api.update_stock_selection_config(request.config)
+    chan_api = await get_chan_api_async()
+    result = await run_in_threadpool(chan_api.update_stock_selection_config, request.config)
     if not result.get('success', False):
         raise HTTPException(status_code=400, detail=result.get('message', '配置更新失败'))
     return result
@@ -154,4 +284,5 @@ async def update_stock_selection_config(request: StockSelectionConfigRequest):
 @router.get("/stock-selection/history")
 async def get_stock_selection_history(limit: int = Query(20, description="返回记录数量限制")):
     """获取选股历史记录"""
-    return chan_api.get_stock_selection_history(limit)
\ No newline at end of file
+    chan_api = await get_chan_api_async()
+    return await run_in_threadpool(chan_api.get_stock_selection_history, limit)
\ No newline at end of file
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+缠论结构预计算缓存
+由 daily_structure_precompute.py 在收盘后写入，API读取后直接返回，
+避免开盘前后集中访问时每个首次请求都执行完整分析
+
+存储（MongoDB集合 analysis_structure_cache，每只股票/级别/天数一条）：
+    ts_code, level, days, run_date   键与批次日期
+    summary                          紧凑结构摘要（与 /analysis/batch 一致）
+    payload                          zlib压缩的完整前端数据（JSON）
+    computed_at, expires_at          计算时间与失效时间（分钟级别为下一交易日开盘，日线级别为下一次预计算）
+"""
+
+import json
+import logging
+import threading
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Set, Tuple
+
+from api.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+CACHE_COLLECTION = "analysis_structure_cache"
+PROGRESS_COLLECTION = "analysis_precompute_progress"
+
+# 进程内解码后结果的缓存条数
+DEFAULT_MEMORY_SIZE = 512
+
+
+def encode_payload(payload: Dict[str, Any]) -> bytes:
+    """完整前端数据 → 压缩JSON"""
+    return zlib.compress(json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8"), 6)
+
+
+def decode_payload(blob: bytes) -> Dict[str, Any]:
+    """压缩JSON → 完整前端数据"""
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+class StructureCache:
+    """
+    预计算结构缓存读写
+    读路径：进程内LRU → MongoDB；只返回未过期的结果（返回对象为共享只读数据，调用方不应修改）
+    """
+
+    def __init__(self, db, memory_size: int = DEFAULT_MEMORY_SIZE):
+        self.collection = db[CACHE_COLLECTION]
+        self.memory_size = memory_size
+        self._memory: "OrderedDict[Tuple[str, str, int], Tuple[datetime, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def ensure_indexes(self):
+        """创建缓存集合索引"""
+        self.collection.create_index([("ts_code", 1), ("level", 1), ("days", 1)], unique=True, background=True)
+        self.collection.create_index([("level", 1), ("days", 1), ("run_date", 1)], background=True)
+
+    def get(self, symbol: str, timeframe: str, days: int) -> Optional[Dict[str, Any]]:
+        """获取未过期的完整前端数据，未命中返回None"""
+        key = (symbol, timeframe, days)
+        now = datetime.now()
+
+        with self._lock:
+            cached = self._memory.get(key)
+            if cached is not None:
+                if cached[0] > now:
+                    self._memory.move_to_end(key)
+                    record_cache("structure_cache_memory", True)
+                    return cached[1]
+                del self._memory[key]
+        record_cache("structure_cache_memory", False)
+
+        try:
+            doc = self.collection.find_one(
+                {"ts_code": symbol, "level": timeframe, "days": days, "expires_at": {"$gt": now}},
+                {"_id": 0, "payload": 1, "expires_at": 1}
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ 读取结构缓存失败: {e}")
+            doc = None
+
+        if not doc or not doc.get("payload"):
+            record_cache("structure_cache", False)
+            return None
+        record_cache("structure_cache", True)
+
+        payload = decode_payload(doc["payload"])
+        with self._lock:
+            self._memory[key] = (doc["expires_at"], payload)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+        return payload
+
+    def put_many(self, documents: List[Dict[str, Any]]) -> int:
+        """批量写入（按 ts_code/level/days 覆盖），返回写入条数"""
+        if not documents:
+            return 0
+        from pymongo import ReplaceOne
+
+        operations = [
+            ReplaceOne({"ts_code": doc["ts_code"], "level": doc["level"], "days": doc["days"]}, doc, upsert=True)
+            for doc in documents
+        ]
+        result = self.collection.bulk_write(operations, ordered=False)
+        with self._lock:
+            for doc in documents:
+                self._memory.pop((doc["ts_code"], doc["level"], doc["days"]), None)
+        return result.upserted_count + result.modified_count
+
+    def completed_symbols(self, timeframe: str, days: int, run_date: str) -> Set[str]:
+        """指定批次已写入缓存的股票（用于断点续跑）"""
+        cursor = self.collection.find(
+            {"level": timeframe, "days": days, "run_date": run_date},
+            {"_id": 0, "ts_code": 1}
+        )
+        return {doc["ts_code"] for doc in cursor}
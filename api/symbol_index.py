@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+股票搜索内存索引
+将 infrastructure_stock_basic 一次性加载到进程内，按 ts_code / symbol / 名称 / 拼音首字母建立有序数组索引，
+搜索不再访问数据库。排序规则：代码精确匹配 > 前缀匹配 > 子串匹配，同级按 ts_code 排序。
+
+pypinyin 为可选依赖，未安装时不建立拼音首字母索引
+"""
+
+import logging
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from typing import Callable, Dict, Iterable, List, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    from pypinyin import lazy_pinyin, Style
+except ImportError:  # pragma: no cover - 可选依赖
+    lazy_pinyin = None
+
+# 默认刷新间隔（秒）
+DEFAULT_REFRESH_INTERVAL = 6 * 3600
+
+# 匹配等级
+RANK_EXACT = 0
+RANK_PREFIX = 1
+RANK_SUBSTRING = 2
+
+# 子串检索时各键之间的分隔符（查询中不会出现）
+_SEPARATOR = "\x00"
+
+
+def pinyin_initials(name: str) -> str:
+    """名称的拼音首字母（平安银行 → PAYH），未安装pypinyin时返回空串"""
+    if lazy_pinyin is None or not name:
+        return ""
+    return "".join(lazy_pinyin(name, style=Style.FIRST_LETTER, errors="default")).upper()
+
+
+class _Snapshot:
+    """一次加载的索引快照，刷新时整体替换"""
+
+    def __init__(self, documents: Iterable[Dict[str, Any]]):
+        entries = {}
+        for doc in documents:
+            ts_code = doc.get("ts_code")
+            name = doc.get("name")
+            if ts_code and name:
+                entries[ts_code] = doc
+        ordered = [entries[code] for code in sorted(entries)]
+
+        # 返回给前端的结果项（与原Mongo查询路径格式一致）
+        self.items: List[Dict[str, str]] = [
+            {"value": doc["ts_code"], "label": f"{doc['ts_code']} - {doc['name']}", "name": doc["name"]}
+            for doc in ordered
+        ]
+        self.codes: Dict[str, int] = {doc["ts_code"].upper(): i for i, doc in enumerate(ordered)}
+
+        keyed = []
+        haystack_parts = []
+        self.key_offsets: List[int] = []
+        self.key_owner: List[int] = []
+        offset = 0
+        for entry_id, doc in enumerate(ordered):
+            keys = {doc["ts_code"].upper(), str(doc.get("symbol") or "").upper(),
+                    doc["name"].upper(), pinyin_initials(doc["name"])}
+            for key in sorted(k for k in keys if k):
+                keyed.append((key, entry_id))
+                # 子串检索：按条目顺序拼接，扫描结果天然按 ts_code 有序
+                self.key_offsets.append(offset)
+                self.key_owner.append(entry_id)
+                haystack_parts.append(key)
+                offset += len(key) + len(_SEPARATOR)
+
+        keyed.sort()
+        self.sorted_keys: List[str] = [key for key, _ in keyed]
+        self.sorted_ids: List[int] = [entry_id for _, entry_id in keyed]
+        self.haystack = _SEPARATOR.join(haystack_parts)
+        self.loaded_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def search(self, query: str, limit: int) -> List[Dict[str, str]]:
+        if not query:
+            return self.items[:limit]
+
+        ranks: Dict[int, int] = {}
+
+        exact = self.codes.get(query)
+        if exact is not None:
+            ranks[exact] = RANK_EXACT
+
+        # 前缀：有序数组中的连续区间
+        lo = bisect_left(self.sorted_keys, query)
+        hi = bisect_right(self.sorted_keys, query + "\uffff", lo)
+        for entry_id in self.sorted_ids[lo:hi]:
+            ranks.setdefault(entry_id, RANK_PREFIX)
+
+        # 子串：按条目顺序扫描，凑满limit即可停止
+        substring_found = 0
+        position = self.haystack.find(query)
+        while position != -1 and substring_found < limit:
+            entry_id = self.key_owner[bisect_right(self.key_offsets, position) - 1]
+            if entry_id not in ranks:
+                ranks[entry_id] = RANK_SUBSTRING
+                substring_found += 1
+            position = self.haystack.find(query, position + 1)
+
+        ordered = sorted(ranks, key=lambda entry_id: (ranks[entry_id], entry_id))
+        return [self.items[entry_id] for entry_id in ordered[:limit]]
+
+
+class SymbolIndex:
+    """
+    股票搜索索引
+    首次搜索时同步加载，之后超过刷新间隔在后台线程重新加载，刷新期间继续使用旧快照
+    """
+
+    def __init__(self, loader: Callable[[], Iterable[Dict[str, Any]]],
+                 refresh_interval: float = DEFAULT_REFRESH_INTERVAL):
+        """
+        Args:
+            loader: 返回股票基础信息文档（含 ts_code、symbol、name）的函数
+            refresh_interval: 刷新间隔（秒）
+        """
+        self.loader = loader
+        self.refresh_interval = refresh_interval
+        self._snapshot: Optional[_Snapshot] = None
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._snapshot is not None
+
+    def refresh(self) -> int:
+        """重新加载索引，返回股票数量"""
+        started = time.perf_counter()
+        snapshot = _Snapshot(self.loader())
+        self._snapshot = snapshot
+        logger.info(f"🔎 股票搜索索引已加载: {len(snapshot)} 只, 耗时 {(time.perf_counter() - started) * 1000:.0f}ms"
+                    f"{'' if lazy_pinyin else '（未安装pypinyin，不含拼音首字母）'}")
+        return len(snapshot)
+
+    def search(self, query: str = "", limit: int = 100) -> List[Dict[str, str]]:
+        """
+        搜索股票
+
+        Args:
+            query: 代码、名称或拼音首字母（不区分大小写）
+            limit: 最大返回数量
+
+        Returns:
+            [{"value": ts_code, "label": "ts_code - name", "name": name}, ...]
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self.refresh()
+                snapshot = self._snapshot
+        elif time.monotonic() - snapshot.loaded_at > self.refresh_interval:
+            self._refresh_in_background()
+
+        query = (query or "").strip().upper()
+        if _SEPARATOR in query:
+            return []
+        return snapshot.search(query, limit)
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"❌ 股票搜索索引刷新失败，继续使用旧索引: {e}")
+                # 推迟到下一个刷新周期再重试，避免每次搜索都触发加载
+                if self._snapshot is not None:
+                    self._snapshot.loaded_at = time.monotonic()
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, name="symbol-index-refresh", daemon=True).start()
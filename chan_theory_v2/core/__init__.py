@@ -19,6 +19,7 @@ from .trading_calendar import (
     get_trading_calendar,
     reset_trading_calendar
 )
+from .session_slots import SessionSlots, get_session_slots
 
 __all__ = [
     'KlineProcessor',
@@ -33,5 +34,7 @@ __all__ = [
     'get_previous_n_trading_days',
     'TradingCalendar',
     'get_trading_calendar',
-    'reset_trading_calendar'
+    'reset_trading_calendar',
+    'SessionSlots',
+    'get_session_slots'
 ]
\ No newline at end of file
@@ -10,6 +10,7 @@
 3. 综合分析：走势预测、交易信号生成、风险评估
 """
 
+import time
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional, Tuple, Any, Union
@@ -82,6 +83,9 @@ class ChanAnalysisResult:
     stop_loss: Optional[float] = None
     take_profit: Optional[float] = None
     
+    # 各阶段耗时（秒）：data_loading / kline_processing / bi / seg / zhongshu / dynamics / comprehensive
+    stage_timings: Dict[str, float] = field(default_factory=dict)
+    
     def get_statistics(self) -> Dict[str, Any]:
         """获取分析统计信息"""
         return {
@@ -181,10 +185,12 @@ class ChanEngine:
         )
         
         # 数据预处理
+        started = time.perf_counter()
         if isinstance(data, list):
             result.klines = KLineList.from_mongo_data(data, time_level)
         else:
             result.klines = data
+        result.stage_timings['data_loading'] = time.perf_counter() - started
         
         if len(result.klines) < 10:
             raise ValueError(f"数据量不足：需要至少10条K线，当前只有{len(result.klines)}条")
@@ -194,14 +200,18 @@ class ChanEngine:
         
         # 根据分析级别执行相应分析
         if analysis_level in [AnalysisLevel.STANDARD, AnalysisLevel.ADVANCED, AnalysisLevel.COMPLETE]:
+            started = time.perf_counter()
             self._perform_dynamics_analysis(result)
+            result.stage_timings['dynamics'] = time.perf_counter() - started
         
         if analysis_level in [AnalysisLevel.ADVANCED, AnalysisLevel.COMPLETE]:
             # 多级别分析需要额外数据，这里暂时跳过
             pass
         
         if analysis_level == AnalysisLevel.COMPLETE:
+            started = time.perf_counter()
             self._perform_comprehensive_analysis(result)
+            result.stage_timings['comprehensive'] = time.perf_counter() - started
         
         # 缓存结果
         cache_key = f"{symbol}_{time_level.value}_{analysis_level.value}"
@@ -327,25 +337,35 @@ class ChanEngine:
     
     def _perform_morphology_analysis(self, result: ChanAnalysisResult) -> None:
         """执行形态学分析"""
+        timings = result.stage_timings
+        
         # K线处理和分型识别
+        started = time.perf_counter()
         processed_klines, fenxings = self.kline_processor.process_klines(result.klines)
         result.processed_klines = processed_klines  # KlineProcessor已返回KLineList
         result.fenxings = fenxings  # KlineProcessor已返回FenXingList
+        timings['kline_processing'] = time.perf_counter() - started
         
         # 构建笔
+        started = time.perf_counter()
         if len(fenxings) >= 2:
             bis = self.bi_builder.build_from_fenxings(fenxings.fenxings)  # 传递fenxing列表
             result.bis = BiList(bis)
+        timings['bi'] = time.perf_counter() - started
         
         # 构建线段
+        started = time.perf_counter()
         if len(result.bis) >= 3:
             segs = self.seg_builder.build_from_bis(result.bis.bis)
             result.segs = SegList(segs, result.time_level)
+        timings['seg'] = time.perf_counter() - started
         
         # 构建中枢
+        started = time.perf_counter()
         if len(result.segs) >= 3:
             zhongshus = self.zhongshu_builder.build_from_segs(result.segs.segs)
             result.zhongshus = ZhongShuList(zhongshus)
+        timings['zhongshu'] = time.perf_counter() - started
     
     def _perform_dynamics_analysis(self, result: ChanAnalysisResult) -> None:
         """执行动力学分析"""
@@ -48,19 +48,23 @@ class Gap:
     end_kline: KLine            # 缺口后K线
     can_form_bi: bool = False   # 是否可成笔
     filled_after_bars: Optional[int] = None  # 几根K线后回补（None表示未回补）
+    missing_bars: Optional[int] = None  # 两根K线之间缺失的K线数（需传入 session_slots，None表示未检查）
 
 
 class GapProcessor:
     """跳空缺口处理器"""
     
-    def __init__(self, time_level: TimeLevel = TimeLevel.MIN_30):
+    def __init__(self, time_level: TimeLevel = TimeLevel.MIN_30, session_slots=None):
         """
         初始化缺口处理器
         
         Args:
             time_level: 时间级别
+            session_slots: 日内槽位模型（core/session_slots.py），传入时为分钟级缺口标注缺失K线数，
+                           用于区分真实跳空与数据缺失
         """
         self.time_level = time_level
+        self.session_slots = session_slots
         
         # 根据缠论标准设置缺口成笔阈值
         self.gap_thresholds = self._get_gap_thresholds()
@@ -155,6 +159,13 @@ class GapProcessor:
             gap_size_points = prev_kline.low - curr_kline.high
             gap_size_percent = gap_size_points / prev_kline.low * 100
         
+        missing_bars = None
+        if self.session_slots is not None and gap_type != GapType.NO_GAP:
+            prev_slot = self.session_slots.index(prev_kline.timestamp)
+            curr_slot = self.session_slots.index(curr_kline.timestamp)
+            if prev_slot is not None and curr_slot is not None:
+                missing_bars = max(curr_slot - prev_slot - 1, 0)
+        
         return Gap(
             gap_type=gap_type,
             gap_direction=GapDirection.SAME_DIRECTION,  # 暂时设为顺势，需要结合趋势判断
@@ -163,7 +174,8 @@ class GapProcessor:
             start_kline_index=prev_index,
             end_kline_index=curr_index,
             start_kline=prev_kline,
-            end_kline=curr_kline
+            end_kline=curr_kline,
+            missing_bars=missing_bars
         )
     
     def _can_gap_form_bi(self, gap: Gap, klines: KLineList, is_index: bool) -> bool:
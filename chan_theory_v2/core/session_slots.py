@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+A股日内时段槽位模型
+把分钟K线时间映射为稠密的 (交易日序号, 日内槽位) 整数索引：
+    index = 交易日序号 * 每日槽位数 + 日内槽位
+
+交易时段 09:30-11:30、13:00-15:00，K线按结束时间标记（与数据库 trade_time 一致）：
+    5分钟  每日48个槽位  09:35 … 11:30, 13:05 … 15:00
+    30分钟 每日8个槽位   10:00 10:30 11:00 11:30 13:30 14:00 14:30 15:00
+    日线   每日1个槽位   按 trade_date 标记（DailySlots）
+
+“t1~t2 之间应有多少根K线” 通过两次O(1)查表相减得到，用于缺失K线检测、重采样与定长数组分配
+"""
+
+from datetime import datetime, time, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from .trading_calendar import get_trading_calendar, _to_int_date, _to_datetime
+
+# A股连续竞价时段（开始, 结束）
+SESSIONS: List[Tuple[time, time]] = [(time(9, 30), time(11, 30)), (time(13, 0), time(15, 0))]
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def _minute_of_day(value: time) -> int:
+    return value.hour * 60 + value.minute
+
+
+class SessionSlots:
+    """指定周期的日内槽位模型"""
+
+    def __init__(self, freq_minutes: int, open_days: Optional[List[int]] = None):
+        """
+        Args:
+            freq_minutes: K线周期（分钟），需能整除每个交易时段，如 5、15、30、60
+            open_days: 开市日（YYYYMMDD 整数，升序）；默认取 TradingCalendar
+        """
+        self.freq = freq_minutes
+        self._slot_ends: List[int] = []  # 各槽位结束时间（当日分钟数）
+        for start, end in SESSIONS:
+            session_start, session_end = _minute_of_day(start), _minute_of_day(end)
+            if (session_end - session_start) % freq_minutes:
+                raise ValueError(f"周期 {freq_minutes} 分钟不能整除交易时段 {start}-{end}")
+            self._slot_ends.extend(range(session_start + freq_minutes, session_end + 1, freq_minutes))
+        self.slots_per_day = len(self._slot_ends)
+
+        # 当日分钟数 → 已结束的槽位数（标记时间 <= 该分钟的槽位数）
+        self._closed_by_minute = [0] * MINUTES_PER_DAY
+        # 当日分钟数 → 所属槽位（落在交易时段外为 -1）
+        self._slot_by_minute = [-1] * MINUTES_PER_DAY
+        slot = 0
+        for minute in range(MINUTES_PER_DAY):
+            while slot < self.slots_per_day and self._slot_ends[slot] <= minute:
+                slot += 1
+            self._closed_by_minute[minute] = slot
+        for slot, slot_end in enumerate(self._slot_ends):
+            for minute in range(slot_end - freq_minutes + 1, slot_end + 1):
+                self._slot_by_minute[minute] = slot
+
+        self._init_days(open_days)
+
+    def _init_days(self, open_days: Optional[List[int]]):
+        self._open_days = open_days
+        self._day_rank: Dict[int, int] = {}
+        self._open_set = set()
+        self._rank_source: Optional[List[int]] = None
+
+    # ==================== 交易日序号 ====================
+
+    def _days(self) -> List[int]:
+        if self._open_days is not None:
+            return self._open_days
+        return get_trading_calendar()._days()
+
+    def _ranks(self) -> Dict[int, int]:
+        """日历覆盖范围内每个自然日 → 此前的开市日数量（开市日的值即其序号）"""
+        days = self._days()
+        if self._rank_source is not days:
+            ranks: Dict[int, int] = {}
+            if days:
+                current, last = _to_datetime(days[0]), _to_datetime(days[-1])
+                open_set = set(days)
+                rank = 0
+                while current <= last:
+                    day = _to_int_date(current)
+                    ranks[day] = rank
+                    if day in open_set:
+                        rank += 1
+                    current += timedelta(days=1)
+            self._open_set = set(days)
+            self._day_rank = ranks
+            self._rank_source = days
+        return self._day_rank
+
+    def _rank(self, day: int) -> int:
+        """day之前的开市日数量（超出日历范围时取边界值）"""
+        rank = self._ranks().get(day)
+        if rank is not None:
+            return rank
+        days = self._days()
+        return 0 if not days or day < days[0] else len(days)
+
+    def _is_open(self, day: int) -> bool:
+        self._ranks()
+        return day in self._open_set
+
+    def slot_labels(self) -> List[str]:
+        """各槽位的标记时间 HH:MM"""
+        return [f"{minute // 60:02d}:{minute % 60:02d}" for minute in self._slot_ends]
+
+    # ==================== 单个时间 ====================
+
+    def slot_of(self, ts: datetime) -> Optional[int]:
+        """时间所属的日内槽位（按结束时间标记，09:30 整及午休、收盘后返回None）"""
+        if ts.second or ts.microsecond:
+            ts = ts.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        slot = self._slot_by_minute[ts.hour * 60 + ts.minute]
+        return slot if slot >= 0 else None
+
+    def index(self, ts: datetime) -> Optional[int]:
+        """时间 → 稠密槽位索引；非交易日或非交易时段返回None"""
+        day = _to_int_date(ts)
+        slot = self.slot_of(ts)
+        if slot is None or not self._is_open(day):
+            return None
+        return self._rank(day) * self.slots_per_day + slot
+
+    def timestamp(self, index: int) -> datetime:
+        """稠密槽位索引 → K线结束时间"""
+        day_rank, slot = divmod(index, self.slots_per_day)
+        day = _to_datetime(self._days()[day_rank])
+        return day + timedelta(minutes=self._slot_ends[slot])
+
+    def closed_before(self, ts: datetime) -> int:
+        """截至ts（含）已结束的槽位总数（从日历第一天起算）"""
+        day = _to_int_date(ts)
+        closed_today = self._closed_by_minute[ts.hour * 60 + ts.minute] if self._is_open(day) else 0
+        return self._rank(day) * self.slots_per_day + closed_today
+
+    def expected_bars(self, start: datetime, end: datetime) -> int:
+        """
+        [start, end] 内应有的K线根数（按K线结束时间计）
+        例：30分钟级别 当日 09:30 ~ 15:00 为 8 根，跨周末按交易日计算
+        """
+        if end < start:
+            return 0
+        return self.closed_before(end) - self.closed_before(start - timedelta(minutes=1))
+
+    def expected_timestamps(self, start: datetime, end: datetime) -> List[datetime]:
+        """[start, end] 内所有应有K线的结束时间"""
+        first = self.closed_before(start - timedelta(minutes=1))
+        last = self.closed_before(end)
+        return [self.timestamp(index) for index in range(first, last)]
+
+    def missing_bars(self, timestamps: List[datetime], start: Optional[datetime] = None,
+                     end: Optional[datetime] = None) -> List[datetime]:
+        """
+        与应有时间对比，返回缺失K线的结束时间
+
+        Args:
+            timestamps: 实际K线结束时间
+            start, end: 检查范围，默认取实际数据的首尾
+        """
+        if not timestamps:
+            return []
+        start = start or min(timestamps)
+        end = end or max(timestamps)
+        present = {self.index(ts) for ts in timestamps}
+        first = self.closed_before(start - timedelta(minutes=1))
+        last = self.closed_before(end)
+        return [self.timestamp(index) for index in range(first, last) if index not in present]
+
+
+class DailySlots(SessionSlots):
+    """日线：每个交易日一个槽位，按日期标记（当日任意时刻都视为该日K线已存在）"""
+
+    def __init__(self, open_days: Optional[List[int]] = None):
+        self.freq = None
+        self._slot_ends = [0]
+        self.slots_per_day = 1
+        self._closed_by_minute = [1] * MINUTES_PER_DAY
+        self._slot_by_minute = [0] * MINUTES_PER_DAY
+        self._init_days(open_days)
+
+
+# K线级别 → 周期（分钟），None 表示日线
+LEVEL_FREQ: Dict[str, Optional[int]] = {"daily": None, "30min": 30, "5min": 5}
+
+_slots_cache: Dict[Optional[int], SessionSlots] = {}
+
+
+def get_session_slots(freq_minutes: Optional[int]) -> SessionSlots:
+    """获取使用全局交易日历的槽位模型（按周期缓存，None 为日线）"""
+    slots = _slots_cache.get(freq_minutes)
+    if slots is None:
+        slots = SessionSlots(freq_minutes) if freq_minutes else DailySlots()
+        _slots_cache[freq_minutes] = slots
+    return slots
+
+
+def get_level_slots(level: str) -> SessionSlots:
+    """按K线级别（daily / 30min / 5min）获取槽位模型"""
+    return get_session_slots(LEVEL_FREQ[level])
@@ -6,6 +6,9 @@
 """
 
 import logging
+import threading
+import time
+from bisect import bisect_left, bisect_right
 from datetime import datetime, timedelta
 from typing import Optional, Union, List, Dict
 import sys
@@ -19,11 +22,33 @@ from database.db_handler import DBHandler
 
 logger = logging.getLogger(__name__)
 
+# 交易日历集合与交易所
+CALENDAR_COLLECTION = 'infrastructure_trading_calendar'
+CALENDAR_EXCHANGE = 'SSE'  # 上海证券交易所
+
+# 加载失败后的重试间隔（秒）
+LOAD_RETRY_SECONDS = 60
+
+
+def _to_int_date(date: Union[datetime, str]) -> int:
+    """日期标准化为 YYYYMMDD 整数（支持datetime/date、'YYYYMMDD'、'YYYY-MM-DD'）"""
+    if isinstance(date, str):
+        return int(date.replace('-', '')[:8])
+    return date.year * 10000 + date.month * 100 + date.day
+
+
+def _to_datetime(value: int) -> datetime:
+    return datetime(value // 10000, value // 100 % 100, value % 100)
+
 
 class TradingCalendar:
     """
     交易日历工具类
     提供交易日期相关的功能，如获取最近交易日、判断是否为交易日等
+
+    上交所日历在首次使用时整体加载为有序的 YYYYMMDD 整数数组，每天刷新一次，
+    所有查询在内存中二分查找完成（O(log n)，无数据库访问）；
+    另提供接受日期数组的向量化方法（需要numpy），供回测批量使用
     """
     
     def __init__(self, db_handler: Optional[DBHandler] = None):
@@ -34,9 +59,64 @@ class TradingCalendar:
             db_handler: 数据库处理器，如果为None则创建新的实例
         """
         self.db_handler = db_handler or DBHandler()
-        self._calendar_cache = {}
-        self._cache_expiry = datetime.now()
+        self._open_days: List[int] = []      # 开市日，升序
+        self._coverage = (0, 0)              # 日历覆盖的日期范围（含休市日）
+        self._loaded_on: Optional[int] = None
+        self._retry_at = 0.0                 # 加载失败后，下一次允许重试的时间（time.monotonic）
+        self._open_days_array = None         # numpy数组，向量化方法首次使用时创建
+        self._lock = threading.RLock()
+    
+    # ==================== 加载 ====================
+    
+    def refresh(self) -> int:
+        """从数据库重新加载日历，返回开市日数量（失败或日历为空时保留已加载的数据）"""
+        try:
+            cursor = self.db_handler.get_collection(CALENDAR_COLLECTION).find(
+                {'exchange': CALENDAR_EXCHANGE},
+                {'_id': 0, 'cal_date': 1, 'is_open': 1}
+            )
+            all_days = []
+            open_days = []
+            for item in cursor:
+                cal_date = item.get('cal_date')
+                if not cal_date:
+                    continue
+                day = _to_int_date(cal_date)
+                all_days.append(day)
+                if item.get('is_open', 0) == 1:
+                    open_days.append(day)
+        except Exception as e:
+            logger.error(f"加载交易日历失败: {e}")
+            return len(self._open_days)
+        if not open_days:
+            logger.error(f"加载交易日历失败: {CALENDAR_COLLECTION} 中没有 {CALENDAR_EXCHANGE} 的开市日")
+            return len(self._open_days)
         
+        with self._lock:
+            self._open_days = sorted(set(open_days))
+            self._coverage = (min(all_days), max(all_days)) if all_days else (0, 0)
+            self._loaded_on = _to_int_date(datetime.now())
+            self._open_days_array = None
+        logger.info(f"📅 交易日历已加载: {len(self._open_days)} 个交易日 ({self._coverage[0]} - {self._coverage[1]})")
+        return len(self._open_days)
+    
+    def _days(self) -> List[int]:
+        """
+        已加载的开市日（跨日后自动刷新）
+        加载失败时沿用已有数据（首次加载失败时为空），间隔 LOAD_RETRY_SECONDS 秒后再重试，
+        避免数据库不可用期间每次查询都访问数据库，也不会把空日历保留到下一个自然日
+        """
+        today = _to_int_date(datetime.now())
+        if self._loaded_on != today and time.monotonic() >= self._retry_at:
+            with self._lock:
+                if self._loaded_on != today and time.monotonic() >= self._retry_at:
+                    self.refresh()
+                    if self._loaded_on != today:
+                        self._retry_at = time.monotonic() + LOAD_RETRY_SECONDS
+        return self._open_days
+    
+    # ==================== 单个日期查询 ====================
+    
     def get_nearest_trading_date(self, target_date: Union[datetime, str], 
                                 direction: str = 'backward') -> Optional[datetime]:
         """
@@ -49,57 +129,20 @@ class TradingCalendar:
         Returns:
             最近的交易日，如果未找到则返回None
         """
-        # 标准化日期格式
-        if isinstance(target_date, str):
-            if '-' in target_date:
-                target_date = datetime.strptime(target_date, '%Y-%m-%d')
-            else:
-                target_date = datetime.strptime(target_date, '%Y%m%d')
-        
-        # 确保target_date只包含日期部分
-        target_date = datetime(target_date.year, target_date.month, target_date.day)
-        
-        # 转换为字符串格式用于查询
-        target_date_str = target_date.strftime('%Y%m%d')
-        
-        # 构建查询条件
-        query = {
-            'exchange': 'SSE',  # 上海证券交易所
-        }
+        days = self._days()
+        target = _to_int_date(target_date)
         
         if direction == 'backward':
             # 向前查找（小于等于目标日期的最近交易日）
-            query['cal_date'] = {'$lte': target_date_str}
-            query['is_open'] = 1
-            sort_direction = -1  # 降序
+            index = bisect_right(days, target) - 1
         else:
             # 向后查找（大于等于目标日期的最近交易日）
-            query['cal_date'] = {'$gte': target_date_str}
-            query['is_open'] = 1
-            sort_direction = 1  # 升序
+            index = bisect_left(days, target)
         
-        try:
-            # 查询交易日历
-            calendar_data = self.db_handler.find_data(
-                'infrastructure_trading_calendar', 
-                query,
-                sort=[('cal_date', sort_direction)],
-                limit=1
-            )
-            
-            if calendar_data and len(calendar_data) > 0:
-                cal_date = calendar_data[0]['cal_date']
-                # 确保返回datetime对象
-                if isinstance(cal_date, str):
-                    return datetime.strptime(cal_date, '%Y%m%d')
-                return cal_date
-            else:
-                logger.warning(f"未找到{target_date_str}附近的交易日")
-                return None
-                
-        except Exception as e:
-            logger.error(f"获取最近交易日失败: {e}")
-            return None
+        if 0 <= index < len(days):
+            return _to_datetime(days[index])
+        logger.warning(f"未找到{target}附近的交易日")
+        return None
     
     def is_trading_day(self, date: Union[datetime, str]) -> bool:
         """
@@ -111,36 +154,13 @@ class TradingCalendar:
         Returns:
             是否为交易日
         """
-        # 标准化日期格式
-        if isinstance(date, str):
-            if '-' in date:
-                date = datetime.strptime(date, '%Y-%m-%d')
-            else:
-                date = datetime.strptime(date, '%Y%m%d')
-        
-        # 确保date只包含日期部分
-        date = datetime(date.year, date.month, date.day)
-        date_str = date.strftime('%Y%m%d')
-        
-        try:
-            # 查询交易日历
-            calendar_data = self.db_handler.find_data(
-                'infrastructure_trading_calendar', 
-                {
-                    'cal_date': date_str,
-                    'exchange': 'SSE'
-                }
-            )
-            
-            if calendar_data and len(calendar_data) > 0:
-                return calendar_data[0].get('is_open', 0) == 1
-            else:
-                logger.warning(f"未找到日期{date_str}的交易日历数据")
-                return False
-                
-        except Exception as e:
-            logger.error(f"判断交易日失败: {e}")
+        days = self._days()
+        target = _to_int_date(date)
+        if not self._coverage[0] <= target <= self._coverage[1]:
+            logger.warning(f"未找到日期{target}的交易日历数据")
             return False
+        index = bisect_left(days, target)
+        return index < len(days) and days[index] == target
     
     def get_trading_dates(self, start_date: Union[datetime, str], 
                          end_date: Union[datetime, str]) -> List[datetime]:
@@ -154,53 +174,10 @@ class TradingCalendar:
         Returns:
             交易日列表
         """
-        # 标准化日期格式
-        if isinstance(start_date, str):
-            if '-' in start_date:
-                start_date = datetime.strptime(start_date, '%Y-%m-%d')
-            else:
-                start_date = datetime.strptime(start_date, '%Y%m%d')
-                
-        if isinstance(end_date, str):
-            if '-' in end_date:
-                end_date = datetime.strptime(end_date, '%Y-%m-%d')
-            else:
-                end_date = datetime.strptime(end_date, '%Y%m%d')
-        
-        # 确保只包含日期部分
-        start_date = datetime(start_date.year, start_date.month, start_date.day)
-        end_date = datetime(end_date.year, end_date.month, end_date.day)
-        
-        # 转换为字符串格式用于查询
-        start_date_str = start_date.strftime('%Y%m%d')
-        end_date_str = end_date.strftime('%Y%m%d')
-        
-        try:
-            # 查询交易日历
-            calendar_data = self.db_handler.find_data(
-                'infrastructure_trading_calendar', 
-                {
-                    'cal_date': {'$gte': start_date_str, '$lte': end_date_str},
-                    'exchange': 'SSE',
-                    'is_open': 1
-                },
-                sort=[('cal_date', 1)]
-            )
-            
-            # 转换为datetime列表
-            trading_dates = []
-            for item in calendar_data:
-                cal_date = item['cal_date']
-                if isinstance(cal_date, str):
-                    trading_dates.append(datetime.strptime(cal_date, '%Y%m%d'))
-                else:
-                    trading_dates.append(cal_date)
-            
-            return trading_dates
-                
-        except Exception as e:
-            logger.error(f"获取交易日列表失败: {e}")
-            return []
+        days = self._days()
+        lo = bisect_left(days, _to_int_date(start_date))
+        hi = bisect_right(days, _to_int_date(end_date))
+        return [_to_datetime(day) for day in days[lo:hi]]
     
     def get_previous_n_trading_days(self, date: Union[datetime, str], n: int) -> List[datetime]:
         """
@@ -211,46 +188,113 @@ class TradingCalendar:
             n: 交易日数量
             
         Returns:
-            交易日列表
+            交易日列表（按日期升序，包含date本身如果它是交易日）
         """
-        # 标准化日期格式
-        if isinstance(date, str):
-            if '-' in date:
-                date = datetime.strptime(date, '%Y-%m-%d')
-            else:
-                date = datetime.strptime(date, '%Y%m%d')
+        days = self._days()
+        hi = bisect_right(days, _to_int_date(date))
+        return [_to_datetime(day) for day in days[max(0, hi - n):hi]]
+    
+    # ==================== 向量化查询 ====================
+    
+    def _array(self):
+        import numpy as np
         
-        # 确保date只包含日期部分
-        date = datetime(date.year, date.month, date.day)
-        date_str = date.strftime('%Y%m%d')
+        days = self._days()
+        array = self._open_days_array
+        if array is None or len(array) != len(days):
+            array = np.asarray(days, dtype=np.int64)
+            self._open_days_array = array
+        return array
+    
+    @staticmethod
+    def to_int_dates(dates):
+        """
+        日期数组 → YYYYMMDD 整数数组
+        支持 datetime64、datetime/date、'YYYYMMDD'/'YYYY-MM-DD' 字符串、YYYYMMDD 整数
+        """
+        import numpy as np
         
-        try:
-            # 查询交易日历
-            calendar_data = self.db_handler.find_data(
-                'infrastructure_trading_calendar', 
-                {
-                    'cal_date': {'$lte': date_str},
-                    'exchange': 'SSE',
-                    'is_open': 1
-                },
-                sort=[('cal_date', -1)],
-                limit=n
-            )
-            
-            # 转换为datetime列表并按日期升序排序
-            trading_dates = []
-            for item in calendar_data:
-                cal_date = item['cal_date']
-                if isinstance(cal_date, str):
-                    trading_dates.append(datetime.strptime(cal_date, '%Y%m%d'))
-                else:
-                    trading_dates.append(cal_date)
-            
-            return sorted(trading_dates)
-                
-        except Exception as e:
-            logger.error(f"获取前N个交易日失败: {e}")
-            return []
+        values = np.asarray(dates)
+        if np.issubdtype(values.dtype, np.integer):
+            return values.astype(np.int64)
+        if values.dtype.kind in ('U', 'S', 'O') and values.size and isinstance(values.flat[0], str):
+            return np.char.replace(values.astype(str), '-', '').astype('U8').astype(np.int64)
+        days = values.astype('datetime64[D]')
+        ymd = np.datetime_as_string(days, unit='D')
+        return np.char.replace(ymd, '-', '').astype(np.int64)
+    
+    @staticmethod
+    def to_datetime64(int_dates):
+        """YYYYMMDD 整数数组 → datetime64[D] 数组（0 表示缺失，转换为 NaT）"""
+        import numpy as np
+        
+        values = np.asarray(int_dates, dtype=np.int64)
+        years = (values // 10000 - 1970).astype('datetime64[Y]').astype('datetime64[M]')
+        months = (values // 100 % 100 - 1).astype('timedelta64[M]')
+        days = (values % 100 - 1).astype('timedelta64[D]')
+        result = (years + months).astype('datetime64[D]') + days
+        result[values <= 0] = np.datetime64('NaT')
+        return result
+    
+    def is_open_mask(self, dates):
+        """每个日期是否为交易日（布尔数组）"""
+        import numpy as np
+        
+        array = self._array()
+        targets = self.to_int_dates(dates)
+        index = np.searchsorted(array, targets, side='left')
+        found = index < len(array)
+        mask = np.zeros(targets.shape, dtype=bool)
+        mask[found] = array[index[found]] == targets[found]
+        return mask
+    
+    def next_trading_days(self, dates, include_self: bool = True):
+        """
+        每个日期之后（include_self=True 时含当天）的第一个交易日
+        
+        Returns:
+            YYYYMMDD 整数数组，超出日历范围为 0
+        """
+        import numpy as np
+        
+        array = self._array()
+        index = np.searchsorted(array, self.to_int_dates(dates), side='left' if include_self else 'right')
+        valid = index < len(array)
+        result = np.zeros(index.shape, dtype=np.int64)
+        result[valid] = array[index[valid]]
+        return result
+    
+    def prev_trading_days(self, dates, include_self: bool = True):
+        """
+        每个日期之前（include_self=True 时含当天）的最近一个交易日
+        
+        Returns:
+            YYYYMMDD 整数数组，超出日历范围为 0
+        """
+        import numpy as np
+        
+        array = self._array()
+        index = np.searchsorted(array, self.to_int_dates(dates), side='right' if include_self else 'left') - 1
+        valid = index >= 0
+        result = np.zeros(index.shape, dtype=np.int64)
+        result[valid] = array[index[valid]]
+        return result
+    
+    def offset_trading_days(self, dates, n: int):
+        """
+        每个日期偏移 n 个交易日（非交易日先归到之前最近的交易日；n 为负表示向前）
+        
+        Returns:
+            YYYYMMDD 整数数组，超出日历范围为 0
+        """
+        import numpy as np
+        
+        array = self._array()
+        index = np.searchsorted(array, self.to_int_dates(dates), side='right') - 1 + n
+        valid = (index >= 0) & (index < len(array)) & (index - n >= 0)
+        result = np.zeros(index.shape, dtype=np.int64)
+        result[valid] = array[index[valid]]
+        return result
 
 
 # 单例模式，提供全局访问点
@@ -7,12 +7,14 @@
 
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import List, Optional, Dict, Any, Union, Iterator
+from typing import List, Optional, Dict, Any, Union, Iterator, TYPE_CHECKING
 from decimal import Decimal
-import pandas as pd
-import numpy as np
 from .enums import TimeLevel
 
+if TYPE_CHECKING:
+    # pandas仅在DataFrame互转时按需导入，避免拖慢API进程启动
+    import pandas as pd
+
 
 @dataclass
 class KLine:
@@ -296,8 +298,10 @@ class KLineList:
         """获取总成交额"""
         return sum(kline.amount or 0 for kline in self._klines)
     
-    def to_dataframe(self) -> pd.DataFrame:
+    def to_dataframe(self) -> 'pd.DataFrame':
         """转换为pandas DataFrame"""
+        import pandas as pd
+        
         if self.is_empty():
             return pd.DataFrame()
         
@@ -322,8 +326,10 @@ class KLineList:
         return df
     
     @classmethod
-    def from_dataframe(cls, df: pd.DataFrame, level: Optional[TimeLevel] = None) -> 'KLineList':
+    def from_dataframe(cls, df: 'pd.DataFrame', level: Optional[TimeLevel] = None) -> 'KLineList':
         """从pandas DataFrame创建K线列表"""
+        import pandas as pd
+        
         klines = []
         
         for timestamp, row in df.iterrows():
@@ -362,6 +368,7 @@ class KLineList:
             # 处理时间字段
             timestamp = item.get('trade_date') or item.get('datetime') or item.get('timestamp') or item.get('trade_time')
             if isinstance(timestamp, str):
+                import pandas as pd
                 timestamp = pd.to_datetime(timestamp)
             elif not isinstance(timestamp, datetime):
                 continue  # 跳过无效时间数据
@@ -23,6 +23,8 @@ from chan_theory_v2.models.kline import KLineList
 from chan_theory_v2.models.enums import TimeLevel
 from chan_theory_v2.core.trading_calendar import get_nearest_trading_date
 from database.db_handler import get_db_handler
+from database.kline_mirror import find_klines
+from database.time_fields import parse_kline_time
 
 logger = logging.getLogger(__name__)
 
@@ -517,15 +519,6 @@ class SimpleBackchiStockSelector:
     def _fetch_stock_data(self, symbol: str, time_level: TimeLevel, days: int):
         """获取股票数据（基于最近交易日）"""
         try:
-            if time_level == TimeLevel.MIN_30:
-                collection_name = "stock_kline_30min"
-            elif time_level == TimeLevel.MIN_5:
-                collection_name = "stock_kline_5min"
-            else:
-                collection_name = "stock_kline_daily"
-            
-            collection = self.db_handler.get_collection(collection_name)
-            
             # 获取最近的交易日作为结束日期
             current_date = datetime.now().date()
             end_trading_date = get_nearest_trading_date(current_date, direction='backward')
@@ -542,35 +535,23 @@ class SimpleBackchiStockSelector:
             
             if time_level == TimeLevel.DAILY:
                 # 日线数据使用trade_date字段（YYYYMMDD格式）
-                cursor = collection.find({
-                    "ts_code": symbol,
-                    "trade_date": {
-                        "$gte": start_date.strftime("%Y%m%d"),
-                        "$lte": end_date.strftime("%Y%m%d")
-                    }
-                }).sort("trade_date", 1)
+                start_str = start_date.strftime("%Y%m%d")
+                end_str = end_date.strftime("%Y%m%d")
             else:
                 # 分钟数据使用trade_time字段（YYYY-MM-DD HH:MM:SS格式）
-                start_datetime = datetime.combine(start_date, datetime.min.time())
-                end_datetime = datetime.combine(end_date, datetime.max.time())
-                
-                cursor = collection.find({
-                    "ts_code": symbol,
-                    "trade_time": {
-                        "$gte": start_datetime.strftime("%Y-%m-%d %H:%M:%S"),
-                        "$lte": end_datetime.strftime("%Y-%m-%d %H:%M:%S")
-                    }
-                }).sort("trade_time", 1)
+                start_str = datetime.combine(start_date, datetime.min.time()).strftime("%Y-%m-%d %H:%M:%S")
+                end_str = datetime.combine(end_date, datetime.max.time()).strftime("%Y-%m-%d %H:%M:%S")
+            
+            # KLINE_SOURCE=mirror 时优先读取本地列式镜像
+            cursor = find_klines(time_level.value, symbol, start=start_str, end=end_str,
+                                 db_handler=self.db_handler)
             
             # 转换为缠论引擎需要的格式
             data = []
             for doc in cursor:
                 try:
-                    # 根据时间级别处理不同的时间字段
-                    if time_level == TimeLevel.DAILY:
-                        timestamp = datetime.strptime(doc['trade_date'], '%Y%m%d')
-                    else:
-                        timestamp = datetime.strptime(doc['trade_time'], '%Y-%m-%d %H:%M:%S')
+                    # 根据时间级别处理不同的时间字段（优先使用原生 trade_dt 字段）
+                    timestamp = parse_kline_time(doc, 'trade_date' if time_level == TimeLevel.DAILY else 'trade_time')
                     
                     kline_data = {
                         'timestamp': timestamp,
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+API冷启动导入测试
+在全新解释器中以 -X importtime 导入 api.main：重量级模块不得在启动阶段加载，累计导入耗时不超过预算；
+首次请求创建分析服务时不得阻塞事件循环。详细的模块耗时排行见 scripts/profile_api_startup.py
+"""
+
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+API_DIR = os.path.join(PROJECT_ROOT, "api")
+
+# 启动阶段不应加载的模块（应在首次使用时按需导入）
+FORBIDDEN_MODULES = ["pandas", "chan_theory_v2.core.chan_engine", "database.db_handler", "api.chan_api_v2"]
+
+# 导入 api.main 的累计耗时预算（毫秒）：比 scripts/profile_api_startup.py 的默认预算留出机器波动余量，
+# 误加载 pandas 等重量级模块仍会超出；较慢的CI机器可通过环境变量放宽
+IMPORT_BUDGET_MS = float(os.getenv("API_IMPORT_BUDGET_MS", "2000"))
+
+
+@pytest.fixture(scope="module")
+def import_times():
+    """{模块: 累计导入耗时us}"""
+    # 与部署时一致：api 目录下的模块（routers 等）按顶层模块导入
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [PROJECT_ROOT, API_DIR, env.get("PYTHONPATH")]))
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import api.main"],
+                            cwd=PROJECT_ROOT, env=env, capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr[-2000:]
+
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        fields = line.split(":", 1)[1].split("|")
+        if len(fields) == 3:
+            modules[fields[2].strip()] = int(fields[1])
+    return modules
+
+
+def test_heavy_modules_are_not_imported_at_startup(import_times):
+    loaded = [name for name in FORBIDDEN_MODULES if name in import_times]
+    assert not loaded, f"启动阶段加载了应延迟导入的模块: {loaded}"
+
+
+def test_import_time_within_budget(import_times):
+    main_ms = import_times["api.main"] / 1000
+    assert main_ms <= IMPORT_BUDGET_MS, f"导入 api.main 累计 {main_ms:.1f}ms 超出预算 {IMPORT_BUDGET_MS:.0f}ms"
+
+
+def test_first_request_builds_service_off_the_event_loop(monkeypatch):
+    httpx = pytest.importorskip("httpx")
+    from fastapi import FastAPI
+    from api import routers
+
+    started, release = threading.Event(), threading.Event()
+    released = []
+
+    def slow_get_chan_api():
+        # 模拟首次创建服务时等待数据库连接
+        started.set()
+        released.append(release.wait(5))
+        return SimpleNamespace(get_symbols_list=lambda query: [])
+
+    monkeypatch.setattr(routers, "get_chan_api", slow_get_chan_api)
+    app = FastAPI()
+    app.include_router(routers.router)
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            stocks = asyncio.create_task(client.get("/stocks"))
+            await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+            health = await client.get("/health")
+            release.set()
+            return health, await stocks
+
+    health, stocks = asyncio.run(run())
+
+    assert health.status_code == 200 and stocks.status_code == 200
+    # 服务创建期间 /health 已返回，说明事件循环未被阻塞
+    assert released == [True]
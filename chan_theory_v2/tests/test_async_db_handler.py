@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+异步MongoDB处理器测试
+同一份数据分别经 DBHandler（mongomock）与 AsyncDBHandler（mongomock_motor，共享同一个内存库）读取，
+查询结果必须一致；迁移前（字符串时间字段）与迁移后（trade_dt）两条路径都覆盖。
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from database import time_fields
+from database.async_db_handler import AsyncDBHandler
+from database.db_handler import DB_NAME, DBHandler
+from database.time_fields import MIGRATIONS_COLLECTION, migration_id, with_native_time
+
+SYMBOLS = ["000001.SZ", "000002.SZ", "600000.SH"]
+DAYS = 40
+
+
+def _trading_days(count):
+    """最近count个工作日（含今天之前），升序"""
+    days, current = [], datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    while len(days) < count:
+        current -= timedelta(days=1)
+        if current.weekday() < 5:
+            days.append(current)
+    return sorted(days)
+
+
+def _bar(ts_code, field, value, i):
+    price = 10.0 + SYMBOLS.index(ts_code) + (i % 20) / 10.0
+    return {"ts_code": ts_code, field: value, "open": price, "high": price + 0.3,
+            "low": price - 0.3, "close": price + 0.1, "vol": 1000.0 + i, "amount": 1e4 + i}
+
+
+def _seed(db, native):
+    days = _trading_days(DAYS)
+    docs = {"stock_kline_daily": [], "stock_kline_30min": [], "stock_kline_5min": []}
+    for ts_code in SYMBOLS:
+        for i, day in enumerate(days):
+            docs["stock_kline_daily"].append(_bar(ts_code, "trade_date", day.strftime("%Y%m%d"), i))
+            for k in range(8):
+                t = day + timedelta(hours=10, minutes=30 * k)
+                docs["stock_kline_30min"].append(_bar(ts_code, "trade_time", t.strftime("%Y-%m-%d %H:%M:%S"), k))
+            for k in range(48):
+                t = day + timedelta(hours=9, minutes=35 + 5 * k)
+                docs["stock_kline_5min"].append(_bar(ts_code, "trade_time", t.strftime("%Y-%m-%d %H:%M:%S"), k))
+    for collection_name, items in docs.items():
+        if native:
+            items = [with_native_time(collection_name, doc) for doc in items]
+            db[MIGRATIONS_COLLECTION].insert_one({"_id": migration_id(collection_name), "status": "completed"})
+        db[collection_name].insert_many(items)
+    return days
+
+
+@pytest.fixture(params=[False, True], ids=["string_time", "native_time"])
+def handlers(request):
+    """(sync, async, 交易日列表)：两个处理器读取同一个 mongomock 内存库"""
+    time_fields.reset_native_time_cache()
+    client = mongomock.MongoClient()
+    days = _seed(client[DB_NAME], request.param)
+
+    sync_handler = DBHandler.__new__(DBHandler)
+    sync_handler.logger = sync_handler._setup_logger()
+    sync_handler.client = client
+    sync_handler.db = client[DB_NAME]
+    sync_handler.local_available = True
+
+    async_handler = AsyncDBHandler(client=mongomock_motor.AsyncMongoMockClient(mock_mongo_client=client))
+    yield sync_handler, async_handler, days
+    time_fields.reset_native_time_cache()
+
+
+def test_find_data_matches_sync(handlers):
+    sync_handler, async_handler, days = handlers
+    query = {"ts_code": "000002.SZ", "trade_date": {"$gte": days[5].strftime("%Y%m%d")}}
+    sort = [("trade_date", -1)]
+
+    expected = sync_handler.find_data("stock_kline_daily", query, sort=sort, limit=10)
+    result = asyncio.run(async_handler.find_data("stock_kline_daily", query, sort=sort, limit=10))
+
+    assert len(expected) == 10
+    assert result == expected
+
+
+def test_get_kline_data_matches_sync(handlers):
+    sync_handler, async_handler, _ = handlers
+
+    expected = sync_handler.get_kline_data("000001.SZ", 30)
+    result = asyncio.run(async_handler.get_kline_data("000001.SZ", 30))
+
+    assert expected is not None and len(expected) > 0
+    assert result.reset_index(drop=True).equals(expected.reset_index(drop=True))
+
+
+def test_get_latest_date_for_code_matches_sync(handlers):
+    sync_handler, async_handler, days = handlers
+
+    for collection_name, field in [("stock_kline_daily", "trade_date"), ("stock_kline_5min", "trade_time")]:
+        expected = sync_handler.get_latest_date_for_code(collection_name, "600000.SH", field)
+        result = asyncio.run(async_handler.get_latest_date_for_code(collection_name, "600000.SH", field))
+        assert result == expected
+        assert result.date() == days[-1].date()
+
+    assert asyncio.run(async_handler.get_latest_date_for_code("stock_kline_daily", "999999.SH")) is None
+
+
+def test_find_klines_bulk_matches_per_symbol_sync(handlers):
+    from database.kline_mirror import find_klines
+
+    sync_handler, async_handler, days = handlers
+    start = days[10].strftime("%Y-%m-%d 00:00:00")
+
+    result = asyncio.run(async_handler.find_klines_bulk("30min", SYMBOLS + ["999999.SH"], start=start, chunk_size=2))
+
+    assert sorted(result) == SYMBOLS
+    for ts_code in SYMBOLS:
+        expected = find_klines("30min", ts_code, start=start, db_handler=sync_handler)
+        assert len(expected) == (DAYS - 10) * 8
+        assert result[ts_code] == expected
+
+
+@pytest.fixture
+def chan_api(handlers, monkeypatch):
+    """使用测试处理器的 ChanDataAPIv2（日线窗口固定为种子数据的最近交易日）"""
+    chan_api_v2 = pytest.importorskip("api.chan_api_v2")
+    sync_handler, async_handler, days = handlers
+
+    api = chan_api_v2.ChanDataAPIv2()
+    api._db_handler = sync_handler
+    monkeypatch.setattr(chan_api_v2, "get_async_db_handler", lambda: async_handler)
+    monkeypatch.setattr(chan_api_v2, "use_mirror", lambda: False)
+    monkeypatch.setattr(chan_api_v2.ChanDataAPIv2, "_daily_date_range",
+                        lambda self, n: (days[-n].strftime("%Y%m%d"), days[-1].strftime("%Y%m%d")))
+    return chan_api_v2, api, async_handler
+
+
+def test_bulk_fetch_matches_sync(chan_api):
+    chan_api_v2, api, _ = chan_api
+
+    for time_level in [chan_api_v2.TimeLevel.DAILY, chan_api_v2.TimeLevel.MIN_30, chan_api_v2.TimeLevel.MIN_5]:
+        expected = api._fetch_stock_data_bulk(SYMBOLS, time_level, 20)
+        result = asyncio.run(api._fetch_stock_data_bulk_async(SYMBOLS, time_level, 20))
+        assert sorted(result) == SYMBOLS
+        assert result == expected
+
+
+def test_bulk_fetch_matches_single_symbol_for_sparse_symbols(chan_api, handlers):
+    """停牌（窗口内无K线）与数据稀疏的股票，批量结果也必须与逐只 last_n 查询相同"""
+    chan_api_v2, api, _ = chan_api
+    sync_handler, _, days = handlers
+    bars = []
+    for day in days[:15]:  # 停牌：最近K线早于批量窗口
+        for k in range(8):
+            t = day + timedelta(hours=10, minutes=30 * k)
+            bars.append(_bar("000001.SZ", "trade_time", t.strftime("%Y-%m-%d %H:%M:%S"), k) | {"ts_code": "000003.SZ"})
+    for day in days:  # 稀疏：每天只有2根
+        for k in range(2):
+            t = day + timedelta(hours=10, minutes=30 * k)
+            bars.append(_bar("000002.SZ", "trade_time", t.strftime("%Y-%m-%d %H:%M:%S"), k) | {"ts_code": "000004.SZ"})
+    sync_handler.db["stock_kline_30min"].insert_many([with_native_time("stock_kline_30min", bar) for bar in bars])
+    symbols = SYMBOLS + ["000003.SZ", "000004.SZ"]
+    time_level = chan_api_v2.TimeLevel.MIN_30
+
+    expected = {symbol: api._fetch_stock_data(symbol, time_level, 20) for symbol in symbols}
+    assert len(expected["000003.SZ"]) == 15 * 8 and len(expected["000004.SZ"]) == DAYS * 2
+
+    assert api._fetch_stock_data_bulk(symbols, time_level, 20) == expected
+    assert asyncio.run(api._fetch_stock_data_bulk_async(symbols, time_level, 20)) == expected
+
+
+def test_analyze_multi_level_async_fetches_levels_concurrently(chan_api, monkeypatch):
+    chan_api_v2, api, async_handler = chan_api
+    levels = ["daily", "30min", "5min"]
+
+    # 记录同时在途的 find_klines 调用数
+    in_flight, peak = [0], [0]
+    original_find_klines = async_handler.find_klines
+
+    async def tracking_find_klines(*args, **kwargs):
+        in_flight[0] += 1
+        peak[0] = max(peak[0], in_flight[0])
+        try:
+            await asyncio.sleep(0.01)
+            return await original_find_klines(*args, **kwargs)
+        finally:
+            in_flight[0] -= 1
+
+    monkeypatch.setattr(async_handler, "find_klines", tracking_find_klines)
+
+    # 截获传给分析阶段的各级别数据
+    captured = {}
+
+    def capture_level_data(self, symbol, levels, days, level_data):
+        captured.update(level_data)
+        return {"symbol": symbol}
+
+    monkeypatch.setattr(chan_api_v2.ChanDataAPIv2, "_analyze_level_data", capture_level_data)
+
+    result = asyncio.run(api.analyze_multi_level_async("000001.SZ", levels, days=20))
+
+    assert result == {"symbol": "000001.SZ"}
+    assert peak[0] == 3
+    assert set(captured) == {api._get_time_level(level) for level in levels}
+    for time_level, data in captured.items():
+        assert data == api._fetch_stock_data("000001.SZ", time_level, 20)
+        assert len(data) > 0
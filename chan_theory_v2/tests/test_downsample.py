@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+K线降采样测试
+桶必须无缝覆盖全部K线，桶数不超过 max_points + 笔/线段端点数，分型/买卖点标记落在桶的时间上
+"""
+
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from api.downsample import apply_level_of_detail, plan_buckets
+
+
+def _assert_partition(buckets, length):
+    assert buckets[0][0] == 0 and buckets[-1][1] == length
+    for (_, end), (start, _) in zip(buckets, buckets[1:]):
+        assert end == start
+
+
+@pytest.mark.parametrize("length,max_points,anchor_count", [
+    (17520, 1000, 900), (17520, 1000, 40), (5000, 100, 3000), (500, 200, 0), (300, 2, 300),
+])
+def test_plan_buckets_bound(length, max_points, anchor_count):
+    rng = random.Random(length + anchor_count)
+    anchors = rng.sample(range(length), anchor_count)
+
+    buckets = plan_buckets(length, max_points, anchors)
+
+    _assert_partition(buckets, length)
+    assert len(buckets) <= max_points + len(set(anchors))
+    starts = {start for start, _ in buckets}
+    assert set(anchors) <= starts
+    if anchor_count < max_points:
+        assert len(buckets) <= max_points + 1
+
+
+def _frontend_data(length, fenxing_every, bi_every):
+    start = datetime(2024, 1, 2, 9, 35)
+    categories = [(start + timedelta(minutes=5 * i)).strftime("%Y-%m-%d %H:%M:%S") for i in range(length)]
+    values = [[10.0, 10.1, 9.9 - (i % 7) * 0.01, 10.2 + (i % 5) * 0.01] for i in range(length)]
+    fenxing = [{"coord": [categories[i], values[i][3]], "value": "顶"} for i in range(3, length, fenxing_every)]
+    bi_points = list(range(0, length, bi_every))
+    bi = [{"coords": [[categories[a], values[a][3]], [categories[b], values[b][2]]]}
+          for a, b in zip(bi_points, bi_points[1:])]
+    bsp = [{"coord": [categories[i], values[i][2]], "value": "1买"} for i in range(7, length, 97)]
+    return {
+        "chart_data": {
+            "kline": {"categories": categories, "values": values, "volumes": [1.0] * length},
+            "chan_structures": {"fenxing": fenxing, "bi": bi, "seg": [], "zhongshu": []},
+            "dynamics": {"buy_sell_points": bsp, "backchi": []},
+            "indicators": {},
+        }
+    }, len(bi_points)
+
+
+def test_fenxing_do_not_inflate_output_and_snap_to_buckets():
+    data, bi_endpoints = _frontend_data(length=17520, fenxing_every=4, bi_every=40)
+
+    result = apply_level_of_detail(data, 1000)
+
+    kline = result["chart_data"]["kline"]
+    assert len(kline["categories"]) <= 1000 + bi_endpoints
+    assert result["lod"]["original_count"] == 17520
+
+    categories = set(kline["categories"])
+    structures = result["chart_data"]["chan_structures"]
+    for point in structures["fenxing"] + result["chart_data"]["dynamics"]["buy_sell_points"]:
+        assert point["coord"][0] in categories
+    for line in structures["bi"]:
+        for timestamp, _ in line["coords"]:
+            assert timestamp in categories
+
+    # 标记所在桶的高低点包含其极值
+    index = {t: i for i, t in enumerate(kline["categories"])}
+    for point in structures["fenxing"]:
+        assert kline["values"][index[point["coord"][0]]][3] >= point["coord"][1]
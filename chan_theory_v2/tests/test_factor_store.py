@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+因子本地存储测试
+覆盖区间不得延伸到最新入库的 trade_date 之后；已覆盖的区间不再访问MongoDB；
+多进程同时登记时清单不丢失日期；limit 读取不读多余分区
+"""
+
+import multiprocessing
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+pytest.importorskip("pyarrow")
+
+from database import factor_store
+from database.factor_store import FACTOR_COLLECTION, FactorStore
+
+SYMBOLS = ["000001.SZ", "000002.SZ", "600000.SH"]
+TRADE_DATES = ["20240102", "20240103", "20240104", "20240105", "20240108"]
+
+
+class FakeDBHandler:
+    """get_collection 返回 mongomock 集合，并记录访问次数"""
+
+    def __init__(self):
+        self.calls = 0
+        self.collection = mongomock.MongoClient().db[FACTOR_COLLECTION]
+
+    def get_collection(self, name):
+        assert name == FACTOR_COLLECTION
+        self.calls += 1
+        return self.collection
+
+    def add_day(self, trade_date):
+        self.collection.insert_many([
+            {"ts_code": ts_code, "trade_date": trade_date, "pe": 10.0 + i, "pb": 1.0 + i, "close": float(trade_date[-2:])}
+            for i, ts_code in enumerate(SYMBOLS)
+        ])
+
+
+@pytest.fixture
+def store(tmp_path):
+    handler = FakeDBHandler()
+    for trade_date in TRADE_DATES:
+        handler.add_day(trade_date)
+    return FactorStore(root=str(tmp_path), db_handler=handler)
+
+
+def test_uncovered_returns_gaps_between_ranges(store):
+    store._record(ranges=[("20240101", "20240105"), ("20240110", "20240115")])
+
+    assert store._uncovered("20240103", "20240120") == [("20240106", "20240109"), ("20240116", "20240120")]
+    assert store._uncovered("20240102", "20240104") == []
+    assert store._uncovered("20231225", "20231231") == [("20231225", "20231231")]
+
+
+def test_sync_covers_up_to_latest_source_date(store):
+    result = store.sync("20240101", "20240110", workers=2)
+
+    assert result["dates"] == len(TRADE_DATES) and result["rows"] == len(TRADE_DATES) * len(SYMBOLS)
+    assert store.dates() == TRADE_DATES
+    assert store.read_manifest()["ranges"] == [["20240101", "20240108"]]
+    # 最新入库日期之后的日期保持未覆盖
+    assert store._uncovered("20240101", "20240110") == [("20240109", "20240110")]
+
+    # 已覆盖的区间不访问MongoDB
+    calls = store.db_handler.calls
+    assert store.sync("20240102", "20240108")["dates"] == 0
+    assert store.db_handler.calls == calls
+
+    # 数据补齐后再次同步
+    store.db_handler.add_day("20240109")
+    assert store.sync("20240101", "20240110")["dates"] == 1
+    assert store.dates() == TRADE_DATES + ["20240109"]
+    assert store.read_manifest()["ranges"] == [["20240101", "20240109"]]
+
+
+def test_ensure_dates_does_not_cover_dates_after_latest(store):
+    assert store.ensure_dates(["20240103", "20240106", "20240112"]) == ["20240103"]
+
+    assert store._covering_range("20240106") == ["20240106", "20240106"]  # 非交易日
+    assert store._covering_range("20240112") is None  # 可能尚未入库
+
+    store.db_handler.add_day("20240112")
+    assert store.ensure_dates(["20240103", "20240112"]) == ["20240112"]
+    assert store.has_date("20240112")
+
+
+def test_read_limit_stops_at_needed_partitions(store, monkeypatch):
+    store.sync("20240101", "20240110")
+    read_dates = []
+    original = store.read_table
+
+    def tracking_read_table(trade_date, columns=None, symbols=None):
+        read_dates.append(trade_date)
+        return original(trade_date, columns, symbols)
+
+    monkeypatch.setattr(store, "read_table", tracking_read_table)
+
+    df = store.read(columns=["pe", "missing"], symbols=SYMBOLS[:2], limit=3)
+
+    assert list(df.columns) == ["ts_code", "trade_date", "pe", "missing"]
+    assert df[["ts_code", "trade_date"]].values.tolist() == [
+        ["000001.SZ", "20240102"], ["000002.SZ", "20240102"], ["000001.SZ", "20240103"]]
+    assert df["missing"].isna().all()
+    assert read_dates == ["20240102", "20240103"]
+
+
+def test_read_with_empty_symbols_reads_nothing(store, monkeypatch):
+    store.sync("20240101", "20240110")
+
+    def fail_read(*args, **kwargs):
+        raise AssertionError("空股票列表不应读取分区")
+
+    monkeypatch.setattr(factor_store.pq, "read_table", fail_read)
+
+    df = store.read(columns=["pe"], symbols=[])
+    assert df.empty and list(df.columns) == ["ts_code", "trade_date", "pe"]
+
+
+def _record_dates(root, offset, count):
+    store = FactorStore(root=root, db_handler=object())
+    for i in range(count):
+        store._record([f"2024{offset + i:04d}"])
+
+
+def test_concurrent_processes_do_not_lose_manifest_dates(tmp_path):
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=_record_dates, args=(str(tmp_path), offset, 40)) for offset in (100, 500)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=60)
+        assert process.exitcode == 0
+
+    dates = FactorStore(root=str(tmp_path), db_handler=object()).dates()
+    assert dates == [f"2024{i:04d}" for i in list(range(100, 140)) + list(range(500, 540))]
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+相关性特征聚类测试
+向量化实现必须与原先的逐对建图 + 递归DFS选出相同的特征（含NaN相关系数、单特征分量、缺失值相同的情况）
+"""
+
+from collections import defaultdict
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+pytest.importorskip("scipy")
+
+from qlib_quantitative.core.feature_clustering import correlation_components, select_uncorrelated_features
+
+
+def dfs_select(features, corr_matrix, missing_counts, threshold):
+    """原 MarioMLBuyFactor.feature_selection 中的实现"""
+    graph = defaultdict(list)
+    n = len(features)
+    for i in range(n):
+        for j in range(i + 1, n):
+            col1, col2 = features[i], features[j]
+            corr_value = corr_matrix.iloc[i, j]
+            if not pd.isna(corr_value) and abs(corr_value) > threshold:
+                graph[col1].append(col2)
+                graph[col2].append(col1)
+
+    visited = set()
+    components = []
+
+    def dfs(node, comp):
+        visited.add(node)
+        comp.append(node)
+        for neighbor in graph[node]:
+            if neighbor not in visited:
+                dfs(neighbor, comp)
+
+    for feature in features:
+        if feature not in visited:
+            comp = []
+            dfs(feature, comp)
+            components.append(comp)
+
+    selected_features = []
+    for comp in components:
+        if len(comp) == 1:
+            selected_features.append(comp[0])
+        else:
+            selected_features.append(sorted(comp, key=lambda x: (missing_counts[x], x))[0])
+    return selected_features
+
+
+def _random_case(rng, n, nan_rate):
+    values = rng.uniform(-1, 1, size=(n, n))
+    values = (values + values.T) / 2
+    values[rng.random((n, n)) < nan_rate] = np.nan
+    np.fill_diagonal(values, 1.0)
+    # 名称顺序与位置顺序不一致，检验按名称打破平局
+    features = [f"f{int(k):03d}" for k in rng.permutation(n)]
+    corr = pd.DataFrame(values, index=features, columns=features)
+    missing = {feature: int(rng.integers(0, 4)) for feature in features}
+    return features, corr, missing
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_matches_dfs_on_random_matrices(seed):
+    rng = np.random.default_rng(seed)
+    features, corr, missing = _random_case(rng, int(rng.integers(1, 40)), nan_rate=rng.choice([0.0, 0.1, 0.5]))
+    threshold = float(rng.choice([0.3, 0.6, 0.8, 0.95]))
+
+    assert select_uncorrelated_features(features, corr, missing, threshold) == \
+        dfs_select(features, corr, missing, threshold)
+
+
+def test_nan_correlations_leave_singletons():
+    features = ["a", "b", "c", "d"]
+    values = np.full((4, 4), np.nan)
+    np.fill_diagonal(values, 1.0)
+    corr = pd.DataFrame(values, index=features, columns=features)
+    missing = {"a": 3, "b": 0, "c": 1, "d": 0}
+
+    assert list(correlation_components(corr, 0.6)) == [0, 1, 2, 3]
+    assert select_uncorrelated_features(features, corr, missing, 0.6) == features == \
+        dfs_select(features, corr, missing, 0.6)
+
+
+def test_components_pick_least_missing_then_name():
+    features = ["x", "b", "a", "solo", "c"]
+    corr = pd.DataFrame(np.eye(5), index=features, columns=features)
+    corr.loc["x", "a"] = corr.loc["a", "x"] = 0.9     # x-a 相连
+    corr.loc["a", "b"] = corr.loc["b", "a"] = -0.7    # a-b 负相关同样相连
+    corr.loc["solo", "c"] = corr.loc["c", "solo"] = 0.6  # 恰好等于阈值不相连
+    missing = {"x": 1, "b": 1, "a": 2, "solo": 0, "c": 5}
+
+    expected = ["b", "solo", "c"]
+    assert select_uncorrelated_features(features, corr, missing, 0.6) == expected
+    assert dfs_select(features, corr, missing, 0.6) == expected
+
+
+def test_empty_features():
+    assert select_uncorrelated_features([], pd.DataFrame(), {}, 0.6) == []
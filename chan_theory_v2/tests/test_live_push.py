@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+实时结构推送测试
+使用 LocalBarFeed 回放本地K线，通过 Starlette TestClient 的WebSocket接收快照与增量推送；
+行情源初始化失败、发送失败时分析流与连接必须被注销
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("httpx")
+from fastapi import FastAPI, WebSocket
+from fastapi.testclient import TestClient
+
+from api.chan_api_v2 import ChanDataAPIv2
+from api.live_push import BarFeed, LiveStructureHub, LocalBarFeed
+
+SYMBOL = "000001.SZ"
+LEVEL = "30min"
+HISTORY_BARS = 80
+REPLAY_BARS = 5
+
+
+def _bars(count):
+    start = datetime(2024, 1, 2, 10, 0)
+    bars = []
+    for i in range(count):
+        price = 10.0 + (i % 13) * 0.25 - (i % 7) * 0.15
+        bars.append({"timestamp": start + timedelta(minutes=30 * i), "open": price, "high": price + 0.4,
+                     "low": price - 0.4, "close": price + 0.1, "volume": 1000.0 + i, "amount": 1e4})
+    return bars
+
+
+@pytest.fixture
+def chan_api(monkeypatch):
+    """不访问数据库的API：历史K线来自本地数据，最新结构物化表为空实现"""
+    api = ChanDataAPIv2()
+    history = _bars(HISTORY_BARS)
+    monkeypatch.setattr(api, "_fetch_stock_data", lambda symbol, time_level, days: list(history))
+    api._latest_structure = SimpleNamespace(upsert=lambda symbol, level, summary: None)
+    return api
+
+
+def _client(hub):
+    app = FastAPI()
+
+    @app.websocket("/ws/live")
+    async def live(websocket: WebSocket):
+        await hub.handle_connection(websocket)
+
+    return TestClient(app)
+
+
+def test_local_feed_pushes_snapshot_and_updates(chan_api):
+    feed = LocalBarFeed(chan_api, replay_bars=REPLAY_BARS, interval=0.01)
+    hub = LiveStructureHub(chan_api, feed=feed, max_workers=1)
+    replayed = _bars(HISTORY_BARS)[-REPLAY_BARS:]
+
+    with _client(hub) as client:
+        with client.websocket_connect("/ws/live") as websocket:
+            websocket.send_json({"action": "subscribe", "symbols": [SYMBOL], "levels": [LEVEL]})
+
+            snapshot = websocket.receive_json()
+            assert snapshot["type"] == "snapshot"
+            assert snapshot["bar_count"] == HISTORY_BARS - REPLAY_BARS
+            assert snapshot["bi"]["items"]
+
+            updates = [websocket.receive_json() for _ in range(REPLAY_BARS)]
+            assert [u["type"] for u in updates] == ["update"] * REPLAY_BARS
+            assert [u["bar"]["time"] for u in updates] == [b["timestamp"].strftime("%Y-%m-%d %H:%M") for b in replayed]
+            assert all(u["symbol"] == SYMBOL and u["level"] == LEVEL for u in updates)
+
+            assert list(hub.streams) == [(SYMBOL, LEVEL)]
+    assert not hub.streams and not hub.connections
+
+
+class FailingFeed(LocalBarFeed):
+    async def watch(self, symbol, level):
+        raise ConnectionError("feed unavailable")
+
+
+def test_watch_failure_unregisters_stream(chan_api):
+    hub = LiveStructureHub(chan_api, feed=FailingFeed(chan_api), max_workers=1)
+
+    with _client(hub) as client:
+        with client.websocket_connect("/ws/live") as websocket:
+            websocket.send_json({"action": "subscribe", "symbols": [SYMBOL], "levels": [LEVEL]})
+            error = websocket.receive_json()
+            assert error["type"] == "error" and error["symbol"] == SYMBOL
+            assert not hub.streams
+
+            # 连接仍可继续使用
+            websocket.send_json({"action": "noop"})
+            assert websocket.receive_json()["type"] == "error"
+            assert len(hub.connections) == 1
+
+
+class BrokenSocket:
+    """接收一次订阅后一直等待；发送总是失败"""
+
+    def __init__(self):
+        self.messages = [{"action": "subscribe", "symbols": [SYMBOL], "levels": [LEVEL]}]
+        self.closed_with = None
+
+    async def accept(self):
+        pass
+
+    async def receive_json(self):
+        if self.messages:
+            return self.messages.pop(0)
+        await asyncio.Event().wait()
+
+    async def send_text(self, text):
+        raise RuntimeError("socket gone")
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+
+def test_send_failure_closes_and_unregisters_connection(chan_api):
+    hub = LiveStructureHub(chan_api, feed=LocalBarFeed(chan_api, interval=60), max_workers=1)
+    websocket = BrokenSocket()
+
+    async def run():
+        await asyncio.wait_for(hub.handle_connection(websocket), timeout=30)
+        await hub.stop()
+
+    asyncio.run(run())
+
+    assert websocket.closed_with == 1011
+    assert not hub.connections
+    assert not hub.streams
+
+
+def test_incomplete_feed_fails_at_construction():
+    class WatchOnlyFeed(BarFeed):
+        async def watch(self, symbol, level):
+            return []
+
+    with pytest.raises(TypeError):
+        WatchOnlyFeed()
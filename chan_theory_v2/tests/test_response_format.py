@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+响应编码测试
+orjson 需与标准json一样接受整数键和numpy数值；pyarrow 只在Arrow编码时导入
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from api.response_format import MEDIA_ARROW, arrow_available, encode_json, render
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def test_encode_json_accepts_int_keys_and_numpy():
+    pytest.importorskip("orjson")
+    np = pytest.importorskip("numpy")
+    payload = {"lod": {0: [0, 5], 1: [5, 9]}, "close": np.array([1.5, 2.0]), "count": np.int64(3)}
+
+    assert json.loads(encode_json(payload)) == {"lod": {"0": [0, 5], "1": [5, 9]}, "close": [1.5, 2.0], "count": 3}
+
+
+def test_pyarrow_is_imported_lazily():
+    code = "import sys, api.response_format; print('pyarrow' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], cwd=PROJECT_ROOT, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "False"
+
+
+def test_arrow_encoding_round_trip():
+    if not arrow_available():
+        pytest.skip("pyarrow 未安装")
+    import pyarrow as pa
+
+    payload = {"chart_data": {"kline": {"categories": ["2024-01-02", "2024-01-03"],
+                                        "values": [[1.0, 2.0, 0.5, 2.5], [2.0, 1.5, 1.0, 2.2]],
+                                        "volumes": [10.0, 20.0]},
+                              "chan_structures": {}, "dynamics": {}, "indicators": {}}}
+
+    content, media_type = render(payload, accept=MEDIA_ARROW)
+
+    assert media_type == MEDIA_ARROW
+    table = pa.ipc.open_stream(content).read_all()
+    assert table.column("close").to_pylist() == [2.0, 1.5]
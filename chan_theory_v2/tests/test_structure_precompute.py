@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+结构预计算测试
+预计算经 analyze_batch 写入缓存，/analysis 命中缓存时返回的数据必须与未缓存时的分析结果相同
+（含停牌、数据稀疏的股票）
+"""
+
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+from database import time_fields
+from database.db_handler import DB_NAME, DBHandler
+from database.time_fields import with_native_time
+
+from chan_theory_v2.tests.test_async_db_handler import SYMBOLS, _bar, _seed
+
+SUSPENDED = "000003.SZ"
+DAYS = 20
+
+
+def _require_bulk_write():
+    """缓存写入使用 bulk_write(ReplaceOne)；较旧的 mongomock 不接受新版 pymongo 传入的参数"""
+    from pymongo import ReplaceOne
+
+    try:
+        mongomock.MongoClient().db.probe.bulk_write([ReplaceOne({"_id": 1}, {"_id": 1}, upsert=True)])
+    except TypeError as e:
+        pytest.skip(f"mongomock 与当前 pymongo 的 bulk_write 不兼容: {e}")
+
+
+@pytest.fixture
+def precomputer(monkeypatch):
+    """(预计算器, API)：读取同一个 mongomock 内存库，批量分析在当前进程执行"""
+    chan_api_v2 = pytest.importorskip("api.chan_api_v2")
+    precompute = pytest.importorskip("daily_structure_precompute")
+    _require_bulk_write()
+    time_fields.reset_native_time_cache()
+
+    client = mongomock.MongoClient()
+    days = _seed(client[DB_NAME], native=False)
+    suspended = []
+    for day in days[:15]:
+        for k in range(8):
+            t = day + timedelta(hours=10, minutes=30 * k)
+            suspended.append(_bar(SYMBOLS[0], "trade_time", t.strftime("%Y-%m-%d %H:%M:%S"), k) | {"ts_code": SUSPENDED})
+    client[DB_NAME]["stock_kline_30min"].insert_many([with_native_time("stock_kline_30min", bar) for bar in suspended])
+
+    handler = DBHandler.__new__(DBHandler)
+    handler.logger = handler._setup_logger()
+    handler.client = client
+    handler.db = client[DB_NAME]
+    handler.local_available = True
+
+    api = chan_api_v2.ChanDataAPIv2()
+    api._db_handler = handler
+    monkeypatch.setattr(chan_api_v2, "use_mirror", lambda: False)
+    monkeypatch.setattr(chan_api_v2, "BATCH_WORKERS", 1)
+    monkeypatch.setattr(chan_api_v2.ChanDataAPIv2, "_daily_date_range",
+                        lambda self, n: (days[-n].strftime("%Y%m%d"), days[-1].strftime("%Y%m%d")))
+
+    runner = precompute.StructurePrecomputer.__new__(precompute.StructurePrecomputer)
+    runner.logger = precompute.logging.getLogger("test_structure_precompute")
+    runner.levels, runner.days, runner.force = ["daily", "30min"], DAYS, False
+    runner.api = api
+    runner.cache = api.structure_cache
+    runner.latest_structure = api.latest_structure
+    runner.progress = api.db[precompute.PROGRESS_COLLECTION]
+    yield runner, api
+    time_fields.reset_native_time_cache()
+
+
+def _comparable(payload):
+    """经缓存的JSON编码往返，并去掉分析时刻"""
+    payload = json.loads(json.dumps(payload, ensure_ascii=False, default=str))
+    payload["meta"].pop("analysis_time", None)
+    return payload
+
+
+@pytest.mark.parametrize("level", ["daily", "30min"])
+def test_cached_payload_equals_fresh_analysis(precomputer, monkeypatch, level):
+    runner, api = precomputer
+    symbols = SYMBOLS + [SUSPENDED]
+    fresh = {symbol: api.analyze_symbol_complete(symbol, level, DAYS) for symbol in symbols}
+
+    runner._run_level(level, symbols, "20240101", datetime.now() + timedelta(hours=1))
+
+    # 之后的请求必须命中缓存，不再运行引擎
+    def engine_must_not_run(*args, **kwargs):
+        raise AssertionError("未命中预计算缓存")
+
+    monkeypatch.setattr(api.chan_engine, "analyze", engine_must_not_run)
+    for symbol in symbols:
+        if level == "daily" and symbol == SUSPENDED:
+            continue  # 只有分钟K线
+        cached = api.analyze_symbol_complete(symbol, level, DAYS)
+        assert cached["meta"]["data_count"] > 0
+        assert _comparable(cached) == _comparable(fresh[symbol])
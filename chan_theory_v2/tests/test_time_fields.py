@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+K线原生时间字段切换测试
+完成标记存在但仍有缺少 trade_dt 的记录时，范围查询必须继续使用字符串字段；
+时间格式异常的记录修正后重新运行迁移即可补齐并切换
+"""
+
+import asyncio
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+from database import time_fields
+from database.async_db_handler import AsyncDBHandler
+from database.db_handler import DB_NAME
+from database.migrate_time_fields import migrate_collection
+from database.time_fields import (
+    KLINE_TIME_FIELDS, MIGRATIONS_COLLECTION, NATIVE_TIME_FIELD, migration_id, native_time_ready,
+    time_range_query, with_native_time
+)
+
+COLLECTION = "stock_kline_daily"
+DATES = ["20240102", "20240103", "20240104", "20240105"]
+
+
+@pytest.fixture
+def db():
+    time_fields.reset_native_time_cache()
+    client = mongomock.MongoClient()
+    database = client[DB_NAME]
+    database[COLLECTION].insert_many(
+        [with_native_time(COLLECTION, {"ts_code": "000001.SZ", "trade_date": d}) for d in DATES])
+    database[MIGRATIONS_COLLECTION].insert_one({"_id": migration_id(COLLECTION), "status": "completed"})
+    yield database
+    time_fields.reset_native_time_cache()
+
+
+def _range_dates(db, start, end):
+    field, condition = time_range_query(db, COLLECTION, start, end)
+    return field, [doc["trade_date"] for doc in db[COLLECTION].find({field: condition}).sort(field, 1)]
+
+
+def test_switches_to_native_when_every_document_has_it(db):
+    assert _range_dates(db, "20240103", "20240105") == (NATIVE_TIME_FIELD, DATES[1:])
+
+
+@pytest.mark.parametrize("late_doc", [
+    {"ts_code": "000001.SZ", "trade_date": "20240108"},
+    {"ts_code": "000001.SZ", "trade_date": "20240108", NATIVE_TIME_FIELD: None},
+], ids=["missing", "null"])
+def test_falls_back_to_string_field_until_backfilled(db, late_doc, monkeypatch):
+    db[COLLECTION].insert_one(late_doc)
+
+    assert _range_dates(db, "20240103", "20240110") == ("trade_date", DATES[1:] + ["20240108"])
+
+    async_handler = AsyncDBHandler(client=mongomock_motor.AsyncMongoMockClient(mock_mongo_client=db.client))
+    docs = asyncio.run(async_handler.find_klines("daily", "000001.SZ", last_n=2))
+    assert [doc["trade_date"] for doc in docs] == ["20240105", "20240108"]
+
+    # 补齐后，复查间隔到期即切换回 trade_dt
+    db[COLLECTION].update_one({"trade_date": "20240108"},
+                              {"$set": {NATIVE_TIME_FIELD: time_fields.to_native(COLLECTION, "20240108")}})
+    assert _range_dates(db, "20240103", "20240110")[0] == "trade_date"
+    monkeypatch.setattr(time_fields, "NATIVE_RECHECK_SECONDS", 0)
+    assert _range_dates(db, "20240103", "20240110") == (NATIVE_TIME_FIELD, DATES[1:] + ["20240108"])
+
+
+class PipelineCollection:
+    """
+    mongomock 未实现 $dateFromString：按迁移管道的语义（格式异常时写入 null）在客户端执行更新，
+    其余操作直接转发给 mongomock 集合
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    def update_many(self, query, pipeline):
+        string_field, _ = KLINE_TIME_FIELDS[self.collection.name]
+        modified = 0
+        for doc in list(self.collection.find(query)):
+            try:
+                value = time_fields.to_native(self.collection.name, doc[string_field])
+            except (KeyError, TypeError, ValueError):
+                value = None
+            if NATIVE_TIME_FIELD not in doc or doc[NATIVE_TIME_FIELD] != value:
+                self.collection.update_one({"_id": doc["_id"]}, {"$set": {NATIVE_TIME_FIELD: value}})
+                modified += 1
+        return type("UpdateResult", (), {"modified_count": modified})()
+
+
+class PipelineDatabase:
+    def __init__(self, database):
+        self.database = database
+
+    def __getitem__(self, name):
+        collection = self.database[name]
+        return PipelineCollection(collection) if name in KLINE_TIME_FIELDS else collection
+
+
+def test_rerun_after_fixing_invalid_strings_switches_to_native():
+    time_fields.reset_native_time_cache()
+    database = mongomock.MongoClient()[DB_NAME]
+    database[COLLECTION].insert_many(
+        [{"ts_code": "000001.SZ", "trade_date": d} for d in DATES] + [{"ts_code": "000002.SZ", "trade_date": "2024/01/08"}])
+    db = PipelineDatabase(database)
+
+    first = migrate_collection(db, COLLECTION, workers=1)
+    assert (first["modified"], first["invalid"]) == (len(DATES) + 1, 1)
+    assert database[COLLECTION].find_one({"ts_code": "000002.SZ"})[NATIVE_TIME_FIELD] is None
+    assert not native_time_ready(database, COLLECTION)
+
+    # 修正异常数据后重跑：trade_dt 为 null 的记录也要被转换
+    database[COLLECTION].update_one({"ts_code": "000002.SZ"}, {"$set": {"trade_date": "20240108"}})
+    second = migrate_collection(db, COLLECTION, workers=1)
+    assert (second["modified"], second["invalid"]) == (1, 0)
+
+    time_fields.reset_native_time_cache()
+    assert native_time_ready(database, COLLECTION)
+    assert _range_dates(database, "20240103", "20240110") == (NATIVE_TIME_FIELD, DATES[1:] + ["20240108"])
+    time_fields.reset_native_time_cache()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+交易日历加载测试
+首次加载失败（数据库短暂不可用）时不能把空日历保留到下一个自然日，退避间隔后应重新加载
+"""
+
+from datetime import datetime
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+from chan_theory_v2.core import trading_calendar
+from chan_theory_v2.core.trading_calendar import CALENDAR_COLLECTION, TradingCalendar
+
+
+class FlakyHandler:
+    """前 failures 次 get_collection 抛出异常，之后返回 mongomock 集合"""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+        self.collection = mongomock.MongoClient().db[CALENDAR_COLLECTION]
+        self.collection.insert_many([
+            {"exchange": "SSE", "cal_date": day, "is_open": 0 if day in ("20240106", "20240107") else 1}
+            for day in ("20240104", "20240105", "20240106", "20240107", "20240108")
+        ])
+
+    def get_collection(self, name):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError("mongod unavailable")
+        return self.collection
+
+
+def test_failed_load_is_retried_after_backoff(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(trading_calendar.time, "monotonic", lambda: clock[0])
+    handler = FlakyHandler(failures=1)
+    calendar = TradingCalendar(db_handler=handler)
+
+    assert calendar.get_nearest_trading_date("20240107") is None
+    # 退避期间不再访问数据库
+    assert calendar.is_trading_day("20240105") is False
+    assert handler.calls == 1
+
+    clock[0] += trading_calendar.LOAD_RETRY_SECONDS
+    assert calendar.get_nearest_trading_date("20240107") == datetime(2024, 1, 5)
+    assert calendar.is_trading_day("20240108") is True
+    assert handler.calls == 2
+
+
+def test_empty_calendar_is_not_cached_for_the_day(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(trading_calendar.time, "monotonic", lambda: clock[0])
+    handler = FlakyHandler(failures=0)
+    saved = list(handler.collection.find({}, {"_id": 0}))
+    handler.collection.delete_many({})
+    calendar = TradingCalendar(db_handler=handler)
+
+    assert calendar.is_trading_day("20240105") is False
+
+    handler.collection.insert_many(saved)
+    clock[0] += trading_calendar.LOAD_RETRY_SECONDS
+    assert calendar.is_trading_day("20240105") is True
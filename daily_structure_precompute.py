@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+每日收盘后全市场缠论结构预计算脚本
+对全市场股票执行日线、30分钟级别的完整缠论分析，把结构摘要和完整前端数据写入
+analysis_structure_cache 集合，API直接读取（30分钟级别至下一交易日开盘，日线级别至下一次预计算），首次请求无需再做分析；
+同时刷新 analysis_latest_structure 物化表，供结构筛选接口使用
+
+运行方式：
+python daily_structure_precompute.py
+python daily_structure_precompute.py --levels daily,30min --days 90
+python daily_structure_precompute.py --force        # 忽略已完成的进度，全部重算
+
+断点续跑：
+同一交易日重复运行时，已写入缓存的股票会被跳过，只处理剩余部分；
+每个级别的进度与失败明细记录在 analysis_precompute_progress 集合中
+"""
+
+import sys
+import os
+import argparse
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Tuple
+import logging
+
+# 添加项目路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+
+from api.chan_api_v2 import ChanDataAPIv2, BATCH_MAX_SYMBOLS
+from api.structure_cache import encode_payload, PROGRESS_COLLECTION
+from chan_theory_v2.core import get_nearest_trading_date
+
+# 分钟级别的预计算结果在下一交易日开盘时失效（盘中有新K线）；
+# 日线级别盘中不变，有效至下一交易日的下一次预计算（与本次运行同一时刻），届时被新结果覆盖
+MARKET_OPEN = (9, 30)
+INTRADAY_LEVELS = {"30min", "5min"}
+# 进度记录中保留的失败明细条数
+MAX_RECORDED_FAILURES = 1000
+
+
+# 配置日志
+def setup_logging():
+    """设置日志配置"""
+    log_dir = os.path.join(current_dir, "logs")
+    os.makedirs(log_dir, exist_ok=True)
+
+    today = datetime.now().strftime("%Y%m%d")
+    log_file = os.path.join(log_dir, f"structure_precompute_{today}.log")
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.StreamHandler(),
+            logging.FileHandler(log_file, encoding='utf-8')
+        ]
+    )
+    return logging.getLogger(__name__)
+
+
+class StructurePrecomputer:
+    """全市场缠论结构预计算"""
+
+    def __init__(self, levels: List[str], days: int, force: bool = False):
+        """
+        初始化
+
+        Args:
+            levels: 预计算的时间级别
+            days: 分析天数（需与前端请求的天数一致才能命中缓存）
+            force: 是否忽略已完成的进度全部重算
+        """
+        self.logger = setup_logging()
+        self.levels = levels
+        self.days = days
+        self.force = force
+
+        self.api = ChanDataAPIv2()
+        self.cache = self.api.structure_cache
+        self.cache.ensure_indexes()
+        self.latest_structure = self.api.latest_structure
+        self.latest_structure.ensure_indexes()
+        self.progress = self.api.db[PROGRESS_COLLECTION]
+
+        self.logger.info("🚀 缠论结构预计算启动")
+        self.logger.info(f"📋 级别: {', '.join(levels)}, 分析天数: {days}{', 强制重算' if force else ''}")
+
+    def run(self) -> Dict[str, Any]:
+        """执行全部级别的预计算"""
+        start_time = datetime.now()
+        run_date, next_day = self._resolve_run_window()
+        symbols = sorted(doc['ts_code'] for doc in self.api._load_symbol_documents())
+        self.logger.info(f"📅 数据日期: {run_date}, 股票数: {len(symbols)}")
+
+        levels = {}
+        for level in self.levels:
+            expires_at = self._expires_at(level, next_day, start_time)
+            self.logger.info(f"⏳ {level} 缓存有效至: {expires_at:%Y-%m-%d %H:%M}")
+            levels[level] = self._run_level(level, symbols, run_date, expires_at)
+
+        duration = (datetime.now() - start_time).total_seconds()
+        self.logger.info(f"🎉 预计算完成，耗时 {duration:.1f}秒")
+        return {"run_date": run_date, "duration_seconds": duration, "levels": levels}
+
+    def _resolve_run_window(self) -> Tuple[str, datetime]:
+        """数据所属交易日，以及下一交易日"""
+        now = datetime.now()
+        run_day = get_nearest_trading_date(now, direction='backward') or now
+        next_day = get_nearest_trading_date(run_day + timedelta(days=1), direction='forward') or (run_day + timedelta(days=1))
+        return run_day.strftime('%Y%m%d'), next_day
+
+    @staticmethod
+    def _expires_at(level: str, next_day: datetime, started_at: datetime) -> datetime:
+        """缓存失效时间：分钟级别为下一交易日开盘，日线级别为下一交易日的下一次预计算"""
+        if level in INTRADAY_LEVELS:
+            return datetime(next_day.year, next_day.month, next_day.day, *MARKET_OPEN)
+        return datetime(next_day.year, next_day.month, next_day.day, started_at.hour, started_at.minute)
+
+    def _run_level(self, level: str, symbols: List[str], run_date: str, expires_at: datetime) -> Dict[str, Any]:
+        """预计算单个级别，按批次写入缓存并更新进度"""
+        progress_id = f"{run_date}_{level}_{self.days}"
+        done = set() if self.force else self.cache.completed_symbols(level, self.days, run_date)
+        pending = [symbol for symbol in symbols if symbol not in done]
+
+        self.logger.info("="*60)
+        self.logger.info(f"🎯 {level} 级别: 共 {len(symbols)} 只, 已完成 {len(done)} 只, 待处理 {len(pending)} 只")
+
+        # 续跑时保留已有计数，强制重算时清零
+        counters = {"started_at": datetime.now(), "processed": 0, "succeeded": 0, "failed": 0, "failures": []}
+        status = {
+            "run_date": run_date, "level": level, "days": self.days,
+            "status": "running", "total": len(symbols), "skipped": len(done),
+            "updated_at": datetime.now()
+        }
+        if self.force:
+            update = {"$set": {**status, **counters}}
+        else:
+            update = {"$set": status, "$setOnInsert": counters}
+        self.progress.update_one({"_id": progress_id}, update, upsert=True)
+
+        succeeded = failed = 0
+        for offset in range(0, len(pending), BATCH_MAX_SYMBOLS):
+            chunk = pending[offset:offset + BATCH_MAX_SYMBOLS]
+            # 批量取数与 /analysis 的单只取数K线相同，缓存结果与未缓存时的分析一致
+            batch = self.api.analyze_batch(chunk, level, self.days, include_payload=True)
+
+            documents = []
+            failures = []
+            computed_at = datetime.now()
+            for entry in batch['results']:
+                if entry['status'] == 'ok':
+                    documents.append({
+                        "ts_code": entry['symbol'],
+                        "level": level,
+                        "days": self.days,
+                        "run_date": run_date,
+                        "summary": entry['summary'],
+                        "payload": encode_payload(entry['payload']),
+                        "computed_at": computed_at,
+                        "expires_at": expires_at
+                    })
+                else:
+                    failures.append({"symbol": entry['symbol'], "error": entry.get('error', '')})
+
+            self.cache.put_many(documents)
+            self.latest_structure.upsert_many(level, {doc['ts_code']: doc['summary'] for doc in documents})
+            succeeded += len(documents)
+            failed += len(failures)
+
+            self.progress.update_one(
+                {"_id": progress_id},
+                {
+                    "$inc": {"processed": len(chunk), "succeeded": len(documents), "failed": len(failures)},
+                    "$push": {"failures": {"$each": failures, "$slice": -MAX_RECORDED_FAILURES}},
+                    "$set": {"updated_at": datetime.now()}
+                }
+            )
+            self.logger.info(f"📊 {level}: {min(offset + len(chunk), len(pending))}/{len(pending)} "
+                             f"(成功 {succeeded}, 失败 {failed}, 本批 {batch['meta']['elapsed_ms']:.0f}ms)")
+
+        self.progress.update_one(
+            {"_id": progress_id},
+            {"$set": {"status": "completed", "finished_at": datetime.now(), "updated_at": datetime.now()}}
+        )
+        self.logger.info(f"✅ {level} 级别完成: 成功 {succeeded}, 失败 {failed}, 跳过 {len(done)}")
+        return {"total": len(symbols), "skipped": len(done), "succeeded": succeeded, "failed": failed}
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='每日收盘后全市场缠论结构预计算')
+    parser.add_argument('--levels', default='daily,30min', help='时间级别，逗号分隔')
+    parser.add_argument('--days', type=int, default=90, help='分析天数（与前端默认请求一致）')
+    parser.add_argument('--force', action='store_true', help='忽略已完成的进度全部重算')
+    args = parser.parse_args()
+
+    print("🚀 缠论结构预计算")
+    print(f"运行时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+
+    try:
+        levels = [level.strip() for level in args.levels.split(',') if level.strip()]
+        precomputer = StructurePrecomputer(levels, args.days, args.force)
+        results = precomputer.run()
+
+        print("\n📈 预计算摘要")
+        for level, stats in results['levels'].items():
+            print(f"  • {level}: 成功 {stats['succeeded']}, 失败 {stats['failed']}, 跳过 {stats['skipped']} / 共 {stats['total']}")
+        print(f"⏱️ 耗时: {results['duration_seconds']:.1f}秒")
+
+    except KeyboardInterrupt:
+        print("\n⚠️ 用户中断程序（已完成的批次已写入，重新运行将从断点继续）")
+    except Exception as e:
+        print(f"❌ 程序异常: {e}")
+        import traceback
+        traceback.print_exc()
+
+if __name__ == "__main__":
+    main()
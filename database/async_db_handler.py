@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+异步MongoDB处理器（Motor）
+与 DBHandler 提供相同的查询方法，供FastAPI异步路由 await：
+    - 单个请求并发获取 5min/30min/daily 多个级别
+    - 批量接口把数百个分块查询在同一个连接池上并发执行
+连接池在首次查询时创建并绑定到当前事件循环，API进程内使用 get_async_db_handler() 单例。
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Optional, List, Dict, Any, Tuple, TYPE_CHECKING
+
+from database.db_handler import LOCAL_MONGO_URI, DB_NAME
+from database.kline_mirror import LEVELS
+from database.time_fields import (
+    KLINE_TIME_FIELDS, MIGRATIONS_COLLECTION, MISSING_NATIVE_QUERY, build_time_range, cached_native_ready,
+    migration_id
+)
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# 同时在途的查询数（不超过连接池大小）
+MAX_CONCURRENT_QUERIES = 32
+
+
+class AsyncDBHandler:
+    """本地MongoDB异步处理器"""
+
+    def __init__(self, uri: str = LOCAL_MONGO_URI, db_name: str = DB_NAME, client=None):
+        """
+        Args:
+            client: 已创建的异步客户端（测试时可传入 mongomock_motor 等替身）
+        """
+        self._uri = uri
+        self._db_name = db_name
+        self._client = client
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._native_ready: Dict[str, Tuple[bool, float]] = {}
+
+    @property
+    def client(self):
+        if self._client is None:
+            from motor.motor_asyncio import AsyncIOMotorClient
+
+            self._client = AsyncIOMotorClient(
+                self._uri,
+                serverSelectionTimeoutMS=30000,
+                connectTimeoutMS=30000,
+                socketTimeoutMS=120000,
+                maxPoolSize=50,
+                minPoolSize=10,
+                maxIdleTimeMS=60000,
+                retryWrites=True,
+                w=1
+            )
+            logger.info("🏠 异步MongoDB客户端已创建")
+        return self._client
+
+    @property
+    def db(self):
+        return self.client[self._db_name]
+
+    def get_collection(self, collection_name: str):
+        return self.db[collection_name]
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(MAX_CONCURRENT_QUERIES)
+        return self._semaphore
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    # ==================== 通用查询 ====================
+
+    async def find_data(self, collection_name: str, query: Dict, sort: List[tuple] = None,
+                        limit: int = None, projection: Dict = None) -> List[Dict]:
+        """查询数据库数据（与 DBHandler.find_data 相同，失败时返回空列表）"""
+        try:
+            cursor = self.get_collection(collection_name).find(query, projection)
+            if sort:
+                cursor = cursor.sort(sort)
+            if limit:
+                cursor = cursor.limit(limit)
+            async with self.semaphore:
+                return await cursor.to_list(length=None)
+        except Exception as e:
+            logger.error(f"查询数据失败: {e}")
+            return []
+
+    async def get_latest_date_for_code(self, collection_name: str, ts_code: str,
+                                       field: str = 'trade_date') -> Optional[datetime]:
+        """获取指定代码在指定集合中的最新交易日期"""
+        try:
+            async with self.semaphore:
+                latest_record = await self.get_collection(collection_name).find_one(
+                    {'ts_code': ts_code}, {field: 1}, sort=[(field, -1)]
+                )
+            if latest_record and field in latest_record:
+                trade_date = latest_record[field]
+                if isinstance(trade_date, str):
+                    return datetime.strptime(trade_date, '%Y-%m-%d %H:%M:%S' if '-' in trade_date else '%Y%m%d')
+                return trade_date
+            return None
+        except Exception as e:
+            logger.error(f"在 {collection_name} 中查询 {ts_code} 的最新日期失败: {e}")
+            return None
+
+    async def get_kline_data(self, stock_code: str, days: int) -> Optional['pd.DataFrame']:
+        """获取指定股票最近days天的日线（与 DBHandler.get_kline_data 相同）"""
+        import pandas as pd
+
+        start = (datetime.now() - timedelta(days=days)).strftime('%Y%m%d')
+        data = await self.find_klines("daily", stock_code, start=start, end=datetime.now().strftime('%Y%m%d'))
+        if not data:
+            return None
+
+        df = pd.DataFrame(data)
+        required_cols = ['trade_date', 'open', 'high', 'low', 'close', 'vol']
+        if not all(col in df.columns for col in required_cols):
+            logger.error("❌ K线数据缺少关键列")
+            return None
+        for col in ['open', 'high', 'low', 'close', 'vol']:
+            df[col] = pd.to_numeric(df[col])
+        return df
+
+    # ==================== K线加载 ====================
+
+    async def native_time_ready(self, collection_name: str) -> bool:
+        """集合是否可以按 trade_dt 查询（判断与缓存规则见 database/time_fields.py）"""
+        if collection_name not in KLINE_TIME_FIELDS:
+            return False
+        ready = cached_native_ready(self._native_ready, collection_name)
+        if ready is None:
+            try:
+                marker = await self.db[MIGRATIONS_COLLECTION].find_one(
+                    {"_id": migration_id(collection_name), "status": "completed"})
+                ready = marker is not None and await self.db[collection_name].find_one(
+                    MISSING_NATIVE_QUERY, {"_id": 1}) is None
+            except Exception as e:
+                logger.warning(f"⚠️ 读取迁移状态失败: {e}")
+                return False
+            self._native_ready[collection_name] = (ready, time.monotonic())
+        return ready
+
+    async def find_klines(self, level: str, ts_code: str, start: Optional[str] = None,
+                          end: Optional[str] = None, last_n: Optional[int] = None) -> List[Dict[str, Any]]:
+        """读取单只股票K线（按时间升序，参数与 kline_mirror.find_klines 相同）"""
+        collection_name, _ = LEVELS[level]
+        time_field, time_range = build_time_range(collection_name, start, end,
+                                                  await self.native_time_ready(collection_name))
+        query: Dict[str, Any] = {"ts_code": ts_code}
+        if time_range:
+            query[time_field] = time_range
+
+        if last_n:
+            docs = await self.find_data(collection_name, query, sort=[(time_field, -1)], limit=last_n)
+            docs.reverse()
+            return docs
+        return await self.find_data(collection_name, query, sort=[(time_field, 1)])
+
+    async def find_klines_bulk(self, level: str, symbols: List[str], start: Optional[str] = None,
+                               end: Optional[str] = None, chunk_size: int = 50,
+                               projection: Dict = None) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        批量读取多只股票K线：按 $in 分块，各分块并发查询
+
+        Returns:
+            {ts_code: 按时间升序的K线列表}
+        """
+        collection_name, _ = LEVELS[level]
+        time_field, time_range = build_time_range(collection_name, start, end,
+                                                  await self.native_time_ready(collection_name))
+
+        async def fetch_chunk(chunk: List[str]) -> List[Dict[str, Any]]:
+            query: Dict[str, Any] = {"ts_code": {"$in": chunk}}
+            if time_range:
+                query[time_field] = time_range
+            return await self.find_data(collection_name, query, sort=[("ts_code", 1), (time_field, 1)],
+                                        projection=projection)
+
+        chunks = [symbols[i:i + chunk_size] for i in range(0, len(symbols), chunk_size)]
+        data_by_symbol: Dict[str, List[Dict[str, Any]]] = {}
+        for docs in await asyncio.gather(*(fetch_chunk(chunk) for chunk in chunks)):
+            for doc in docs:
+                data_by_symbol.setdefault(doc["ts_code"], []).append(doc)
+        return data_by_symbol
+
+    async def find_klines_levels(self, ts_code: str, requests: Dict[str, Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        并发读取同一只股票的多个级别
+
+        Args:
+            requests: {level: find_klines 的关键字参数}，如 {"daily": {"start": ..., "end": ...}, "5min": {"last_n": 4320}}
+        """
+        levels = list(requests)
+        results = await asyncio.gather(*(self.find_klines(level, ts_code, **requests[level]) for level in levels))
+        return dict(zip(levels, results))
+
+
+_async_db_handler: Optional[AsyncDBHandler] = None
+
+
+def get_async_db_handler() -> AsyncDBHandler:
+    """获取异步数据库处理器单例"""
+    global _async_db_handler
+    if _async_db_handler is None:
+        _async_db_handler = AsyncDBHandler()
+    return _async_db_handler
+
+
+def close_async_db_handler():
+    """关闭异步处理器的连接池（未创建时无操作）"""
+    global _async_db_handler
+    if _async_db_handler is not None:
+        _async_db_handler.close()
+        _async_db_handler = None
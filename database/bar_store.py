@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+K线内存映射二进制存储
+每只股票、每个级别一个定长记录文件，通过 numpy.memmap 打开，按时间切片不拷贝数据，
+用于全市场选股、回测等吞吐量最高的读取路径。MongoDB始终是数据源。
+
+文件格式（{KLINE_BARS_DIR}/{level}/{ts_code}.bars，小端）：
+    头部 64 字节: magic(8) version(u4) record_size(u4) count(u8) last_ts(i8) synced_at(f8) 保留
+    记录区:       count 条定长记录（BAR_DTYPE），按 ts 严格升序
+
+并发与崩溃安全：
+    - 单写者：写入方持有 {file}.lock 的排他文件锁；读者不加锁，头部与记录区从同一个打开的文件读取，
+      并发的压缩重写替换路径后，读者仍映射打开时的旧文件
+    - 追加顺序：写记录 → fsync → 更新头部 count → fsync；读者只映射 count 条已提交记录，
+      崩溃留下的未提交尾部在下次写入时截断
+    - 压缩（修正历史K线、去重）写入新文件后原子替换，已打开的读者继续使用旧文件
+"""
+
+import fcntl
+import logging
+import os
+import struct
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional, TYPE_CHECKING
+
+import numpy as np
+
+# 添加项目根目录到路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from database.kline_mirror import LEVELS, PRICE_FIELDS, MIRROR_MAX_AGE
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+BARS_ROOT = os.getenv("KLINE_BARS_DIR", os.path.join(project_root, "data", "kline_bars"))
+
+MAGIC = b"KKBARS\x00\x01"
+VERSION = 1
+HEADER_SIZE = 64
+# magic, version, record_size, count, last_ts, synced_at
+HEADER_STRUCT = struct.Struct("<8sIIQqd")
+COUNT_OFFSET = 16
+
+# ts 为K线时间（按本地时间解释的epoch秒）
+BAR_DTYPE = np.dtype([("ts", "<i8")] + [(name, "<f8") for name in PRICE_FIELDS])
+
+
+def _to_epoch(time_value: str) -> int:
+    """'YYYYMMDD' / 'YYYY-MM-DD HH:MM:SS' → epoch秒"""
+    if "-" not in time_value:
+        time_value = f"{time_value[:4]}-{time_value[4:6]}-{time_value[6:8]}"
+    return int(np.datetime64(time_value.replace(" ", "T"), "s").astype(np.int64))
+
+
+def _format_times(ts: np.ndarray, level: str) -> List[str]:
+    """epoch秒 → 与MongoDB相同格式的时间字符串"""
+    values = np.datetime_as_string(ts.astype("datetime64[s]"), unit="s")
+    if level == "daily":
+        return [value[:10].replace("-", "") for value in values]
+    return [value.replace("T", " ") for value in values]
+
+
+class BarFile:
+    """单个 .bars 文件的读写"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    # ==================== 头部 ====================
+
+    def read_header(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.path, "rb") as f:
+                return self._parse_header(f.read(HEADER_STRUCT.size))
+        except FileNotFoundError:
+            return None
+
+    def _parse_header(self, raw: bytes) -> Optional[Dict[str, Any]]:
+        if len(raw) < HEADER_STRUCT.size:
+            return None
+        magic, version, record_size, count, last_ts, synced_at = HEADER_STRUCT.unpack(raw)
+        if magic != MAGIC or record_size != BAR_DTYPE.itemsize:
+            raise ValueError(f"无效的K线文件: {self.path}")
+        return {"version": version, "count": count, "last_ts": last_ts, "synced_at": synced_at}
+
+    @staticmethod
+    def _pack_header(count: int, last_ts: int, synced_at: float) -> bytes:
+        return HEADER_STRUCT.pack(MAGIC, VERSION, BAR_DTYPE.itemsize, count, last_ts, synced_at).ljust(HEADER_SIZE, b"\x00")
+
+    # ==================== 读取 ====================
+
+    def records(self) -> np.ndarray:
+        """映射全部已提交记录（只读memmap，不拷贝）"""
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return np.empty(0, dtype=BAR_DTYPE)
+        with f:
+            header = self._parse_header(f.read(HEADER_STRUCT.size))
+            count = header["count"] if header else 0
+            # 头部计数不应超过文件中的完整记录数，超出时只映射实际存在的部分，避免映射越过文件末尾
+            available = max(os.fstat(f.fileno()).st_size - HEADER_SIZE, 0) // BAR_DTYPE.itemsize
+            if count > available:
+                logger.warning(f"⚠️ K线文件记录数 {count} 超过实际大小 {available}: {self.path}")
+                count = available
+            if count == 0:
+                return np.empty(0, dtype=BAR_DTYPE)
+            return np.memmap(f, dtype=BAR_DTYPE, mode="r", offset=HEADER_SIZE, shape=(count,))
+
+    # ==================== 写入 ====================
+
+    @contextmanager
+    def _write_lock(self):
+        with open(f"{self.path}.lock", "a+") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def write(self, bars: np.ndarray, synced_at: Optional[float] = None) -> int:
+        """
+        写入K线（bars 需按 ts 升序）
+        比已提交最新时间更晚的K线直接追加；包含历史修正时合并后压缩重写
+
+        Returns:
+            新增或覆盖的条数
+        """
+        synced_at = synced_at if synced_at is not None else time.time()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        with self._write_lock():
+            header = self.read_header()
+            if header is None:
+                self._rewrite(_dedupe(bars), synced_at)
+                return len(bars)
+
+            if len(bars) and bars["ts"][0] <= header["last_ts"] and header["count"]:
+                merged = _dedupe(np.concatenate([np.array(self.records()), bars]))
+                self._rewrite(merged, synced_at)
+                return len(bars)
+
+            self._append(header, bars, synced_at)
+            return len(bars)
+
+    def _append(self, header: Dict[str, Any], bars: np.ndarray, synced_at: float):
+        committed_size = HEADER_SIZE + header["count"] * BAR_DTYPE.itemsize
+        fd = os.open(self.path, os.O_RDWR)
+        try:
+            # 截断上次崩溃留下的未提交尾部
+            if os.fstat(fd).st_size != committed_size:
+                os.ftruncate(fd, committed_size)
+            if len(bars):
+                os.pwrite(fd, np.ascontiguousarray(bars, dtype=BAR_DTYPE).tobytes(), committed_size)
+                os.fsync(fd)
+            count = header["count"] + len(bars)
+            last_ts = int(bars["ts"][-1]) if len(bars) else header["last_ts"]
+            # 头部单次写入，提交后读者才能看到新记录
+            os.pwrite(fd, self._pack_header(count, last_ts, synced_at), 0)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _rewrite(self, bars: np.ndarray, synced_at: float):
+        last_ts = int(bars["ts"][-1]) if len(bars) else 0
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(self._pack_header(len(bars), last_ts, synced_at))
+            f.write(np.ascontiguousarray(bars, dtype=BAR_DTYPE).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def compact(self) -> int:
+        """压缩：去重、排序并丢弃未提交尾部，返回记录数"""
+        with self._write_lock():
+            header = self.read_header()
+            if header is None:
+                return 0
+            bars = _dedupe(np.array(self.records()))
+            self._rewrite(bars, header["synced_at"])
+            return len(bars)
+
+
+def _dedupe(bars: np.ndarray) -> np.ndarray:
+    """按 ts 升序排序，同一时间保留最后出现的记录"""
+    if len(bars) == 0:
+        return bars
+    order = np.argsort(bars["ts"], kind="stable")
+    bars = bars[order]
+    keep = np.ones(len(bars), dtype=bool)
+    keep[:-1] = bars["ts"][1:] != bars["ts"][:-1]
+    return bars[keep]
+
+
+class BarStore:
+    """按级别/股票组织的 .bars 文件集合"""
+
+    def __init__(self, root: str = BARS_ROOT, db_handler=None):
+        self.root = root
+        self._db_handler = db_handler
+
+    @property
+    def db_handler(self):
+        if self._db_handler is None:
+            from database.db_handler import get_db_handler
+            self._db_handler = get_db_handler()
+        return self._db_handler
+
+    def bar_file(self, level: str, ts_code: str) -> BarFile:
+        return BarFile(os.path.join(self.root, level, f"{ts_code}.bars"))
+
+    def is_fresh(self, level: str, ts_code: str) -> bool:
+        """文件存在且在 MIRROR_MAX_AGE 内同步过"""
+        try:
+            header = self.bar_file(level, ts_code).read_header()
+        except ValueError:
+            return False
+        return bool(header) and time.time() - header["synced_at"] <= MIRROR_MAX_AGE.total_seconds()
+
+    # ==================== 读取 ====================
+
+    def window(self, level: str, ts_code: str, start: Optional[str] = None,
+               end: Optional[str] = None, last_n: Optional[int] = None) -> np.ndarray:
+        """
+        按时间窗口切片（闭区间），返回memmap视图，不拷贝数据
+
+        Args:
+            start, end: 与MongoDB时间字段同格式
+            last_n: 只取最近N根
+        """
+        bars = self.bar_file(level, ts_code).records()
+        lo = np.searchsorted(bars["ts"], _to_epoch(start), side="left") if start else 0
+        hi = np.searchsorted(bars["ts"], _to_epoch(end), side="right") if end else len(bars)
+        if last_n:
+            lo = max(lo, hi - last_n)
+        return bars[lo:hi]
+
+    def find_klines(self, level: str, ts_code: str, start: Optional[str] = None,
+                    end: Optional[str] = None, last_n: Optional[int] = None) -> List[Dict[str, Any]]:
+        """返回与MongoDB文档字段相同的字典列表（供 kline_mirror.find_klines 使用）"""
+        bars = self.window(level, ts_code, start, end, last_n)
+        _, time_field = LEVELS[level]
+        columns = {name: bars[name].tolist() for name in PRICE_FIELDS}
+        return [
+            {"ts_code": ts_code, time_field: time_value, **{name: columns[name][i] for name in PRICE_FIELDS}}
+            for i, time_value in enumerate(_format_times(bars["ts"], level))
+        ]
+
+    def get_kline_data(self, stock_code: str, days: int) -> Optional['pd.DataFrame']:
+        """
+        获取指定股票最近days天的日线（与 DBHandler.get_kline_data 接口一致）
+
+        Returns:
+            Optional[pd.DataFrame]: 包含K线数据的DataFrame，如果无数据则返回None
+        """
+        import pandas as pd
+
+        start = (datetime.now() - timedelta(days=days)).strftime("%Y%m%d")
+        bars = self.window("daily", stock_code, start=start)
+        if len(bars) == 0:
+            return None
+        df = pd.DataFrame({name: bars[name] for name in PRICE_FIELDS})
+        df.insert(0, "trade_date", _format_times(bars["ts"], "daily"))
+        df.insert(0, "ts_code", stock_code)
+        return df
+
+    # ==================== 同步 ====================
+
+    def sync_symbol(self, level: str, ts_code: str) -> int:
+        """从MongoDB增量同步单只股票，返回写入条数"""
+        collection_name, time_field = LEVELS[level]
+        bar_file = self.bar_file(level, ts_code)
+        header = bar_file.read_header()
+
+        query: Dict[str, Any] = {"ts_code": ts_code}
+        if header and header["count"]:
+            last_time = _format_times(np.array([header["last_ts"]]), level)[0]
+            latest = self.db_handler.get_latest_date_for_code(collection_name, ts_code, field=time_field)
+            if latest is None or latest.strftime('%Y%m%d' if level == "daily" else '%Y-%m-%d %H:%M:%S') <= last_time:
+                return bar_file.write(np.empty(0, dtype=BAR_DTYPE))
+            query[time_field] = {"$gt": last_time}
+
+        projection = {"_id": 0, time_field: 1, **{name: 1 for name in PRICE_FIELDS}}
+        docs = list(self.db_handler.get_collection(collection_name).find(query, projection).sort(time_field, 1))
+        if not docs and header:
+            return 0
+
+        bars = np.zeros(len(docs), dtype=BAR_DTYPE)
+        bars["ts"] = [_to_epoch(str(doc[time_field])) for doc in docs]
+        for name in PRICE_FIELDS:
+            bars[name] = [np.nan if doc.get(name) is None else float(doc[name]) for doc in docs]
+        return bar_file.write(bars)
+
+    def sync(self, level: str, ts_codes: List[str], workers: int = 8) -> Dict[str, Any]:
+        """并行增量同步多只股票（每个文件各自加锁，不同股票互不阻塞）"""
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+
+        started = time.perf_counter()
+        rows = 0
+        failures = {}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(self.sync_symbol, level, ts_code): ts_code for ts_code in ts_codes}
+            for future in as_completed(futures):
+                try:
+                    rows += future.result()
+                except Exception as e:
+                    failures[futures[future]] = str(e)
+                    logger.error(f"❌ 同步 {level} {futures[future]} 失败: {e}")
+        return {"level": level, "symbols": len(ts_codes), "rows": rows, "failed": failures,
+                "seconds": round(time.perf_counter() - started, 1)}
+
+    def compact(self, level: str) -> int:
+        """压缩指定级别下的全部文件，返回文件数"""
+        level_dir = os.path.join(self.root, level)
+        names = [name for name in os.listdir(level_dir) if name.endswith(".bars")] if os.path.isdir(level_dir) else []
+        for name in names:
+            BarFile(os.path.join(level_dir, name)).compact()
+        return len(names)
+
+
+_bar_store: Optional[BarStore] = None
+_bar_store_lock = threading.Lock()
+
+
+def get_bar_store() -> BarStore:
+    """获取K线二进制存储单例"""
+    global _bar_store
+    if _bar_store is None:
+        with _bar_store_lock:
+            if _bar_store is None:
+                _bar_store = BarStore()
+    return _bar_store
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='K线内存映射二进制存储同步与压缩')
+    parser.add_argument('command', choices=['sync', 'compact'], help='sync: 从MongoDB增量同步; compact: 压缩文件')
+    parser.add_argument('--levels', default='daily,30min,5min', help='级别，逗号分隔')
+    parser.add_argument('--symbols', nargs='*', help='股票代码（默认全市场）')
+    parser.add_argument('--workers', type=int, default=8, help='并行线程数')
+    parser.add_argument('--root', default=BARS_ROOT, help='存储目录')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    store = BarStore(args.root)
+    levels = [level.strip() for level in args.levels.split(',') if level.strip()]
+
+    if args.command == 'compact':
+        for level in levels:
+            print(f"✅ {level}: 压缩 {store.compact(level)} 个文件")
+        return
+
+    symbols = args.symbols or sorted(
+        doc['ts_code'] for doc in store.db_handler.get_collection('infrastructure_stock_basic').find(
+            {'ts_code': {'$exists': True}}, {'_id': 0, 'ts_code': 1})
+    )
+    print(f"📁 存储目录: {args.root}, 股票数: {len(symbols)}")
+    for level in levels:
+        result = store.sync(level, symbols, args.workers)
+        print(f"✅ {level}: 写入 {result['rows']} 行, 失败 {len(result['failed'])} 只, 耗时 {result['seconds']}秒")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,15 +3,22 @@
 """
 数据库集合检查器
 用于查询指定集合的数据总条目、字段信息和时间范围等统计信息
+
+大集合上不做全量计数与逐字段查询：
+    - 文档数、存储与索引大小取自 collStats（元数据，不扫描文档）
+    - 字段存在率、类型分布、空值率与样本值由一次 $sample + $facet 聚合得到
+    - 指定字段的统计在一次 $facet 聚合中完成（单次扫描）
+    - 多个集合并行检查，结果缓存为JSON（默认 data/collection_profiles，24小时内复用）
 """
 
 import sys
 import os
 import json
+import time
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Dict, List, Any, Optional, Union
-from collections import Counter
 import pandas as pd
 
 # 添加项目根目录到路径
@@ -21,47 +28,77 @@ sys.path.append(project_root)
 
 from database.db_handler import get_db_handler
 
+# 检查结果缓存目录与有效期
+PROFILE_CACHE_DIR = os.getenv("COLLECTION_PROFILE_DIR", os.path.join(project_root, "data", "collection_profiles"))
+PROFILE_MAX_AGE_HOURS = float(os.getenv("COLLECTION_PROFILE_MAX_AGE_HOURS", "24"))
+
+# 常见的时间字段名
+DATE_FIELDS = [
+    'trade_date', 'trade_time', 'date', 'timestamp', 'created_at', 'updated_at',
+    'cal_date', 'ann_date', 'f_ann_date', 'end_date', 'start_date'
+]
+
+# 视为空值的取值
+EMPTY_VALUES = [None, '', 'None']
+
+
+def _json_safe(value: Any) -> Any:
+    """样本值转换为可JSON序列化的形式（ObjectId、datetime等转字符串）"""
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return {key: _json_safe(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_json_safe(item) for item in value]
+    return str(value)
+
 
 class DatabaseCollectionInspector:
     """数据库集合检查器"""
     
-    def __init__(self):
-        """初始化检查器"""
+    def __init__(self, workers: int = 8, cache_dir: Optional[str] = PROFILE_CACHE_DIR,
+                 max_age_hours: float = PROFILE_MAX_AGE_HOURS):
+        """
+        初始化检查器
+        
+        Args:
+            workers: 并行检查的线程数
+            cache_dir: 检查结果缓存目录，None 表示不缓存
+            max_age_hours: 缓存有效期（小时）
+        """
         self.db_handler = get_db_handler()
+        self.db = self.db_handler.db
+        self.workers = workers
+        self.cache_dir = cache_dir
+        self.max_age_hours = max_age_hours
         
     def list_all_collections(self) -> List[str]:
         """获取所有集合列表"""
         try:
-            # 直接通过本地连接获取集合列表
-            if hasattr(self.db_handler, 'local_client') and self.db_handler.local_client:
-                db = self.db_handler.local_client[self.db_handler.local_client.get_database().name]
-                collections = db.list_collection_names()
-                return sorted(collections)
-            else:
-                print("无法获取数据库连接")
-                return []
+            return sorted(self.db.list_collection_names())
         except Exception as e:
             print(f"获取集合列表失败: {e}")
             return []
     
     def get_collection_basic_info(self, collection_name: str) -> Dict[str, Any]:
-        """获取集合基本信息"""
+        """获取集合基本信息（collStats 元数据，不扫描文档）"""
         try:
-            collection = self.db_handler.get_collection(collection_name)
-            
-            # 获取集合统计信息
-            if hasattr(self.db_handler, 'local_client') and self.db_handler.local_client:
-                db = self.db_handler.local_client[self.db_handler.local_client.get_database().name]
-                stats = db.command("collStats", collection_name)
-            else:
+            try:
+                stats = self.db.command("collStats", collection_name)
+            except Exception:
                 stats = {}
             
-            # 文档总数
-            total_count = collection.count_documents({})
+            # collStats 的 count 来自集合元数据；取不到时使用 estimated_document_count
+            total_count = stats.get('count')
+            if total_count is None:
+                total_count = self.db_handler.get_collection(collection_name).estimated_document_count()
             
             basic_info = {
                 'collection_name': collection_name,
                 'total_documents': total_count,
+                'count_is_estimate': True,
                 'storage_size': stats.get('storageSize', 0),
                 'avg_obj_size': stats.get('avgObjSize', 0),
                 'total_index_size': stats.get('totalIndexSize', 0),
@@ -75,113 +112,130 @@ class DatabaseCollectionInspector:
             return {}
     
     def analyze_collection_fields(self, collection_name: str, sample_size: int = 1000) -> Dict[str, Any]:
-        """分析集合字段信息"""
+        """
+        分析集合字段信息
+        一次聚合：$sample 取样后用 $facet 同时统计样本数与 (字段, 类型) 直方图
+        """
         try:
             collection = self.db_handler.get_collection(collection_name)
             
-            # 获取样本数据进行字段分析
-            sample_docs = list(collection.aggregate([
+            result = list(collection.aggregate([
                 {"$sample": {"size": sample_size}},
-                {"$limit": sample_size}
-            ]))
-            
-            if not sample_docs:
+                {"$facet": {
+                    "sample": [{"$count": "n"}],
+                    "fields": [
+                        {"$project": {"kv": {"$objectToArray": "$$ROOT"}}},
+                        {"$unwind": "$kv"},
+                        {"$group": {
+                            "_id": {"field": "$kv.k", "type": {"$type": "$kv.v"}},
+                            "count": {"$sum": 1},
+                            "null_count": {"$sum": {"$cond": [{"$in": ["$kv.v", EMPTY_VALUES]}, 1, 0]}},
+                            "sample_values": {"$addToSet": "$kv.v"}
+                        }},
+                        {"$project": {"count": 1, "null_count": 1, "sample_values": {"$slice": ["$sample_values", 5]}}}
+                    ]
+                }}
+            ], allowDiskUse=True))
+            
+            facets = result[0] if result else {}
+            sample_count = facets.get('sample', [{}])[0].get('n', 0) if facets.get('sample') else 0
+            if not sample_count:
                 return {'error': '集合为空或无法获取样本数据'}
             
-            # 分析字段
+            # 合并同一字段的各类型分组
             field_info = {}
-            field_types = Counter()
-            
-            for doc in sample_docs:
-                for field, value in doc.items():
-                    if field not in field_info:
-                        field_info[field] = {
-                            'type': type(value).__name__,
-                            'sample_values': [],
-                            'null_count': 0,
-                            'unique_count': 0
-                        }
-                    
-                    # 记录字段类型
-                    field_types[(field, type(value).__name__)] += 1
-                    
-                    # 记录样本值（最多5个）
-                    if len(field_info[field]['sample_values']) < 5:
-                        if value is not None and value not in field_info[field]['sample_values']:
-                            field_info[field]['sample_values'].append(value)
-                    
-                    # 统计空值
-                    if value is None or value == '' or value == 'None':
-                        field_info[field]['null_count'] += 1
+            for group in facets.get('fields', []):
+                field = group['_id']['field']
+                info = field_info.setdefault(field, {
+                    'type': None,
+                    'types': {},
+                    'sample_values': [],
+                    'null_count': 0,
+                    'total_samples': 0
+                })
+                info['types'][group['_id']['type']] = group['count']
+                info['null_count'] += group['null_count']
+                info['total_samples'] += group['count']
+                for value in group['sample_values']:
+                    if value not in EMPTY_VALUES and len(info['sample_values']) < 5:
+                        info['sample_values'].append(_json_safe(value))
             
             # 计算字段统计信息
-            for field in field_info:
-                # 获取最常见的类型
-                field_type_counts = [count for (f, t), count in field_types.items() if f == field]
-                field_info[field]['total_samples'] = sum(field_type_counts)
-                field_info[field]['null_percentage'] = (field_info[field]['null_count'] / len(sample_docs)) * 100
+            for info in field_info.values():
+                info['type'] = max(info['types'], key=info['types'].get)
+                info['presence_percentage'] = info['total_samples'] / sample_count * 100
+                info['null_percentage'] = info['null_count'] / sample_count * 100
             
             return {
                 'total_fields': len(field_info),
-                'sample_size': len(sample_docs),
-                'fields': field_info
+                'sample_size': sample_count,
+                'fields': dict(sorted(field_info.items(), key=lambda item: -item[1]['total_samples']))
             }
             
         except Exception as e:
             print(f"分析集合 {collection_name} 字段失败: {e}")
             return {'error': str(e)}
     
-    def get_time_range_info(self, collection_name: str, date_fields: List[str] = None) -> Dict[str, Any]:
-        """获取集合的时间范围信息"""
+    def _field_range(self, collection_name: str, field: str) -> Optional[Dict[str, Any]]:
+        """字段最早/最晚值（有索引时走索引两端，各取1条）"""
+        collection = self.db_handler.get_collection(collection_name)
+        condition = {field: {"$exists": True, "$ne": None}}
+        earliest = collection.find_one(condition, {field: 1}, sort=[(field, 1)])
+        latest = collection.find_one(condition, {field: 1}, sort=[(field, -1)])
+        if not earliest or not latest:
+            return None
+        return {'earliest': earliest[field], 'latest': latest[field]}
+    
+    def get_time_range_info(self, collection_name: str, date_fields: List[str] = None,
+                            field_analysis: Optional[Dict[str, Any]] = None,
+                            total_documents: Optional[int] = None) -> Dict[str, Any]:
+        """
+        获取集合的时间范围信息
+        
+        Args:
+            date_fields: 候选时间字段，默认 DATE_FIELDS
+            field_analysis: analyze_collection_fields 的结果，用于跳过样本中不存在的字段并估算记录数
+            total_documents: 集合文档数（估算记录数用）
+        """
         try:
-            collection = self.db_handler.get_collection(collection_name)
+            date_fields = date_fields or DATE_FIELDS
+            sampled = (field_analysis or {}).get('fields')
+            if sampled is not None:
+                date_fields = [field for field in date_fields if field in sampled]
             
-            # 常见的时间字段名
-            if date_fields is None:
-                date_fields = [
-                    'trade_date', 'date', 'timestamp', 'created_at', 'updated_at',
-                    'cal_date', 'ann_date', 'f_ann_date', 'end_date', 'start_date'
-                ]
+            with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(date_fields) or 1))) as executor:
+                ranges = dict(zip(date_fields, executor.map(
+                    lambda field: self._field_range(collection_name, field), date_fields)))
             
             time_info = {}
-            
-            # 检查每个可能的时间字段
-            for field in date_fields:
-                try:
-                    # 检查字段是否存在
-                    field_exists = collection.count_documents({field: {"$exists": True, "$ne": None}})
-                    
-                    if field_exists > 0:
-                        # 获取最早和最晚的时间
-                        earliest = list(collection.find({field: {"$exists": True, "$ne": None}}).sort(field, 1).limit(1))
-                        latest = list(collection.find({field: {"$exists": True, "$ne": None}}).sort(field, -1).limit(1))
-                        
-                        if earliest and latest:
-                            earliest_value = earliest[0][field]
-                            latest_value = latest[0][field]
-                            
-                            time_info[field] = {
-                                'earliest': earliest_value,
-                                'latest': latest_value,
-                                'records_count': field_exists,
-                                'data_type': type(earliest_value).__name__
-                            }
-                            
-                            # 如果是字符串格式的日期，尝试解析
-                            if isinstance(earliest_value, str):
-                                try:
-                                    if len(earliest_value) == 8 and earliest_value.isdigit():
-                                        # YYYYMMDD格式
-                                        earliest_date = datetime.strptime(earliest_value, '%Y%m%d')
-                                        latest_date = datetime.strptime(latest_value, '%Y%m%d')
-                                        time_info[field]['earliest_parsed'] = earliest_date.strftime('%Y-%m-%d')
-                                        time_info[field]['latest_parsed'] = latest_date.strftime('%Y-%m-%d')
-                                        time_info[field]['time_span_days'] = (latest_date - earliest_date).days
-                                except:
-                                    pass
-                            
-                except Exception as e:
+            for field, value_range in ranges.items():
+                if not value_range:
                     continue
+                earliest_value = value_range['earliest']
+                latest_value = value_range['latest']
+                info = {
+                    'earliest': earliest_value,
+                    'latest': latest_value,
+                    'data_type': type(earliest_value).__name__
+                }
+                # 记录数按样本存在率估算，不做全量计数
+                if sampled is not None and total_documents is not None:
+                    info['records_count'] = int(round(sampled[field]['presence_percentage'] / 100 * total_documents))
+                    info['records_count_estimated'] = True
+                
+                # 如果是字符串格式的日期，尝试解析
+                if isinstance(earliest_value, str):
+                    try:
+                        if len(earliest_value) == 8 and earliest_value.isdigit():
+                            # YYYYMMDD格式
+                            earliest_date = datetime.strptime(earliest_value, '%Y%m%d')
+                            latest_date = datetime.strptime(latest_value, '%Y%m%d')
+                            info['earliest_parsed'] = earliest_date.strftime('%Y-%m-%d')
+                            info['latest_parsed'] = latest_date.strftime('%Y-%m-%d')
+                            info['time_span_days'] = (latest_date - earliest_date).days
+                    except ValueError:
+                        pass
+                time_info[field] = info
             
             return time_info
             
@@ -194,29 +248,21 @@ class DatabaseCollectionInspector:
         try:
             collection = self.db_handler.get_collection(collection_name)
             
-            # 获取样本文档
-            samples = list(collection.find().limit(limit))
-            
-            # 转换ObjectId为字符串以便JSON序列化
-            for doc in samples:
-                if '_id' in doc:
-                    doc['_id'] = str(doc['_id'])
-            
-            return samples
+            # 获取样本文档（转换ObjectId等为字符串以便JSON序列化）
+            return [_json_safe(doc) for doc in collection.find().limit(limit)]
             
         except Exception as e:
             print(f"获取集合 {collection_name} 样本文档失败: {e}")
             return []
     
-    def find_financial_fields(self, collection_name: str) -> Dict[str, Any]:
-        """查找财务指标相关字段"""
+    def find_financial_fields(self, collection_name: str,
+                              field_analysis: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """查找财务指标相关字段（字段与样本值取自字段分析，不再逐字段查询）"""
         try:
-            collection = self.db_handler.get_collection(collection_name)
-            
-            # 获取一个样本文档来分析字段
-            sample_doc = collection.find_one()
-            if not sample_doc:
-                return {'error': '集合为空'}
+            field_analysis = field_analysis or self.analyze_collection_fields(collection_name)
+            if 'error' in field_analysis:
+                return field_analysis
+            fields = field_analysis['fields']
             
             # 财务指标相关关键词
             financial_keywords = [
@@ -229,27 +275,17 @@ class DatabaseCollectionInspector:
             
             # 查找匹配的字段
             financial_fields = {}
-            all_fields = list(sample_doc.keys())
+            all_fields = list(fields.keys())
             
             for field in all_fields:
                 field_lower = field.lower()
                 for keyword in financial_keywords:
                     if keyword in field_lower:
-                        # 获取该字段的样本值
-                        sample_values = []
-                        docs_with_field = list(collection.find(
-                            {field: {"$exists": True, "$ne": None}}, 
-                            {field: 1}
-                        ).limit(5))
-                        
-                        for doc in docs_with_field:
-                            if field in doc and doc[field] is not None:
-                                sample_values.append(doc[field])
-                        
+                        sample_values = fields[field]['sample_values']
                         financial_fields[field] = {
                             'matched_keyword': keyword,
                             'sample_values': sample_values[:5],
-                            'field_type': type(sample_doc.get(field)).__name__,
+                            'field_type': fields[field]['type'],
                             'has_data': len(sample_values) > 0
                         }
                         break
@@ -266,42 +302,44 @@ class DatabaseCollectionInspector:
             return {'error': str(e)}
     
     def get_specific_field_info(self, collection_name: str, field_names: List[str]) -> Dict[str, Any]:
-        """获取指定字段的详细信息"""
+        """
+        获取指定字段的详细信息
+        一次 $facet 聚合：counts 分面单次扫描统计所有字段的存在数与有效数，其余分面各取10条样本
+        """
         try:
             collection = self.db_handler.get_collection(collection_name)
             
-            field_info = {}
+            counts: Dict[str, Any] = {"_id": None}
+            facets: Dict[str, List[Dict[str, Any]]] = {}
+            for i, field_name in enumerate(field_names):
+                path = f"${field_name}"
+                counts[f"exists_{i}"] = {"$sum": {"$cond": [{"$eq": [{"$type": path}, "missing"]}, 0, 1]}}
+                counts[f"non_null_{i}"] = {"$sum": {"$cond": [{"$in": [{"$ifNull": [path, None]}, [None, ""]]}, 0, 1]}}
+                facets[f"samples_{i}"] = [
+                    {"$match": {field_name: {"$exists": True, "$ne": None}}},
+                    {"$limit": 10},
+                    {"$project": {"_id": 0, "value": path, "ts_code": 1, "trade_date": 1}}
+                ]
+            facets["counts"] = [{"$group": counts}]
             
-            for field_name in field_names:
-                # 检查字段是否存在
-                field_exists = collection.count_documents({field_name: {"$exists": True}})
-                
+            result = list(collection.aggregate([{"$facet": facets}], allowDiskUse=True))
+            result = result[0] if result else {}
+            totals = result.get('counts', [{}])[0] if result.get('counts') else {}
+            
+            field_info = {}
+            for i, field_name in enumerate(field_names):
+                field_exists = totals.get(f"exists_{i}", 0)
                 if field_exists > 0:
-                    # 获取有值的文档数量
-                    non_null_count = collection.count_documents({
-                        field_name: {"$exists": True, "$ne": None, "$ne": ""}
-                    })
-                    
-                    # 获取样本值
-                    sample_docs = list(collection.find(
-                        {field_name: {"$exists": True, "$ne": None}}, 
-                        {field_name: 1, "ts_code": 1, "trade_date": 1}
-                    ).limit(10))
-                    
-                    sample_values = []
-                    for doc in sample_docs:
-                        if field_name in doc:
-                            sample_values.append({
-                                'value': doc[field_name],
-                                'ts_code': doc.get('ts_code', 'N/A'),
-                                'trade_date': doc.get('trade_date', 'N/A')
-                            })
-                    
+                    non_null_count = totals.get(f"non_null_{i}", 0)
                     field_info[field_name] = {
                         'exists_count': field_exists,
                         'non_null_count': non_null_count,
-                        'null_percentage': ((field_exists - non_null_count) / field_exists * 100) if field_exists > 0 else 0,
-                        'sample_values': sample_values
+                        'null_percentage': (field_exists - non_null_count) / field_exists * 100,
+                        'sample_values': [{
+                            'value': _json_safe(doc.get('value')),
+                            'ts_code': doc.get('ts_code', 'N/A'),
+                            'trade_date': doc.get('trade_date', 'N/A')
+                        } for doc in result.get(f"samples_{i}", [])]
                     }
                 else:
                     field_info[field_name] = {
@@ -315,42 +353,102 @@ class DatabaseCollectionInspector:
             print(f"获取字段信息失败: {e}")
             return {'error': str(e)}
     
-    def inspect_collection(self, collection_name: str, detailed: bool = True) -> Dict[str, Any]:
-        """全面检查指定集合"""
-        print(f"\n🔍 正在检查集合: {collection_name}")
-        
-        # 基本信息
-        basic_info = self.get_collection_basic_info(collection_name)
-        if not basic_info:
-            return {'error': f'无法获取集合 {collection_name} 的信息'}
+    # ==================== 结果缓存 ====================
+    
+    def _cache_path(self, collection_name: str, detailed: bool) -> Optional[str]:
+        if not self.cache_dir:
+            return None
+        return os.path.join(self.cache_dir, f"{collection_name}{'' if detailed else '.basic'}.json")
+    
+    def load_cached(self, collection_name: str, detailed: bool = True) -> Optional[Dict[str, Any]]:
+        """读取未过期的缓存结果（无缓存或已过期返回None）"""
+        path = self._cache_path(collection_name, detailed)
+        if not path or not os.path.exists(path):
+            return None
+        if time.time() - os.path.getmtime(path) > self.max_age_hours * 3600:
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                result = json.load(f)
+            result['from_cache'] = True
+            return result
+        except (OSError, ValueError):
+            return None
+    
+    def save_cached(self, result: Dict[str, Any], detailed: bool = True):
+        path = self._cache_path(result['collection_name'], detailed)
+        if not path:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False, indent=2, default=str)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️ 缓存 {result['collection_name']} 检查结果失败: {e}")
+    
+    # ==================== 检查入口 ====================
+    
+    def inspect_collection(self, collection_name: str, detailed: bool = True,
+                           use_cache: bool = True) -> Dict[str, Any]:
+        """全面检查指定集合（use_cache 时优先复用未过期的缓存结果）"""
+        if use_cache:
+            cached = self.load_cached(collection_name, detailed)
+            if cached is not None:
+                print(f"\n📦 使用缓存结果: {collection_name} ({cached.get('inspection_time')})")
+                return cached
         
-        result = {
-            'collection_name': collection_name,
-            'basic_info': basic_info,
-            'inspection_time': datetime.now().isoformat()
-        }
+        print(f"\n🔍 正在检查集合: {collection_name}")
+        started = time.perf_counter()
         
-        if detailed:
-            print("  📊 分析字段信息...")
-            field_analysis = self.analyze_collection_fields(collection_name)
-            result['field_analysis'] = field_analysis
-            
-            print("  📅 分析时间范围...")
-            time_analysis = self.get_time_range_info(collection_name)
-            result['time_analysis'] = time_analysis
-            
-            print("  📄 获取样本文档...")
-            samples = self.get_sample_documents(collection_name)
-            result['sample_documents'] = samples
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            basic_future = executor.submit(self.get_collection_basic_info, collection_name)
+            if detailed:
+                fields_future = executor.submit(self.analyze_collection_fields, collection_name)
+                samples_future = executor.submit(self.get_sample_documents, collection_name)
+            basic_info = basic_future.result()
+            if not basic_info:
+                return {'error': f'无法获取集合 {collection_name} 的信息'}
+            
+            result = {
+                'collection_name': collection_name,
+                'basic_info': basic_info,
+                'inspection_time': datetime.now().isoformat()
+            }
+            
+            if detailed:
+                print("  📊 分析字段信息...")
+                field_analysis = fields_future.result()
+                result['field_analysis'] = field_analysis
+                
+                print("  📅 分析时间范围...")
+                result['time_analysis'] = self.get_time_range_info(
+                    collection_name,
+                    field_analysis=field_analysis if 'error' not in field_analysis else None,
+                    total_documents=basic_info.get('total_documents')
+                )
+                
+                print("  📄 获取样本文档...")
+                result['sample_documents'] = samples_future.result()
         
+        result['elapsed_seconds'] = round(time.perf_counter() - started, 2)
+        self.save_cached(result, detailed)
         return result
     
+    def inspect_collections(self, collection_names: List[str], detailed: bool = True,
+                            use_cache: bool = True) -> Dict[str, Dict[str, Any]]:
+        """并行检查多个集合"""
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = executor.map(lambda name: self.inspect_collection(name, detailed, use_cache), collection_names)
+            return dict(zip(collection_names, results))
+    
     def generate_report(self, collection_name: str, detailed: bool = True, 
-                       output_file: str = None) -> Dict[str, Any]:
+                       output_file: str = None, use_cache: bool = True) -> Dict[str, Any]:
         """生成集合检查报告"""
         
         # 执行检查
-        inspection_result = self.inspect_collection(collection_name, detailed)
+        inspection_result = self.inspect_collection(collection_name, detailed, use_cache)
         
         if 'error' in inspection_result:
             print(f"❌ 检查失败: {inspection_result['error']}")
@@ -403,6 +501,7 @@ class DatabaseCollectionInspector:
                     for i, (field_name, field_info) in enumerate(list(fields.items())[:10]):
                         print(f"    {i+1:2d}. {field_name}")
                         print(f"        类型: {field_info.get('type', 'unknown')}")
+                        print(f"        存在率: {field_info.get('presence_percentage', 100):.1f}%")
                         print(f"        空值率: {field_info.get('null_percentage', 0):.1f}%")
                         
                         # 显示样本值
@@ -483,10 +582,43 @@ def main():
     parser.add_argument('--fields', type=str, nargs='+',
                        help='检查指定字段的详细信息 (需要配合 --collection 使用)')
     
+    parser.add_argument('--all', '-a', action='store_true',
+                       help='并行检查所有集合，输出汇总表')
+    
+    parser.add_argument('--refresh', '-r', action='store_true',
+                       help='忽略缓存，重新检查')
+    
+    parser.add_argument('--workers', '-w', type=int, default=8,
+                       help='并行检查的线程数')
+    
     args = parser.parse_args()
     
     # 创建检查器
-    inspector = DatabaseCollectionInspector()
+    inspector = DatabaseCollectionInspector(workers=args.workers)
+    use_cache = not args.refresh
+    
+    # 并行检查所有集合
+    if args.all:
+        collections = inspector.list_all_collections()
+        results = inspector.inspect_collections(collections, detailed=not args.simple, use_cache=use_cache)
+        
+        print(f"\n{'集合':<45}{'文档数':>14}{'存储大小':>12}{'索引数':>8}{'字段数':>8}")
+        print("-" * 87)
+        for name, result in results.items():
+            basic_info = result.get('basic_info', {})
+            field_count = result.get('field_analysis', {}).get('total_fields', '-')
+            print(f"{name:<45}{basic_info.get('total_documents', 0):>14,}"
+                  f"{inspector._format_bytes(basic_info.get('storage_size', 0)):>12}"
+                  f"{basic_info.get('indexes_count', 0):>8}{field_count:>8}")
+        
+        if args.output:
+            try:
+                with open(args.output, 'w', encoding='utf-8') as f:
+                    json.dump(results, f, ensure_ascii=False, indent=2, default=str)
+                print(f"\n💾 报告已保存到: {args.output}")
+            except Exception as e:
+                print(f"❌ 保存报告失败: {e}")
+        return
     
     # 列出所有集合
     if args.list:
@@ -527,7 +659,7 @@ def main():
             return
         
         # 生成报告
-        inspector.generate_report(collection_name, detailed=detailed, output_file=args.output)
+        inspector.generate_report(collection_name, detailed=detailed, output_file=args.output, use_cache=use_cache)
         return
     
     # 查找财务指标字段
@@ -608,7 +740,7 @@ def main():
     # 检查指定集合
     if args.collection:
         detailed = not args.simple
-        inspector.generate_report(args.collection, detailed=detailed, output_file=args.output)
+        inspector.generate_report(args.collection, detailed=detailed, output_file=args.output, use_cache=use_cache)
         return
     
     # 如果没有参数，显示帮助
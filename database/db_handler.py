@@ -2,14 +2,20 @@ from pymongo import MongoClient, UpdateOne
 from pymongo.errors import BulkWriteError, ServerSelectionTimeoutError, ConnectionFailure, NetworkTimeout
 import os
 from dotenv import load_dotenv
-import pandas as pd
 from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, TYPE_CHECKING
 import pymongo
 from pymongo import timeout
 import logging
 import time
 from functools import wraps
+from concurrent.futures import ThreadPoolExecutor
+
+from database.time_fields import time_range_query, with_native_time
+
+if TYPE_CHECKING:
+    # pandas仅在 get_kline_data 中按需导入，避免拖慢导入本模块的进程启动
+    import pandas as pd
 
 load_dotenv()
 
@@ -34,6 +40,56 @@ def retry_on_connection_error(max_retries=3, delay=2):
         return wrapper
     return decorator
 
+# MongoDB重复键错误码
+DUPLICATE_KEY_ERROR = 11000
+
+
+class AdaptiveBatchSizer:
+    """
+    按实测写入耗时调整批次大小：
+    单批耗时明显低于目标时放大，明显高于目标时减半，使每批耗时稳定在目标附近
+    """
+
+    def __init__(self, initial_size: int, target_seconds: float = 0.5,
+                 min_size: int = 100, max_size: int = 20000):
+        self.target_seconds = target_seconds
+        self.min_size = min_size
+        self.max_size = max_size
+        self.size = max(min_size, min(initial_size, max_size))
+
+    def record(self, batch_size: int, seconds: float):
+        """记录一批的大小与耗时，更新下一批的大小"""
+        if batch_size < self.size:
+            return  # 末尾不足一批，耗时不具参考性
+        if seconds < self.target_seconds * 0.5:
+            self.size = min(self.max_size, int(self.size * 1.5))
+        elif seconds > self.target_seconds * 1.5:
+            self.size = max(self.min_size, self.size // 2)
+
+
+def _partition_by_key(data: List[Dict], key: str, parts: int) -> List[List[Dict]]:
+    """按字段值排序后切分为至多parts个互不重叠的连续区间（同一键值不会跨区间）"""
+    ordered = sorted(data, key=lambda item: str(item.get(key, '')))
+    target = max(1, (len(ordered) + parts - 1) // parts)
+    partitions, current = [], []
+    for item in ordered:
+        if len(current) >= target and item.get(key) != current[-1].get(key):
+            partitions.append(current)
+            current = []
+        current.append(item)
+    if current:
+        partitions.append(current)
+    return partitions
+
+
+def _has_unique_index(collection, keys: List[str]) -> bool:
+    """集合上是否存在恰好覆盖keys的唯一索引"""
+    for index in collection.index_information().values():
+        if index.get('unique') and sorted(field for field, _ in index['key']) == sorted(keys):
+            return True
+    return False
+
+
 class DBHandler:
     """本地MongoDB数据库处理器"""
     
@@ -139,41 +195,46 @@ class DBHandler:
 
 
     
-    def _write_to_local(self, collection_name, updates, batch_size):
-        """写入本地数据库的内部方法"""
+    def _write_to_local(self, collection_name, updates, batch_size, show_progress=True):
+        """写入本地数据库的内部方法（批次大小按实测耗时自适应调整）"""
         if not self.local_available:
             return False, 0, 0
         
         try:
-            print(f"🏠 写入本地数据库: {collection_name}")
+            if show_progress:
+                print(f"🏠 写入本地数据库: {collection_name}")
             collection = self.db[collection_name]
+            sizer = AdaptiveBatchSizer(batch_size)
             
             total_upserted = 0
             total_modified = 0
             batch_count = 0
-            total_batches = (len(updates) + batch_size - 1) // batch_size
+            offset = 0
             
-            for i in range(0, len(updates), batch_size):
-                batch = updates[i:i + batch_size]
+            while offset < len(updates):
+                batch = updates[offset:offset + sizer.size]
+                offset += len(batch)
                 batch_count += 1
                 
+                started = time.perf_counter()
                 try:
                     result = collection.bulk_write(batch, ordered=False)
                     total_upserted += result.upserted_count
                     total_modified += result.modified_count
-                    
-                    # 显示进度
-                    if batch_count % 10 == 0 or batch_count == total_batches:
-                        print(f"   📝 进度: {batch_count}/{total_batches} 批次")
-                        
                 except BulkWriteError as bwe:
                     total_upserted += bwe.details.get('nUpserted', 0)
                     total_modified += bwe.details.get('nModified', 0)
                     error_count = len(bwe.details.get('writeErrors', []))
                     if error_count > 0:
                         logging.warning(f"批次 {batch_count} 部分失败: {error_count} 个错误")
+                sizer.record(len(batch), time.perf_counter() - started)
+                
+                # 显示进度
+                if show_progress and (batch_count % 10 == 0 or offset >= len(updates)):
+                    print(f"   📝 进度: {offset:,}/{len(updates):,} 条, 当前批次大小: {sizer.size}")
             
-            print(f"✅ 本地写入成功: 新增{total_upserted} 更新{total_modified}")
+            if show_progress:
+                print(f"✅ 本地写入成功: 新增{total_upserted} 更新{total_modified}")
             return True, total_upserted, total_modified
             
         except Exception as e:
@@ -181,7 +242,7 @@ class DBHandler:
             return False, 0, 0
     
     def _get_optimal_batch_size(self, data_size, collection_name):
-        """根据数据量和集合类型动态调整批次大小"""
+        """根据数据量和集合类型给出初始批次大小（之后按实测耗时调整，见 AdaptiveBatchSizer）"""
         # 基础批次大小
         if data_size > 100000:  # 超过10万条记录
             base_size = 200
@@ -198,29 +259,51 @@ class DBHandler:
         else:
             return base_size
 
-    def bulk_upsert(self, collection_name, data, unique_keys):
-        """批量更新插入数据到本地数据库"""
+    def bulk_upsert(self, collection_name, data, unique_keys, workers=1):
+        """
+        批量更新插入数据到本地数据库
+        
+        Args:
+            collection_name: 集合名称
+            data: 记录列表
+            unique_keys: 唯一键字段
+            workers: 并行写入线程数，按唯一键首字段（如ts_code）切分为互不重叠的区间
+        """
         if not data:
             print(f"没有数据需要插入或更新到集合 {collection_name}")
             return
 
-        # 准备批量操作
-        updates = []
-        for item in data:
-            filter_query = {key: item[key] for key in unique_keys if key in item}
-            updates.append(UpdateOne(filter_query, {'$set': item}, upsert=True))
-
         # 动态调整批次大小
         batch_size = self._get_optimal_batch_size(len(data), collection_name)
-        print(f"📊 数据量: {len(data):,} 条，批次大小: {batch_size}")
+        print(f"📊 数据量: {len(data):,} 条，初始批次大小: {batch_size}，写入线程: {workers}")
         
         # 写入本地数据库
         if not self.local_available:
             logging.error("❌ 本地数据库不可用，无法进行数据采集")
             raise Exception("本地数据库不可用，请检查本地MongoDB服务")
 
+        def build_updates(items):
+            updates = []
+            for item in items:
+                with_native_time(collection_name, item)
+                filter_query = {key: item[key] for key in unique_keys if key in item}
+                updates.append(UpdateOne(filter_query, {'$set': item}, upsert=True))
+            return updates
+
         try:
-            success, upserted, modified = self._write_to_local(collection_name, updates, batch_size)
+            if workers <= 1:
+                success, upserted, modified = self._write_to_local(collection_name, build_updates(data), batch_size)
+            else:
+                partitions = _partition_by_key(data, unique_keys[0], workers)
+                with ThreadPoolExecutor(max_workers=len(partitions)) as executor:
+                    results = list(executor.map(
+                        lambda items: self._write_to_local(collection_name, build_updates(items), batch_size, False),
+                        partitions
+                    ))
+                success = all(result[0] for result in results)
+                upserted = sum(result[1] for result in results)
+                modified = sum(result[2] for result in results)
+                print(f"✅ 本地写入完成: 新增{upserted} 更新{modified}")
             if success:
                 print(f"🎯 数据库写入完成: {collection_name}")
             else:
@@ -230,6 +313,75 @@ class DBHandler:
             logging.error(f"❌ 数据库写入失败: {e}")
             raise e
 
+    def bulk_insert(self, collection_name, data, unique_keys=None, workers=4, update_duplicates=False) -> Dict[str, Any]:
+        """
+        追加模式批量写入：insert_many(ordered=False)，依赖唯一索引拒绝重复记录
+        适合按天增量采集K线等基本都是新记录的场景，比逐条 upsert 快一个数量级
+        
+        Args:
+            collection_name: 集合名称
+            data: 记录列表（写入后会带上 _id）
+            unique_keys: 唯一键字段；指定时检查集合上是否有对应唯一索引，并用于切分写入区间
+            workers: 并行写入线程数，按唯一键首字段切分为互不重叠的区间
+            update_duplicates: 重复记录是否改为按唯一键更新（默认跳过）
+            
+        Returns:
+            {"inserted", "duplicates", "updated", "failed", "seconds", "docs_per_sec"}
+        """
+        if not self.local_available:
+            raise Exception("本地数据库不可用，请检查本地MongoDB服务")
+        stats = {"inserted": 0, "duplicates": 0, "updated": 0, "failed": 0}
+        if not data:
+            return {**stats, "seconds": 0.0, "docs_per_sec": 0.0}
+
+        collection = self.db[collection_name]
+        if unique_keys and not _has_unique_index(collection, unique_keys):
+            logging.warning(f"⚠️ {collection_name} 缺少 {unique_keys} 唯一索引，重复记录将无法识别")
+        if update_duplicates and not unique_keys:
+            raise ValueError("update_duplicates 需要指定 unique_keys")
+
+        started = time.perf_counter()
+        initial_size = self._get_optimal_batch_size(len(data), collection_name)
+
+        def insert_partition(items) -> Dict[str, int]:
+            partition_stats = {"inserted": 0, "duplicates": 0, "updated": 0, "failed": 0}
+            sizer = AdaptiveBatchSizer(initial_size)
+            offset = 0
+            while offset < len(items):
+                batch = [with_native_time(collection_name, item) for item in items[offset:offset + sizer.size]]
+                offset += len(batch)
+                batch_started = time.perf_counter()
+                try:
+                    result = collection.insert_many(batch, ordered=False)
+                    partition_stats["inserted"] += len(result.inserted_ids)
+                except BulkWriteError as bwe:
+                    errors = bwe.details.get('writeErrors', [])
+                    duplicates = [error for error in errors if error.get('code') == DUPLICATE_KEY_ERROR]
+                    partition_stats["inserted"] += bwe.details.get('nInserted', 0)
+                    partition_stats["duplicates"] += len(duplicates)
+                    partition_stats["failed"] += len(errors) - len(duplicates)
+                    if update_duplicates and duplicates:
+                        updates = []
+                        for error in duplicates:
+                            doc = {k: v for k, v in batch[error['index']].items() if k != '_id'}
+                            updates.append(UpdateOne({key: doc[key] for key in unique_keys if key in doc},
+                                                     {'$set': doc}))
+                        partition_stats["updated"] += collection.bulk_write(updates, ordered=False).modified_count
+                sizer.record(len(batch), time.perf_counter() - batch_started)
+            return partition_stats
+
+        partitions = _partition_by_key(data, unique_keys[0], workers) if unique_keys and workers > 1 else [data]
+        with ThreadPoolExecutor(max_workers=len(partitions)) as executor:
+            for partition_stats in executor.map(insert_partition, partitions):
+                for key, value in partition_stats.items():
+                    stats[key] += value
+
+        seconds = time.perf_counter() - started
+        stats.update({"seconds": round(seconds, 3), "docs_per_sec": round(len(data) / seconds, 1) if seconds else 0.0})
+        print(f"✅ 追加写入 {collection_name}: 新增{stats['inserted']} 重复{stats['duplicates']} "
+              f"更新{stats['updated']} 失败{stats['failed']}，{stats['docs_per_sec']:,.0f} 条/秒")
+        return stats
+
     def __del__(self):
         """安全关闭MongoDB连接"""
         try:
@@ -239,7 +391,7 @@ class DBHandler:
             # Python关闭时模块可能已被清理，忽略这些错误
             pass
 
-    def get_kline_data(self, stock_code: str, days: int) -> Optional[pd.DataFrame]:
+    def get_kline_data(self, stock_code: str, days: int) -> Optional['pd.DataFrame']:
         """
         获取指定股票的K线数据
         
@@ -250,21 +402,20 @@ class DBHandler:
         Returns:
             Optional[pd.DataFrame]: 包含K线数据的DataFrame，如果无数据则返回None
         """
+        import pandas as pd
+        
         try:
             collection = self.db.get_collection('stock_kline_daily')
             
+            # trade_date 以YYYYMMDD字符串存储，区间边界使用相同格式（迁移完成后走原生 trade_dt）
             end_date = datetime.now()
             start_date = end_date - timedelta(days=days)
+            time_field, time_range = time_range_query(self.db, 'stock_kline_daily',
+                                                      start_date.strftime('%Y%m%d'), end_date.strftime('%Y%m%d'))
             
-            query = {
-                'ts_code': stock_code,
-                'trade_date': {
-                    '$gte': start_date,
-                    '$lte': end_date
-                }
-            }
+            query = {'ts_code': stock_code, time_field: time_range}
             
-            cursor = collection.find(query).sort('trade_date', pymongo.ASCENDING)
+            cursor = collection.find(query).sort(time_field, pymongo.ASCENDING)
             data = list(cursor)
             
             if not data:
@@ -287,19 +438,28 @@ class DBHandler:
             print(f"❌ 从数据库获取K线数据失败: {e}")
             return None
 
-    def get_latest_date_for_code(self, collection_name: str, ts_code: str) -> Optional[datetime]:
-        """获取指定代码在指定集合中的最新交易日期"""
+    def get_latest_date_for_code(self, collection_name: str, ts_code: str,
+                                 field: str = 'trade_date') -> Optional[datetime]:
+        """
+        获取指定代码在指定集合中的最新交易日期
+        
+        Args:
+            collection_name: 集合名称
+            ts_code: 股票代码
+            field: 时间字段，日线为 trade_date（YYYYMMDD），分钟线为 trade_time（YYYY-MM-DD HH:MM:SS）
+        """
         try:
             collection = self.db.get_collection(collection_name)
             latest_record = collection.find_one(
                 {'ts_code': ts_code},
-                sort=[('trade_date', -1)]
+                {field: 1},
+                sort=[(field, -1)]
             )
-            if latest_record and 'trade_date' in latest_record:
+            if latest_record and field in latest_record:
                 # 确保返回的是datetime对象
-                trade_date = latest_record['trade_date']
+                trade_date = latest_record[field]
                 if isinstance(trade_date, str):
-                    return datetime.strptime(trade_date, '%Y%m%d')
+                    return datetime.strptime(trade_date, '%Y-%m-%d %H:%M:%S' if '-' in trade_date else '%Y%m%d')
                 return trade_date
             return None
         except Exception as e:
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+热点集合索引维护与查询计划校验
+1. 声明热点查询所需的索引，后台创建（已存在相同键的索引时跳过，可重复执行）
+2. 对代码中的标准查询执行 explain，出现全表扫描（COLLSCAN）或内存排序（SORT）即判定失败
+
+运行方式：
+python database/ensure_indexes.py                  # 创建索引并校验查询计划
+python database/ensure_indexes.py --check-only     # 只校验，不创建索引（适合CI/巡检）
+python database/ensure_indexes.py --json report.json
+退出码：0 全部通过，1 存在不合格的查询计划
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Tuple
+
+# 添加项目根目录到路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from database.db_handler import get_db_handler
+from database.time_fields import KLINE_TIME_FIELDS, NATIVE_TIME_FIELD, build_time_range
+
+logger = logging.getLogger(__name__)
+
+# 不允许出现在查询计划中的阶段
+FORBIDDEN_STAGES = {"COLLSCAN", "SORT"}
+
+# ==================== 索引声明 ====================
+
+INDEX_SPECS: List[Dict[str, Any]] = [
+    # K线：单只股票按时间范围/最近N根读取、最新日期查询
+    {"collection": "stock_kline_daily", "keys": [("ts_code", 1), ("trade_date", 1)], "unique": True},
+    {"collection": "stock_kline_daily", "keys": [("trade_date", 1)]},
+    {"collection": "stock_kline_daily", "keys": [("ts_code", 1), (NATIVE_TIME_FIELD, 1)]},
+    {"collection": "stock_kline_30min", "keys": [("ts_code", 1), ("trade_time", 1)], "unique": True},
+    {"collection": "stock_kline_30min", "keys": [("ts_code", 1), (NATIVE_TIME_FIELD, 1)]},
+    {"collection": "stock_kline_5min", "keys": [("ts_code", 1), ("trade_time", 1)], "unique": True},
+    {"collection": "stock_kline_5min", "keys": [("ts_code", 1), (NATIVE_TIME_FIELD, 1)]},
+    # 因子：单只股票时间序列、单日全市场截面
+    {"collection": "stock_factor_pro", "keys": [("ts_code", 1), ("trade_date", 1)]},
+    {"collection": "stock_factor_pro", "keys": [("trade_date", 1), ("ts_code", 1)]},
+    {"collection": "stock_factor_pro", "keys": [("code", 1), ("date", 1)]},
+    # 交易日历：TradingCalendar 按交易所整体加载到内存
+    {"collection": "infrastructure_trading_calendar", "keys": [("exchange", 1), ("is_open", 1), ("cal_date", 1)]},
+    # 股票基础信息：代码搜索索引加载
+    {"collection": "infrastructure_stock_basic", "keys": [("ts_code", 1)]},
+    # 最新结构物化表：默认结构筛选（见 api/latest_structure.py）
+    {"collection": "analysis_latest_structure", "keys": [("level", 1), ("bsp_time", -1), ("ts_code", 1)]},
+]
+
+
+def _index_name(keys: List[Tuple[str, int]]) -> str:
+    return "_".join(f"{field}_{direction}" for field, direction in keys)
+
+
+def ensure_indexes(db, specs: List[Dict[str, Any]] = INDEX_SPECS, create: bool = True) -> List[Dict[str, Any]]:
+    """
+    确保声明的索引存在
+
+    Returns:
+        每个索引的状态：exists / created / missing（create=False 时）/ failed
+    """
+    existing_cache: Dict[str, List[List[Tuple[str, int]]]] = {}
+    results = []
+    for spec in specs:
+        collection_name = spec["collection"]
+        keys = [tuple(item) for item in spec["keys"]]
+        if collection_name not in existing_cache:
+            info = db[collection_name].index_information()
+            existing_cache[collection_name] = [[tuple(item) for item in index["key"]] for index in info.values()]
+
+        result = {"collection": collection_name, "index": _index_name(keys)}
+        if keys in existing_cache[collection_name]:
+            result["status"] = "exists"
+        elif not create:
+            result["status"] = "missing"
+        else:
+            unique = spec.get("unique", False)
+            try:
+                try:
+                    db[collection_name].create_index(keys, background=True, unique=unique)
+                except Exception as e:
+                    if not unique:
+                        raise
+                    # 唯一索引可能因历史重复数据失败，退回普通索引保证查询可用
+                    logger.warning(f"⚠️ {collection_name}.{result['index']} 唯一索引创建失败({e})，改为普通索引")
+                    db[collection_name].create_index(keys, background=True)
+                    result["note"] = "non-unique"
+                existing_cache[collection_name].append(keys)
+                result["status"] = "created"
+            except Exception as e:
+                result["status"] = "failed"
+                result["error"] = str(e)
+        results.append(result)
+    return results
+
+
+# ==================== 标准查询 ====================
+
+def canonical_queries(db) -> List[Dict[str, Any]]:
+    """
+    代码中的热点查询（条件取样本值，结构与调用处一致）
+    K线时间条件经 build_time_range 生成（与 time_range_query 相同），字符串字段与 trade_dt 两条路径都校验：
+    迁移完成前读取方使用字符串字段，完成后使用 trade_dt（见 database/time_fields.py）
+    """
+    sample = db["stock_kline_daily"].find_one({}, {"_id": 0, "ts_code": 1}) or {}
+    code = sample.get("ts_code", "000001.SZ")
+    today = datetime.now()
+    start_date = (today - timedelta(days=180)).strftime("%Y%m%d")
+    end_date = today.strftime("%Y%m%d")
+    start_time = (today - timedelta(days=30)).strftime("%Y-%m-%d 00:00:00")
+
+    queries = [
+        {"name": "日线最新日期（get_latest_date_for_code）", "collection": "stock_kline_daily",
+         "filter": {"ts_code": code}, "sort": [("trade_date", -1)], "limit": 1},
+        {"name": "因子时间序列（get_factor_data）", "collection": "stock_factor_pro",
+         "filter": {"code": code, "date": {"$gte": start_date, "$lte": end_date}}, "sort": [("date", 1)]},
+        {"name": "因子单日截面（filter_small_cap_stocks / 训练集）", "collection": "stock_factor_pro",
+         "filter": {"trade_date": end_date}},
+        {"name": "默认结构筛选（LatestStructureStore.screen）", "collection": "analysis_latest_structure",
+         "filter": {"level": "30min"}, "sort": [("bsp_time", -1), ("ts_code", 1)], "limit": 100},
+    ]
+    for native in (False, True):
+        for collection_name, bars in (("stock_kline_daily", 1), ("stock_kline_30min", 8), ("stock_kline_5min", 48)):
+            if collection_name == "stock_kline_daily":
+                start, end = start_date, end_date
+            else:
+                start, end = start_time, None
+            field, time_range = build_time_range(collection_name, start, end, native)
+            path = NATIVE_TIME_FIELD if native else KLINE_TIME_FIELDS[collection_name][0]
+            queries.extend([
+                {"name": f"{collection_name} 区间（find_klines, {path}）", "collection": collection_name,
+                 "filter": {"ts_code": code, field: time_range}, "sort": [(field, 1)]},
+                {"name": f"{collection_name} 最近N根（find_klines last_n, {path}）", "collection": collection_name,
+                 "filter": {"ts_code": code}, "sort": [(field, -1)], "limit": 90 * bars},
+                {"name": f"{collection_name} 批量（_fetch_stock_data_bulk, {path}）", "collection": collection_name,
+                 "filter": {"ts_code": {"$in": [code]}, field: time_range},
+                 "sort": [("ts_code", 1), (field, 1)]},
+            ])
+    return queries
+
+
+def _plan_stages(plan: Any) -> List[str]:
+    """递归收集查询计划中的所有阶段名"""
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(_plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(_plan_stages(item))
+    return stages
+
+
+def explain_query(db, query: Dict[str, Any]) -> Dict[str, Any]:
+    """对单个标准查询执行 explain（queryPlanner），返回获胜计划的阶段与结论"""
+    command: Dict[str, Any] = {"find": query["collection"], "filter": query["filter"]}
+    if query.get("sort"):
+        command["sort"] = dict(query["sort"])
+    if query.get("limit"):
+        command["limit"] = query["limit"]
+
+    result = {"name": query["name"], "collection": query["collection"]}
+    try:
+        explain = db.command("explain", command, verbosity="queryPlanner")
+    except Exception as e:
+        result.update({"status": "error", "error": str(e)})
+        return result
+
+    winning_plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+    stages = _plan_stages(winning_plan)
+    violations = sorted(set(stages) & FORBIDDEN_STAGES)
+    if stages == ["EOF"]:
+        status = "skipped"  # 集合不存在
+    else:
+        status = "fail" if violations else "ok"
+    result.update({"status": status, "stages": stages, "violations": violations})
+    return result
+
+
+def verify_query_plans(db) -> List[Dict[str, Any]]:
+    return [explain_query(db, query) for query in canonical_queries(db)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='热点集合索引维护与查询计划校验')
+    parser.add_argument('--check-only', action='store_true', help='只校验，不创建索引')
+    parser.add_argument('--json', help='把结果写入JSON文件')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    db = get_db_handler().db
+
+    print("🔧 索引检查" if args.check_only else "🔧 创建索引")
+    index_results = ensure_indexes(db, create=not args.check_only)
+    icons = {"exists": "✅", "created": "🆕", "missing": "⚠️", "failed": "❌"}
+    for result in index_results:
+        print(f"  {icons[result['status']]} {result['collection']}.{result['index']}: {result['status']}")
+
+    print("\n🔍 查询计划校验")
+    plan_results = verify_query_plans(db)
+    icons = {"ok": "✅", "fail": "❌", "skipped": "⏭️", "error": "❌"}
+    for result in plan_results:
+        detail = " → ".join(result.get("stages", [])) or result.get("error", "")
+        print(f"  {icons[result['status']]} {result['name']}: {detail}")
+
+    failed = [result for result in plan_results if result["status"] in ("fail", "error")]
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({"indexes": index_results, "query_plans": plan_results,
+                       "generated_at": datetime.now().isoformat()}, f, ensure_ascii=False, indent=2)
+        print(f"\n📄 结果已写入: {args.json}")
+
+    if failed:
+        print(f"\n❌ {len(failed)} 个查询存在全表扫描或内存排序")
+        sys.exit(1)
+    print("\n🎉 全部查询计划合格")
+
+
+if __name__ == '__main__':
+    main()
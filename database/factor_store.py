@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+因子本地列式存储
+把 stock_factor_pro 按交易日同步为本地Parquet分区，训练脚本反复读取同一段因子历史时
+直接读本地文件：按日期目录裁剪分区，只读取所需列，股票过滤下推到Parquet行组。
+MongoDB始终是数据源，存储只追加尚未同步的交易日。
+
+目录结构：
+    {FACTOR_STORE_DIR}/trade_date=YYYYMMDD/part.parquet    单日全市场因子（按ts_code排序）
+    {FACTOR_STORE_DIR}/_manifest.json                      已同步交易日、已完整覆盖的日期区间
+    {FACTOR_STORE_DIR}/_manifest.lock                      清单文件锁（多进程同步时串行化 读取-合并-写入）
+
+覆盖区间内的交易日全部同步过（包括没有数据的日期），读取覆盖区间时不再访问MongoDB；
+区间之外的日期在首次读取时同步一次。覆盖区间最多延伸到 stock_factor_pro 中最新的 trade_date，
+入库滞后或入库失败的日期不会被登记为已覆盖，数据补齐后下次读取即可同步。
+
+读取入口 QlibDataAdapter.get_cross_section / get_factor_panel：
+    FACTOR_SOURCE=mongo（默认）  直接查询MongoDB
+    FACTOR_SOURCE=store          读取本地存储，缺失日期先从MongoDB补齐
+
+同步：
+    python database/factor_store.py --start 20200101 --end 20241231 --workers 8
+"""
+
+import fcntl
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional, Tuple, Union
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - 可选依赖
+    pa = None
+
+# 添加项目根目录到路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from database.db_handler import get_db_handler
+
+logger = logging.getLogger(__name__)
+
+FACTOR_STORE_ROOT = os.getenv("FACTOR_STORE_DIR", os.path.join(project_root, "data", "factor_store"))
+FACTOR_SOURCE = os.getenv("FACTOR_SOURCE", "mongo")
+FACTOR_COLLECTION = "stock_factor_pro"
+
+MANIFEST = "_manifest.json"
+MANIFEST_LOCK = "_manifest.lock"
+PARTITION_FILE = "part.parquet"
+KEY_FIELDS = ["ts_code", "trade_date"]
+
+
+def to_trade_date(date: Union[datetime, str]) -> str:
+    """日期 → YYYYMMDD"""
+    if isinstance(date, datetime):
+        return date.strftime('%Y%m%d')
+    return str(date).replace('-', '')[:8]
+
+
+def _shift_day(trade_date: str, days: int) -> str:
+    return (datetime.strptime(trade_date, '%Y%m%d') + timedelta(days=days)).strftime('%Y%m%d')
+
+
+def _merge_ranges(ranges: List[List[str]]) -> List[List[str]]:
+    """合并重叠或首尾相接的日期区间"""
+    merged: List[List[str]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= _shift_day(merged[-1][1], 1):
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def _normalize_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    统一列类型以便写入Parquet：键字段为字符串；
+    object 列能完整转为数值时存为 float64，否则存为字符串（None 保留为 null）
+    """
+    for column in df.columns:
+        if column in KEY_FIELDS:
+            df[column] = df[column].astype(str)
+            continue
+        if df[column].dtype != object:
+            continue
+        numeric = pd.to_numeric(df[column], errors='coerce')
+        if numeric.notna().sum() == df[column].notna().sum():
+            df[column] = numeric.astype('float64')
+        else:
+            df[column] = df[column].where(df[column].isna(), df[column].astype(str))
+    return df
+
+
+class FactorStore:
+    """因子Parquet存储的同步与读取"""
+
+    def __init__(self, root: str = FACTOR_STORE_ROOT, db_handler=None,
+                 collection_name: str = FACTOR_COLLECTION):
+        if pa is None:
+            raise ImportError("因子存储需要安装pyarrow: pip install pyarrow")
+        self.root = root
+        self.collection_name = collection_name
+        self._db_handler = db_handler
+        self._manifest: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+
+    @property
+    def db_handler(self):
+        if self._db_handler is None:
+            self._db_handler = get_db_handler()
+        return self._db_handler
+
+    # ==================== 元数据 ====================
+
+    def _partition_path(self, trade_date: str) -> str:
+        return os.path.join(self.root, f"trade_date={trade_date}", PARTITION_FILE)
+
+    def read_manifest(self) -> Dict[str, Any]:
+        if self._manifest is None:
+            try:
+                with open(os.path.join(self.root, MANIFEST), 'r', encoding='utf-8') as f:
+                    self._manifest = json.load(f)
+            except (FileNotFoundError, ValueError):
+                self._manifest = {"dates": [], "ranges": []}
+        return self._manifest
+
+    def _write_manifest(self, manifest: Dict[str, Any]):
+        """写入唯一命名的临时文件后原子替换，多个写者不会共用同一个临时文件"""
+        os.makedirs(self.root, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=f"{MANIFEST}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False)
+            os.replace(tmp_path, os.path.join(self.root, MANIFEST))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        self._manifest = manifest
+
+    @contextmanager
+    def _manifest_lock(self):
+        """清单的排他文件锁（跨进程），配合线程锁保护 读取-合并-写入"""
+        os.makedirs(self.root, exist_ok=True)
+        with self._lock, open(os.path.join(self.root, MANIFEST_LOCK), "a+") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _record(self, dates: List[str] = (), ranges: List[Tuple[str, str]] = ()):
+        """登记新同步的交易日与完整覆盖的区间"""
+        with self._manifest_lock():
+            # 持锁后重新读取磁盘上的清单再合并，多个进程（如并行构建训练集）同时同步时不丢失对方登记的日期
+            self._manifest = None
+            manifest = self.read_manifest()
+            manifest = {
+                "collection": self.collection_name,
+                "dates": sorted(set(manifest.get("dates", [])) | set(dates)),
+                "ranges": _merge_ranges(manifest.get("ranges", []) + [list(r) for r in ranges]),
+                "synced_at": datetime.now().isoformat()
+            }
+            self._write_manifest(manifest)
+
+    def dates(self, start: Optional[str] = None, end: Optional[str] = None) -> List[str]:
+        """已同步的交易日（升序）"""
+        dates = self.read_manifest().get("dates", [])
+        if start:
+            dates = [d for d in dates if d >= to_trade_date(start)]
+        if end:
+            dates = [d for d in dates if d <= to_trade_date(end)]
+        return dates
+
+    def has_date(self, trade_date: Union[datetime, str]) -> bool:
+        return os.path.exists(self._partition_path(to_trade_date(trade_date)))
+
+    def _covering_range(self, trade_date: str) -> Optional[List[str]]:
+        for start, end in self.read_manifest().get("ranges", []):
+            if start <= trade_date <= end:
+                return [start, end]
+        return None
+
+    def _uncovered(self, start: str, end: str) -> List[Tuple[str, str]]:
+        """[start, end] 中尚未完整覆盖的子区间"""
+        gaps = []
+        cursor = start
+        for range_start, range_end in self.read_manifest().get("ranges", []):
+            if range_end < cursor:
+                continue
+            if range_start > end:
+                break
+            if range_start > cursor:
+                gaps.append((cursor, _shift_day(range_start, -1)))
+            cursor = _shift_day(range_end, 1)
+            if cursor > end:
+                break
+        if cursor <= end:
+            gaps.append((cursor, end))
+        return gaps
+
+    def nearest_date(self, date: Union[datetime, str]) -> Optional[str]:
+        """
+        不晚于 date 的最近交易日（仅当 date 在覆盖区间内且结果也在该区间内时可由存储判定）
+
+        Returns:
+            YYYYMMDD；无法仅凭存储判定时返回 None（调用方改用交易日历）
+        """
+        trade_date = to_trade_date(date)
+        covering = self._covering_range(trade_date)
+        if covering is None:
+            return None
+        dates = self.dates()
+        position = bisect_right(dates, trade_date)
+        if position == 0 or dates[position - 1] < covering[0]:
+            return None
+        return dates[position - 1]
+
+    # ==================== 同步 ====================
+
+    def _source_dates(self, start: str, end: str) -> List[str]:
+        """MongoDB中 [start, end] 内有因子数据的交易日（走 trade_date 索引）"""
+        collection = self.db_handler.get_collection(self.collection_name)
+        return sorted(collection.distinct("trade_date", {"trade_date": {"$gte": start, "$lte": end}}))
+
+    def _latest_source_date(self) -> Optional[str]:
+        """MongoDB中最新的 trade_date（走 trade_date 索引），集合为空时为 None"""
+        collection = self.db_handler.get_collection(self.collection_name)
+        doc = collection.find_one({}, {"_id": 0, "trade_date": 1}, sort=[("trade_date", -1)])
+        return str(doc["trade_date"]) if doc else None
+
+    def sync_date(self, trade_date: str) -> int:
+        """
+        同步单个交易日的全市场因子，写临时文件后原子替换
+
+        Returns:
+            写入的行数（当日无数据时为0，不生成分区）
+        """
+        cursor = self.db_handler.get_collection(self.collection_name).find(
+            {"trade_date": trade_date}, {"_id": 0}).sort("ts_code", 1)
+        docs = list(cursor)
+        if not docs:
+            return 0
+
+        df = _normalize_frame(pd.DataFrame(docs))
+        path = self._partition_path(trade_date)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp_path, compression="zstd")
+        os.replace(tmp_path, path)
+        return len(docs)
+
+    def sync(self, start: Union[datetime, str], end: Union[datetime, str], workers: int = 4,
+             refresh: bool = False) -> Dict[str, Any]:
+        """
+        增量同步 [start, end]：只处理尚未覆盖的子区间，并只拉取其中本地缺失的交易日
+        区间已完整覆盖时不访问MongoDB
+
+        Args:
+            refresh: 忽略已有覆盖，重新拉取区间内全部交易日
+        """
+        started = time.perf_counter()
+        start, end = to_trade_date(start), to_trade_date(end)
+        gaps = [(start, end)] if refresh else self._uncovered(start, end)
+        latest = self._latest_source_date() if gaps else None
+
+        rows = 0
+        synced: List[str] = []
+        failures: Dict[str, str] = {}
+        covered: List[Tuple[str, str]] = []
+        for gap_start, gap_end in gaps:
+            source_dates = self._source_dates(gap_start, gap_end)
+            pending = source_dates if refresh else [d for d in source_dates if not self.has_date(d)]
+            gap_failures = 0
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {executor.submit(self.sync_date, d): d for d in pending}
+                for future in as_completed(futures):
+                    trade_date = futures[future]
+                    try:
+                        rows += future.result()
+                        synced.append(trade_date)
+                    except Exception as e:
+                        gap_failures += 1
+                        failures[trade_date] = str(e)
+                        logger.error(f"❌ 同步因子 {trade_date} 失败: {e}")
+            # 已存在的分区同样登记；最新入库日期之后的日期可能尚未入库，不登记为已覆盖
+            pending_set = set(pending)
+            synced.extend(d for d in source_dates if d not in pending_set)
+            cover_end = min(gap_end, latest) if latest else None
+            if not gap_failures and cover_end and cover_end >= gap_start:
+                covered.append((gap_start, cover_end))
+
+        if synced or covered:
+            self._record(synced, covered)
+        return {
+            "start": start,
+            "end": end,
+            "dates": len(synced),
+            "rows": rows,
+            "failed": failures,
+            "seconds": round(time.perf_counter() - started, 1)
+        }
+
+    def ensure_dates(self, dates: List[Union[datetime, str]], workers: int = 4) -> List[str]:
+        """
+        保证给定交易日已同步（用于按调仓日读取截面），已覆盖的日期不访问MongoDB
+
+        Returns:
+            本次新同步的日期
+        """
+        pending = sorted({d for d in map(to_trade_date, dates) if not self._covering_range(d)})
+        if not pending:
+            return []
+        synced, covered = [], []
+        latest = None
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for trade_date, rows in zip(pending, executor.map(self.sync_date, pending)):
+                if rows:
+                    synced.append(trade_date)
+                    covered.append((trade_date, trade_date))
+                    continue
+                # 无数据的日期只有早于最新入库日期时才视为非交易日登记为已覆盖，避免重复查询；
+                # 更晚的日期可能只是尚未入库，保持未覆盖以便数据补齐后重新同步
+                latest = latest or self._latest_source_date()
+                if latest and trade_date < latest:
+                    covered.append((trade_date, trade_date))
+        if synced or covered:
+            self._record(synced, covered)
+        return synced
+
+    # ==================== 读取 ====================
+
+    def read_table(self, trade_date: str, columns: Optional[List[str]] = None,
+                   symbols: Optional[List[str]] = None):
+        """
+        读取单日分区为Arrow表
+
+        Args:
+            columns: 只读取的因子列（键字段总是读取，分区中不存在的列忽略）
+            symbols: 股票代码过滤，下推到Parquet按行组统计裁剪；空列表时不读取
+        """
+        if symbols is not None and not symbols:
+            return None
+        path = self._partition_path(trade_date)
+        if not os.path.exists(path):
+            return None
+        if columns is not None:
+            available = set(pq.read_schema(path).names)
+            columns = KEY_FIELDS + [c for c in dict.fromkeys(columns) if c in available and c not in KEY_FIELDS]
+        filters = [("ts_code", "in", list(symbols))] if symbols is not None else None
+        return pq.read_table(path, columns=columns, filters=filters)
+
+    def read(self, start: Union[datetime, str, None] = None, end: Union[datetime, str, None] = None,
+             dates: Optional[List[Union[datetime, str]]] = None, columns: Optional[List[str]] = None,
+             symbols: Optional[List[str]] = None, limit: Optional[int] = None,
+             workers: int = 4) -> pd.DataFrame:
+        """
+        读取因子长表（ts_code, trade_date, 因子...），按 (trade_date, ts_code) 升序
+
+        Args:
+            start, end: 日期范围（闭区间），按分区目录裁剪
+            dates: 指定交易日列表（与 start/end 同时给出时取交集）
+            columns: 因子列；None 为全部列。请求了但不存在的列补为NaN
+            symbols: 股票代码（tushare格式）
+            limit: 只取最前N行（从最早分区依次读取，不读多余分区）
+        """
+        trade_dates = self.dates(start, end)
+        if dates is not None:
+            wanted = {to_trade_date(d) for d in dates}
+            trade_dates = [d for d in trade_dates if d in wanted]
+
+        if limit:
+            tables, rows = [], 0
+            for trade_date in trade_dates:
+                table = self.read_table(trade_date, columns, symbols)
+                tables.append(table)
+                rows += len(table) if table is not None else 0
+                if rows >= limit:
+                    break
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                tables = list(executor.map(lambda d: self.read_table(d, columns, symbols), trade_dates))
+        frames = [table.to_pandas() for table in tables if table is not None and len(table)]
+
+        if columns is not None:
+            full_columns = KEY_FIELDS + [c for c in dict.fromkeys(columns) if c not in KEY_FIELDS]
+        else:
+            full_columns = None
+        if not frames:
+            return pd.DataFrame(columns=full_columns or KEY_FIELDS)
+        df = pd.concat(frames, ignore_index=True)
+        if limit:
+            df = df.head(limit)
+        return df.reindex(columns=full_columns) if full_columns else df
+
+    def read_cross_section(self, trade_date: Union[datetime, str], columns: Optional[List[str]] = None,
+                           symbols: Optional[List[str]] = None) -> pd.DataFrame:
+        """读取单日截面，以 ts_code 为索引"""
+        df = self.read(dates=[trade_date], columns=columns, symbols=symbols)
+        return df.drop(columns=["trade_date"]).set_index("ts_code")
+
+
+_store: Optional[FactorStore] = None
+
+
+def get_factor_store() -> FactorStore:
+    """获取因子存储单例"""
+    global _store
+    if _store is None:
+        _store = FactorStore()
+    return _store
+
+
+def use_factor_store() -> bool:
+    """是否从本地因子存储读取"""
+    return FACTOR_SOURCE == "store" and pa is not None
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='因子本地列式存储增量同步')
+    parser.add_argument('--start', required=True, help='开始日期 (YYYYMMDD)')
+    parser.add_argument('--end', default=datetime.now().strftime('%Y%m%d'), help='结束日期 (YYYYMMDD)')
+    parser.add_argument('--workers', type=int, default=4, help='并行线程数')
+    parser.add_argument('--refresh', action='store_true', help='重新拉取区间内全部交易日')
+    parser.add_argument('--root', default=FACTOR_STORE_ROOT, help='存储目录')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    store = FactorStore(args.root)
+    print(f"📁 因子存储目录: {args.root}")
+    result = store.sync(args.start, args.end, args.workers, refresh=args.refresh)
+    print(f"✅ {result['start']} ~ {result['end']}: 同步 {result['dates']} 个交易日, "
+          f"新增 {result['rows']} 行, 失败 {len(result['failed'])} 个, 耗时 {result['seconds']}秒")
+    ranges = store.read_manifest().get("ranges", [])
+    print(f"📅 已覆盖区间: {', '.join(f'{s}~{e}' for s, e in ranges) or '无'}")
+
+
+if __name__ == '__main__':
+    main()
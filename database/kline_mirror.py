@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+K线本地列式镜像
+把 stock_kline_daily / stock_kline_30min / stock_kline_5min 增量同步为本地Parquet文件，
+批量历史读取时直接读列式文件，避免pymongo逐文档解码。MongoDB始终是数据源，镜像只读。
+
+目录结构：
+    {KLINE_MIRROR_DIR}/{level}/{ts_code}/{分区}.parquet    日线按年分区，分钟线按月分区
+    {KLINE_MIRROR_DIR}/{level}/{ts_code}/_manifest.json    最新时间、行数、同步时间
+
+读取入口 find_klines() 返回与MongoDB文档相同字段的记录：
+    KLINE_SOURCE=mongo（默认）  直接查询MongoDB
+    KLINE_SOURCE=mirror         优先读取镜像，镜像缺失或过期时回退MongoDB
+    KLINE_SOURCE=bars           优先读取内存映射二进制存储（database/bar_store.py），缺失或过期时回退MongoDB
+
+同步：
+    python database/kline_mirror.py --levels daily,30min --workers 8
+"""
+
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - 可选依赖
+    pa = None
+
+# 添加项目根目录到路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from database.db_handler import get_db_handler
+from database.time_fields import time_range_query
+
+logger = logging.getLogger(__name__)
+
+MIRROR_ROOT = os.getenv("KLINE_MIRROR_DIR", os.path.join(project_root, "data", "kline_mirror"))
+KLINE_SOURCE = os.getenv("KLINE_SOURCE", "mongo")
+# 镜像超过该时长未同步时视为过期，读取回退到MongoDB
+MIRROR_MAX_AGE = timedelta(hours=float(os.getenv("KLINE_MIRROR_MAX_AGE_HOURS", "24")))
+
+# 级别 → (集合, 时间字段)
+LEVELS: Dict[str, Tuple[str, str]] = {
+    "daily": ("stock_kline_daily", "trade_date"),
+    "30min": ("stock_kline_30min", "trade_time"),
+    "5min": ("stock_kline_5min", "trade_time"),
+}
+
+# 镜像保存的数值字段（固定schema，缺失为null）
+PRICE_FIELDS = ["open", "high", "low", "close", "pre_close", "change", "pct_chg", "vol", "amount"]
+
+MANIFEST = "_manifest.json"
+
+
+def _partition_key(level: str, time_value: str) -> str:
+    """日线按年分区（2024），分钟线按月分区（202401）"""
+    if level == "daily":
+        return time_value[:4]
+    return time_value[:4] + time_value[5:7]
+
+
+def _schema(time_field: str):
+    return pa.schema(
+        [("ts_code", pa.string()), (time_field, pa.string())] +
+        [(name, pa.float64()) for name in PRICE_FIELDS]
+    )
+
+
+def _to_float(value) -> Optional[float]:
+    try:
+        return None if value is None else float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class KlineMirror:
+    """K线Parquet镜像的同步与读取"""
+
+    def __init__(self, root: str = MIRROR_ROOT, db_handler=None):
+        if pa is None:
+            raise ImportError("K线镜像需要安装pyarrow: pip install pyarrow")
+        self.root = root
+        self._db_handler = db_handler
+
+    @property
+    def db_handler(self):
+        if self._db_handler is None:
+            self._db_handler = get_db_handler()
+        return self._db_handler
+
+    # ==================== 元数据 ====================
+
+    def _symbol_dir(self, level: str, ts_code: str) -> str:
+        return os.path.join(self.root, level, ts_code)
+
+    def read_manifest(self, level: str, ts_code: str) -> Optional[Dict[str, Any]]:
+        path = os.path.join(self._symbol_dir(level, ts_code), MANIFEST)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _write_manifest(self, level: str, ts_code: str, manifest: Dict[str, Any]):
+        path = os.path.join(self._symbol_dir(level, ts_code), MANIFEST)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def is_fresh(self, level: str, ts_code: str) -> bool:
+        """镜像存在且在 MIRROR_MAX_AGE 内同步过"""
+        manifest = self.read_manifest(level, ts_code)
+        if not manifest or not manifest.get("synced_at"):
+            return False
+        return datetime.now() - datetime.fromisoformat(manifest["synced_at"]) <= MIRROR_MAX_AGE
+
+    # ==================== 同步 ====================
+
+    def sync_symbol(self, level: str, ts_code: str) -> int:
+        """
+        增量同步单只股票：只拉取镜像最新时间之后的K线
+
+        Returns:
+            新增（或覆盖）的行数
+        """
+        collection_name, time_field = LEVELS[level]
+        manifest = self.read_manifest(level, ts_code) or {}
+        local_last = manifest.get("last_time")
+
+        latest = self.db_handler.get_latest_date_for_code(collection_name, ts_code, field=time_field)
+        if latest is None:
+            return 0
+        latest_str = latest.strftime('%Y%m%d' if level == "daily" else '%Y-%m-%d %H:%M:%S')
+        if local_last and latest_str <= local_last:
+            manifest["synced_at"] = datetime.now().isoformat()
+            self._write_manifest(level, ts_code, manifest)
+            return 0
+
+        query: Dict[str, Any] = {"ts_code": ts_code}
+        if local_last:
+            query[time_field] = {"$gt": local_last}
+        projection = {"_id": 0, "ts_code": 1, time_field: 1, **{name: 1 for name in PRICE_FIELDS}}
+        cursor = self.db_handler.get_collection(collection_name).find(query, projection).sort(time_field, 1)
+
+        partitions: Dict[str, List[Dict[str, Any]]] = {}
+        for doc in cursor:
+            time_value = str(doc.get(time_field, ""))
+            if not time_value:
+                continue
+            partitions.setdefault(_partition_key(level, time_value), []).append(doc)
+        if not partitions:
+            return 0
+
+        os.makedirs(self._symbol_dir(level, ts_code), exist_ok=True)
+        rows = 0
+        for key, docs in partitions.items():
+            rows += self._merge_partition(level, ts_code, key, time_field, docs)
+
+        last_docs = partitions[max(partitions)]
+        manifest.update({
+            "ts_code": ts_code,
+            "level": level,
+            "last_time": str(last_docs[-1][time_field]),
+            "rows": manifest.get("rows", 0) + rows,
+            "synced_at": datetime.now().isoformat()
+        })
+        self._write_manifest(level, ts_code, manifest)
+        return rows
+
+    def _merge_partition(self, level: str, ts_code: str, key: str, time_field: str,
+                         docs: List[Dict[str, Any]]) -> int:
+        """把新文档合并进分区文件（同一时间以新数据为准），写临时文件后原子替换"""
+        schema = _schema(time_field)
+        new_table = pa.table({
+            "ts_code": [ts_code] * len(docs),
+            time_field: [str(doc[time_field]) for doc in docs],
+            **{name: [_to_float(doc.get(name)) for doc in docs] for name in PRICE_FIELDS}
+        }, schema=schema)
+
+        path = os.path.join(self._symbol_dir(level, ts_code), f"{key}.parquet")
+        if os.path.exists(path):
+            existing = pq.read_table(path)
+            new_times = pa.array(new_table[time_field].to_pylist(), type=pa.string())
+            keep = pc.invert(pc.is_in(existing[time_field], value_set=new_times))
+            table = pa.concat_tables([existing.filter(keep), new_table])
+            table = table.take(pc.sort_indices(table, sort_keys=[(time_field, "ascending")]))
+        else:
+            table = new_table
+
+        tmp_path = f"{path}.tmp"
+        pq.write_table(table, tmp_path, compression="zstd")
+        os.replace(tmp_path, path)
+        return len(docs)
+
+    def sync(self, level: str, ts_codes: List[str], workers: int = 8) -> Dict[str, Any]:
+        """并行增量同步多只股票（Mongo查询与文件写入均释放GIL，线程池即可）"""
+        started = time.perf_counter()
+        rows = 0
+        failures = {}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(self.sync_symbol, level, ts_code): ts_code for ts_code in ts_codes}
+            for i, future in enumerate(as_completed(futures), 1):
+                ts_code = futures[future]
+                try:
+                    rows += future.result()
+                except Exception as e:
+                    failures[ts_code] = str(e)
+                    logger.error(f"❌ 同步 {level} {ts_code} 失败: {e}")
+                if i % 500 == 0:
+                    logger.info(f"📊 {level}: {i}/{len(ts_codes)} 只, 新增 {rows} 行")
+        return {
+            "level": level,
+            "symbols": len(ts_codes),
+            "rows": rows,
+            "failed": failures,
+            "seconds": round(time.perf_counter() - started, 1)
+        }
+
+    # ==================== 读取 ====================
+
+    def read_table(self, level: str, ts_code: str, start: Optional[str] = None,
+                   end: Optional[str] = None, last_n: Optional[int] = None):
+        """
+        读取镜像为Arrow表（按时间升序）
+
+        Args:
+            start, end: 时间范围（与Mongo时间字段同格式，闭区间）
+            last_n: 只取最近N根（从最新分区向前读取，不读多余分区）
+        """
+        _, time_field = LEVELS[level]
+        symbol_dir = self._symbol_dir(level, ts_code)
+        try:
+            keys = sorted(name[:-len(".parquet")] for name in os.listdir(symbol_dir) if name.endswith(".parquet"))
+        except FileNotFoundError:
+            return _schema(time_field).empty_table()
+
+        if start:
+            keys = [key for key in keys if key >= _partition_key(level, start)]
+        if end:
+            keys = [key for key in keys if key <= _partition_key(level, end)]
+
+        tables = []
+        rows = 0
+        for key in reversed(keys):
+            table = pq.read_table(os.path.join(symbol_dir, f"{key}.parquet"))
+            tables.append(table)
+            rows += len(table)
+            if last_n and not start and not end and rows >= last_n:
+                break
+        if not tables:
+            return _schema(time_field).empty_table()
+
+        table = pa.concat_tables(reversed(tables))
+        if start:
+            table = table.filter(pc.greater_equal(table[time_field], start))
+        if end:
+            table = table.filter(pc.less_equal(table[time_field], end))
+        if last_n and len(table) > last_n:
+            table = table.slice(len(table) - last_n)
+        return table
+
+
+_mirror: Optional[KlineMirror] = None
+
+
+def get_kline_mirror() -> KlineMirror:
+    """获取K线镜像单例"""
+    global _mirror
+    if _mirror is None:
+        _mirror = KlineMirror()
+    return _mirror
+
+
+def use_mirror() -> bool:
+    """是否启用本地存储读取（Parquet镜像或二进制存储）"""
+    return (KLINE_SOURCE == "mirror" and pa is not None) or KLINE_SOURCE == "bars"
+
+
+def find_klines(level: str, ts_code: str, start: Optional[str] = None, end: Optional[str] = None,
+                last_n: Optional[int] = None, db_handler=None) -> List[Dict[str, Any]]:
+    """
+    读取单只股票K线（按时间升序），返回与MongoDB文档字段相同的字典列表
+
+    Args:
+        level: "daily" / "30min" / "5min"
+        ts_code: 股票代码
+        start, end: 时间范围，日线为YYYYMMDD，分钟线为YYYY-MM-DD HH:MM:SS（闭区间）
+        last_n: 只取最近N根
+        db_handler: 回退到MongoDB时使用的处理器
+    """
+    if KLINE_SOURCE == "bars":
+        from database.bar_store import get_bar_store
+        store = get_bar_store()
+        if store.is_fresh(level, ts_code):
+            return store.find_klines(level, ts_code, start, end, last_n)
+    elif use_mirror():
+        mirror = get_kline_mirror()
+        if mirror.is_fresh(level, ts_code):
+            return mirror.read_table(level, ts_code, start, end, last_n).to_pylist()
+
+    collection_name, _ = LEVELS[level]
+    db_handler = db_handler or get_db_handler()
+    # 迁移完成后范围查询与排序使用原生 trade_dt 字段
+    time_field, time_range = time_range_query(db_handler.db, collection_name, start, end)
+    query: Dict[str, Any] = {"ts_code": ts_code}
+    if time_range:
+        query[time_field] = time_range
+
+    collection = db_handler.get_collection(collection_name)
+    if last_n:
+        docs = list(collection.find(query).sort(time_field, -1).limit(last_n))
+        docs.reverse()
+        return docs
+    return list(collection.find(query).sort(time_field, 1))
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='K线本地列式镜像增量同步')
+    parser.add_argument('--levels', default='daily,30min,5min', help='级别，逗号分隔')
+    parser.add_argument('--symbols', nargs='*', help='股票代码（默认全市场）')
+    parser.add_argument('--workers', type=int, default=8, help='并行线程数')
+    parser.add_argument('--root', default=MIRROR_ROOT, help='镜像目录')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    mirror = KlineMirror(args.root)
+    symbols = args.symbols or sorted(
+        doc['ts_code'] for doc in mirror.db_handler.get_collection('infrastructure_stock_basic').find(
+            {'ts_code': {'$exists': True}}, {'_id': 0, 'ts_code': 1})
+    )
+    print(f"📁 镜像目录: {args.root}, 股票数: {len(symbols)}")
+
+    for level in [level.strip() for level in args.levels.split(',') if level.strip()]:
+        result = mirror.sync(level, symbols, args.workers)
+        print(f"✅ {level}: 新增 {result['rows']} 行, 失败 {len(result['failed'])} 只, 耗时 {result['seconds']}秒")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+全市场K线数据质量扫描
+按股票分片并行扫描 stock_kline_daily / stock_kline_30min / stock_kline_5min，逐只股票、逐级别报告：
+    missing_bars      首尾之间按交易日历与日内槽位（chan_theory_v2/core/session_slots.py）应有而缺失的K线数
+    duplicates        同一时间的重复记录数
+    off_session       不在交易时段槽位上的分钟K线数
+    ohlc_invalid      价格不一致的K线数（high < max(open, close)、low > min(open, close)、high < low、价格缺失或<=0）
+    zero_volume_bars  成交量为0的K线数，zero_volume_runs 为连续 >= --zero-run 根的段数
+    stale_bars        最后一根K线之后截至扫描时点应有的K线数（超过 --stale-days 个交易日即视为过期）
+
+数据源：
+    mongo   每个分片一条聚合管道，在服务端完成去重计数与一致性检查，只返回每只股票一行汇总
+    mirror  读取本地Parquet镜像（database/kline_mirror.py），用于离线复核
+
+运行方式：
+python database/kline_quality_scan.py --json quality_report.json
+python database/kline_quality_scan.py --levels 5min --days 60 --workers 16
+python database/kline_quality_scan.py --source mirror --symbols 000001.SZ 600519.SH
+退出码：0 无问题，1 存在问题股票
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional
+
+# 添加项目根目录到路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from database.db_handler import get_db_handler
+from database.kline_mirror import LEVELS, get_kline_mirror
+from chan_theory_v2.core.session_slots import get_level_slots
+
+logger = logging.getLogger(__name__)
+
+# 每条聚合管道覆盖的股票数
+SYMBOLS_PER_SHARD = 50
+
+TIME_FORMATS = {"trade_date": "%Y%m%d", "trade_time": "%Y-%m-%d %H:%M:%S"}
+
+
+def _parse_time(value: str, time_field: str) -> datetime:
+    return datetime.strptime(value, TIME_FORMATS[time_field])
+
+
+def _format_time(value: datetime, time_field: str) -> str:
+    return value.strftime(TIME_FORMATS[time_field])
+
+
+def _session_times(level: str) -> Optional[List[str]]:
+    """分钟级别合法的 HH:MM 标记时间（日线返回None）"""
+    slots = get_level_slots(level)
+    if slots.freq is None:
+        return None
+    return slots.slot_labels()
+
+
+# ==================== 分片汇总 ====================
+
+def _shard_pipeline(level: str, symbols: List[str], start: Optional[str], end: Optional[str]) -> List[Dict[str, Any]]:
+    """
+    单个分片的聚合管道：先按 (股票, 时间) 分组得到去重后的K线，再按股票汇总
+    时间按字符串字段分组，迁移 trade_dt 前后结果一致
+    """
+    _, time_field = LEVELS[level]
+    match: Dict[str, Any] = {"ts_code": {"$in": symbols}}
+    time_range: Dict[str, Any] = {}
+    if start:
+        time_range["$gte"] = start
+    if end:
+        time_range["$lte"] = end
+    if time_range:
+        match[time_field] = time_range
+
+    invalid = {"$or": [
+        {"$lt": ["$high", {"$max": ["$open", "$close"]}]},
+        {"$gt": ["$low", {"$min": ["$open", "$close"]}]},
+        {"$lt": ["$high", "$low"]},
+        {"$lte": ["$low", 0]},
+    ]}
+    session_times = _session_times(level)
+    # 分钟线取 trade_time 的 HH:MM 与合法标记时间比较
+    on_session = {"$in": [{"$substrCP": [f"${time_field}", 11, 5]}, session_times]} if session_times else True
+
+    return [
+        {"$match": match},
+        {"$group": {
+            "_id": {"ts_code": "$ts_code", "time": f"${time_field}"},
+            "n": {"$sum": 1},
+            "invalid": {"$max": {"$cond": [invalid, 1, 0]}},
+            "zero_volume": {"$max": {"$cond": [{"$lte": ["$vol", 0]}, 1, 0]}},
+            "off_session": {"$max": {"$cond": [on_session, 0, 1]}},
+        }},
+        {"$group": {
+            "_id": "$_id.ts_code",
+            "bars": {"$sum": 1},
+            "duplicates": {"$sum": {"$subtract": ["$n", 1]}},
+            "ohlc_invalid": {"$sum": "$invalid"},
+            "off_session": {"$sum": "$off_session"},
+            "first": {"$min": "$_id.time"},
+            "last": {"$max": "$_id.time"},
+            "zero_volume_times": {"$push": {"$cond": [{"$eq": ["$zero_volume", 1]}, "$_id.time", None]}},
+        }},
+        {"$project": {
+            "bars": 1, "duplicates": 1, "ohlc_invalid": 1, "off_session": 1, "first": 1, "last": 1,
+            "zero_volume_times": {"$filter": {"input": "$zero_volume_times", "as": "t", "cond": {"$ne": ["$$t", None]}}},
+        }},
+    ]
+
+
+def scan_shard_mongo(db, level: str, symbols: List[str], start: Optional[str] = None,
+                     end: Optional[str] = None) -> List[Dict[str, Any]]:
+    """在服务端汇总一个分片，返回每只股票一行"""
+    collection_name, _ = LEVELS[level]
+    pipeline = _shard_pipeline(level, symbols, start, end)
+    rows = []
+    for doc in db[collection_name].aggregate(pipeline, allowDiskUse=True):
+        doc["ts_code"] = doc.pop("_id")
+        rows.append(doc)
+    return rows
+
+
+def scan_shard_mirror(level: str, symbols: List[str], start: Optional[str] = None,
+                      end: Optional[str] = None) -> List[Dict[str, Any]]:
+    """从Parquet镜像汇总一个分片（字段与 scan_shard_mongo 相同）"""
+    import numpy as np
+
+    _, time_field = LEVELS[level]
+    session_times = _session_times(level)
+    mirror = get_kline_mirror()
+    rows = []
+    for ts_code in symbols:
+        table = mirror.read_table(level, ts_code, start, end)
+        if len(table) == 0:
+            continue
+        columns = table.to_pydict()
+        times = np.asarray(columns[time_field], dtype=object)
+        prices = {field: np.asarray(columns[field], dtype=float)
+                  for field in ("open", "high", "low", "close", "vol")}
+        with np.errstate(invalid="ignore"):
+            invalid = ((prices["high"] < np.maximum(prices["open"], prices["close"]))
+                       | (prices["low"] > np.minimum(prices["open"], prices["close"]))
+                       | (prices["high"] < prices["low"])
+                       | ~(prices["low"] > 0))
+            zero_volume = ~(prices["vol"] > 0)
+
+        unique_times, first_index = np.unique(times, return_index=True)
+        if session_times:
+            off_session = sum(1 for value in unique_times if value[11:16] not in session_times)
+        else:
+            off_session = 0
+        rows.append({
+            "ts_code": ts_code,
+            "bars": len(unique_times),
+            "duplicates": len(times) - len(unique_times),
+            "ohlc_invalid": int(invalid[first_index].sum()),
+            "off_session": off_session,
+            "first": unique_times[0],
+            "last": unique_times[-1],
+            "zero_volume_times": sorted(set(times[zero_volume].tolist())),
+        })
+    return rows
+
+
+# ==================== 指标计算 ====================
+
+def evaluate_symbol(level: str, row: Dict[str, Any], as_of: datetime, stale_days: int = 1,
+                    zero_run: int = 3) -> Dict[str, Any]:
+    """把分片汇总行补充为完整的质量指标，并给出问题列表"""
+    _, time_field = LEVELS[level]
+    slots = get_level_slots(level)
+    first = _parse_time(row["first"], time_field)
+    last = _parse_time(row["last"], time_field)
+
+    expected = slots.expected_bars(first, last)
+    on_session = row["bars"] - row["off_session"]
+    missing = max(expected - on_session, 0)
+    stale_bars = max(slots.closed_before(as_of) - slots.closed_before(last), 0)
+
+    # 零成交量按槽位索引连续成段
+    indexes = sorted(index for index in (slots.index(_parse_time(value, time_field))
+                                         for value in row["zero_volume_times"]) if index is not None)
+    runs, current = [], 0
+    for i, index in enumerate(indexes):
+        current = current + 1 if i and index == indexes[i - 1] + 1 else 1
+        if i == len(indexes) - 1 or indexes[i + 1] != index + 1:
+            runs.append(current)
+
+    result = {
+        "ts_code": row["ts_code"],
+        "first": row["first"],
+        "last": row["last"],
+        "bars": row["bars"],
+        "expected_bars": expected,
+        "missing_bars": missing,
+        "duplicates": row["duplicates"],
+        "off_session": row["off_session"],
+        "ohlc_invalid": row["ohlc_invalid"],
+        "zero_volume_bars": len(row["zero_volume_times"]),
+        "zero_volume_runs": sum(1 for run in runs if run >= zero_run),
+        "max_zero_volume_run": max(runs, default=0),
+        "stale_bars": stale_bars,
+    }
+    issues = [name for name in ("missing_bars", "duplicates", "off_session", "ohlc_invalid", "zero_volume_runs")
+              if result[name]]
+    if stale_bars > stale_days * slots.slots_per_day:
+        issues.append("stale")
+    result["issues"] = issues
+    return result
+
+
+def scan_level(level: str, symbols: List[str], source: str = "mongo", start: Optional[str] = None,
+               end: Optional[str] = None, workers: int = 8, shard_size: int = SYMBOLS_PER_SHARD,
+               as_of: Optional[datetime] = None, stale_days: int = 1, zero_run: int = 3,
+               db=None) -> Dict[str, Any]:
+    """
+    扫描一个级别
+
+    Returns:
+        {"summary": 汇总计数, "symbols": 有问题股票的指标, "no_data": 无数据股票, "failed_shards": 失败分片}
+    """
+    db = db if db is not None else get_db_handler().db
+    as_of = as_of or datetime.now()
+    started = time.perf_counter()
+    shards = [symbols[i:i + shard_size] for i in range(0, len(symbols), shard_size)]
+
+    def run(shard: List[str]) -> List[Dict[str, Any]]:
+        if source == "mirror":
+            return scan_shard_mirror(level, shard, start, end)
+        return scan_shard_mongo(db, level, shard, start, end)
+
+    results: List[Dict[str, Any]] = []
+    failed_shards = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run, shard): shard for shard in shards}
+        for i, future in enumerate(as_completed(futures), 1):
+            shard = futures[future]
+            try:
+                rows = future.result()
+            except Exception as e:
+                logger.error(f"❌ {level} 分片 {shard[0]}~{shard[-1]} 扫描失败: {e}")
+                failed_shards.append({"first": shard[0], "last": shard[-1], "error": str(e)})
+                continue
+            results.extend(evaluate_symbol(level, row, as_of, stale_days, zero_run) for row in rows)
+            if i % 20 == 0 or i == len(shards):
+                logger.info(f"📊 {level}: {i}/{len(shards)} 个分片, 已汇总 {len(results)} 只")
+
+    scanned = {result["ts_code"] for result in results}
+    problems = sorted((result for result in results if result["issues"]), key=lambda r: r["ts_code"])
+    summary = {
+        "symbols": len(symbols),
+        "with_data": len(results),
+        "no_data": len(symbols) - len(scanned),
+        "with_issues": len(problems),
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+    for name in ("bars", "missing_bars", "duplicates", "off_session", "ohlc_invalid", "zero_volume_bars"):
+        summary[name] = sum(result[name] for result in results)
+    summary["stale_symbols"] = sum(1 for result in problems if "stale" in result["issues"])
+
+    return {
+        "summary": summary,
+        "symbols": problems,
+        "no_data": sorted(set(symbols) - scanned),
+        "failed_shards": failed_shards,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='全市场K线数据质量扫描')
+    parser.add_argument('--levels', default='daily,30min,5min', help='级别，逗号分隔')
+    parser.add_argument('--symbols', nargs='*', help='股票代码（默认全市场）')
+    parser.add_argument('--source', choices=['mongo', 'mirror'], default='mongo', help='数据源')
+    parser.add_argument('--days', type=int, help='只扫描最近N个自然日（默认全部历史）')
+    parser.add_argument('--workers', type=int, default=8, help='并行分片数')
+    parser.add_argument('--shard-size', type=int, default=SYMBOLS_PER_SHARD, help='每个分片的股票数')
+    parser.add_argument('--stale-days', type=int, default=1, help='最后一根K线落后超过N个交易日视为过期')
+    parser.add_argument('--zero-run', type=int, default=3, help='连续零成交量达到N根计为一段')
+    parser.add_argument('--json', help='把报告写入JSON文件')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    db = get_db_handler().db
+    symbols = args.symbols or sorted(
+        doc['ts_code'] for doc in db['infrastructure_stock_basic'].find(
+            {'ts_code': {'$exists': True}}, {'_id': 0, 'ts_code': 1})
+    )
+    as_of = datetime.now()
+    print(f"🔍 扫描 {len(symbols)} 只股票, 数据源: {args.source}")
+
+    report: Dict[str, Any] = {"generated_at": as_of.isoformat(), "source": args.source, "levels": {}}
+    for level in [level.strip() for level in args.levels.split(',') if level.strip()]:
+        _, time_field = LEVELS[level]
+        start = _format_time(as_of - timedelta(days=args.days), time_field) if args.days else None
+        result = scan_level(level, symbols, args.source, start=start, workers=args.workers,
+                            shard_size=args.shard_size, as_of=as_of, stale_days=args.stale_days,
+                            zero_run=args.zero_run, db=db)
+        report["levels"][level] = result
+
+        summary = result["summary"]
+        print(f"\n📈 {level}: {summary['with_data']} 只有数据, {summary['with_issues']} 只有问题, "
+              f"耗时 {summary['seconds']}秒")
+        print(f"  缺失K线 {summary['missing_bars']}, 重复 {summary['duplicates']}, "
+              f"非交易时段 {summary['off_session']}, OHLC异常 {summary['ohlc_invalid']}, "
+              f"零成交量 {summary['zero_volume_bars']}, 过期股票 {summary['stale_symbols']}, "
+              f"无数据 {summary['no_data']}")
+        if result["failed_shards"]:
+            print(f"  ❌ 失败分片 {len(result['failed_shards'])} 个")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n📄 报告已写入: {args.json}")
+
+    if any(level["symbols"] or level["failed_shards"] for level in report["levels"].values()):
+        sys.exit(1)
+    print("\n🎉 未发现数据质量问题")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+K线原生时间字段迁移
+为 stock_kline_daily / stock_kline_30min / stock_kline_5min 的每条记录补充BSON日期字段 trade_dt，
+建立 (ts_code, trade_dt) 复合索引，完成后在 schema_migrations 集合写入完成标记，
+读取方（database/time_fields.py）据此切换到原生字段。
+
+转换在服务端通过管道更新（$dateFromString）完成，不把文档拉回客户端；
+按股票分批执行，只处理缺少 trade_dt 或 trade_dt 为 null（时间格式异常）的记录，中断或修正数据后重新运行即可续跑。
+分批完成后再整集合补齐一次迁移期间写入的记录。读取方只在没有缺少 trade_dt 的记录时才切换，
+有绕过 with_native_time 的写入时重新运行本脚本即可补齐。
+
+运行方式：
+python database/migrate_time_fields.py
+python database/migrate_time_fields.py --collections stock_kline_daily --workers 4
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import List, Dict, Any
+
+# 添加项目根目录到路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from database.db_handler import get_db_handler
+from database.time_fields import (
+    NATIVE_TIME_FIELD, MIGRATIONS_COLLECTION, MISSING_NATIVE_QUERY, KLINE_TIME_FIELDS, migration_id,
+    reset_native_time_cache
+)
+
+logger = logging.getLogger(__name__)
+
+# 每次管道更新覆盖的股票数
+SYMBOLS_PER_UPDATE = 50
+
+
+def _update_pipeline(collection_name: str) -> List[Dict[str, Any]]:
+    string_field, fmt = KLINE_TIME_FIELDS[collection_name]
+    return [{"$set": {NATIVE_TIME_FIELD: {
+        "$dateFromString": {"dateString": f"${string_field}", "format": fmt, "onError": None}
+    }}}]
+
+
+def migrate_collection(db, collection_name: str, workers: int = 4) -> Dict[str, Any]:
+    """迁移单个集合，返回统计信息"""
+    collection = db[collection_name]
+    markers = db[MIGRATIONS_COLLECTION]
+    started = time.perf_counter()
+
+    markers.update_one(
+        {"_id": migration_id(collection_name)},
+        {"$set": {"status": "running", "started_at": datetime.now()}},
+        upsert=True
+    )
+
+    # 缺失或为 null（此前格式异常、修正后重跑）的记录都需要转换
+    symbols = sorted(collection.distinct("ts_code", MISSING_NATIVE_QUERY))
+    logger.info(f"🎯 {collection_name}: 待迁移股票 {len(symbols)} 只")
+
+    pipeline = _update_pipeline(collection_name)
+    chunks = [symbols[i:i + SYMBOLS_PER_UPDATE] for i in range(0, len(symbols), SYMBOLS_PER_UPDATE)]
+    modified = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(collection.update_many,
+                            {"ts_code": {"$in": chunk}, **MISSING_NATIVE_QUERY}, pipeline)
+            for chunk in chunks
+        ]
+        for i, future in enumerate(as_completed(futures), 1):
+            modified += future.result().modified_count
+            if i % 20 == 0 or i == len(futures):
+                logger.info(f"📊 {collection_name}: {i}/{len(futures)} 批, 已更新 {modified} 条")
+
+    logger.info(f"🔧 {collection_name}: 创建 (ts_code, {NATIVE_TIME_FIELD}) 索引")
+    collection.create_index([("ts_code", 1), (NATIVE_TIME_FIELD, 1)], background=True)
+    collection.create_index([(NATIVE_TIME_FIELD, 1)], background=True)
+
+    # 补齐迁移期间新写入的记录（有 trade_dt 索引后按缺失条件整集合更新）
+    caught_up = collection.update_many(MISSING_NATIVE_QUERY, pipeline).modified_count
+    if caught_up:
+        logger.info(f"🔄 {collection_name}: 补齐迁移期间写入的记录 {caught_up} 条")
+    modified += caught_up
+
+    # 字符串格式异常的记录 trade_dt 为 null；存在这类记录时读取方继续使用字符串字段
+    invalid = collection.count_documents(MISSING_NATIVE_QUERY)
+    if invalid:
+        logger.warning(f"⚠️ {collection_name}: {invalid} 条记录时间格式异常，修正后重新运行迁移才会切换到 {NATIVE_TIME_FIELD}")
+    seconds = round(time.perf_counter() - started, 1)
+    markers.update_one(
+        {"_id": migration_id(collection_name)},
+        {"$set": {"status": "completed", "finished_at": datetime.now(),
+                  "modified": modified, "invalid": invalid, "seconds": seconds}}
+    )
+    return {"collection": collection_name, "modified": modified, "invalid": invalid, "seconds": seconds}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='为K线集合补充原生时间字段 trade_dt')
+    parser.add_argument('--collections', default=','.join(KLINE_TIME_FIELDS), help='集合名，逗号分隔')
+    parser.add_argument('--workers', type=int, default=4, help='并行更新线程数')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    db = get_db_handler().db
+    for collection_name in [name.strip() for name in args.collections.split(',') if name.strip()]:
+        if collection_name not in KLINE_TIME_FIELDS:
+            print(f"⚠️ 跳过未知集合: {collection_name}")
+            continue
+        result = migrate_collection(db, collection_name, args.workers)
+        print(f"✅ {collection_name}: 更新 {result['modified']} 条, 时间格式异常 {result['invalid']} 条, 耗时 {result['seconds']}秒")
+    reset_native_time_cache()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+K线原生时间字段
+K线集合的时间以字符串保存（trade_date 'YYYYMMDD'，trade_time 'YYYY-MM-DD HH:MM:SS'），
+迁移脚本 database/migrate_time_fields.py 为每条记录补充BSON日期字段 trade_dt，
+并建立 (ts_code, trade_dt) 复合索引。迁移完成后：
+    - 读取方直接使用 trade_dt（pymongo解码为datetime），不再逐条 strptime
+    - 范围查询与排序走 trade_dt 索引
+迁移未完成的集合继续使用字符串字段，读取结果不变。
+
+只有完成标记存在、且集合中已没有缺少 trade_dt（或为 null）的记录时才切换到 trade_dt，
+否则这些记录会从范围查询中消失、在 last_n 排序中错位。该检查按 NATIVE_RECHECK_SECONDS 定期重做，
+迁移期间新写入或绕过 with_native_time 写入的记录会让读取方退回字符串字段，直到再次运行迁移脚本补齐。
+因此所有K线写入方都必须经过 with_native_time（DBHandler 的批量写入已内置）。
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+NATIVE_TIME_FIELD = "trade_dt"
+MIGRATIONS_COLLECTION = "schema_migrations"
+
+# 集合 → (字符串时间字段, 格式)
+KLINE_TIME_FIELDS: Dict[str, Tuple[str, str]] = {
+    "stock_kline_daily": ("trade_date", "%Y%m%d"),
+    "stock_kline_30min": ("trade_time", "%Y-%m-%d %H:%M:%S"),
+    "stock_kline_5min": ("trade_time", "%Y-%m-%d %H:%M:%S"),
+}
+
+# 迁移状态的复查间隔（秒）
+NATIVE_RECHECK_SECONDS = 300
+
+# 缺少原生时间的记录（字段不存在或为 null，可走 trade_dt 索引）
+MISSING_NATIVE_QUERY = {NATIVE_TIME_FIELD: None}
+
+# 集合 → (是否可用 trade_dt, 检查时间)
+_ready: Dict[str, Tuple[bool, float]] = {}
+_ready_lock = threading.Lock()
+
+
+def migration_id(collection_name: str) -> str:
+    return f"{NATIVE_TIME_FIELD}:{collection_name}"
+
+
+def cached_native_ready(cache: Dict[str, Tuple[bool, float]], collection_name: str) -> Optional[bool]:
+    """读取未过期的迁移状态缓存，过期或不存在时返回None"""
+    entry = cache.get(collection_name)
+    if entry is None or time.monotonic() - entry[1] >= NATIVE_RECHECK_SECONDS:
+        return None
+    return entry[0]
+
+
+def native_time_ready(db, collection_name: str) -> bool:
+    """
+    集合是否可以按 trade_dt 查询：迁移已完成且没有缺少 trade_dt 的记录
+    结果在进程内缓存 NATIVE_RECHECK_SECONDS 秒
+    """
+    if collection_name not in KLINE_TIME_FIELDS:
+        return False
+    ready = cached_native_ready(_ready, collection_name)
+    if ready is None:
+        try:
+            marker = db[MIGRATIONS_COLLECTION].find_one({"_id": migration_id(collection_name), "status": "completed"})
+            ready = marker is not None and db[collection_name].find_one(MISSING_NATIVE_QUERY, {"_id": 1}) is None
+        except Exception as e:
+            logger.warning(f"⚠️ 读取迁移状态失败: {e}")
+            return False
+        if marker is not None and not ready:
+            logger.warning(f"⚠️ {collection_name} 存在缺少 {NATIVE_TIME_FIELD} 的记录，继续使用字符串时间字段")
+        with _ready_lock:
+            _ready[collection_name] = (ready, time.monotonic())
+    return ready
+
+
+def reset_native_time_cache():
+    """清除迁移状态缓存（迁移脚本完成后调用）"""
+    with _ready_lock:
+        _ready.clear()
+
+
+def to_native(collection_name: str, value: str) -> datetime:
+    """字符串时间 → datetime（按集合的格式解析）"""
+    _, fmt = KLINE_TIME_FIELDS[collection_name]
+    return datetime.strptime(value, fmt)
+
+
+def time_range_query(db, collection_name: str, start: Optional[str] = None,
+                     end: Optional[str] = None) -> Tuple[str, Dict[str, Any]]:
+    """
+    构造时间范围条件（闭区间）
+
+    Returns:
+        (排序/查询用的字段名, 范围条件)；迁移完成时使用 trade_dt，否则使用字符串字段
+    """
+    return build_time_range(collection_name, start, end, native_time_ready(db, collection_name))
+
+
+def build_time_range(collection_name: str, start: Optional[str], end: Optional[str],
+                     native: bool) -> Tuple[str, Dict[str, Any]]:
+    """按给定的迁移状态构造时间范围条件（异步处理器自行查询迁移状态后调用）"""
+    string_field, _ = KLINE_TIME_FIELDS[collection_name]
+    field = NATIVE_TIME_FIELD if native else string_field
+
+    condition: Dict[str, Any] = {}
+    if start:
+        condition["$gte"] = to_native(collection_name, start) if native else start
+    if end:
+        condition["$lte"] = to_native(collection_name, end) if native else end
+    return field, condition
+
+
+def parse_kline_time(doc: Dict[str, Any], string_field: str) -> datetime:
+    """读取K线时间：优先使用原生 trade_dt，缺失时解析字符串字段"""
+    value = doc.get(NATIVE_TIME_FIELD)
+    if isinstance(value, datetime):
+        return value
+    text = str(doc[string_field])
+    return datetime.strptime(text, "%Y%m%d" if string_field == "trade_date" else "%Y-%m-%d %H:%M:%S")
+
+
+def with_native_time(collection_name: str, doc: Dict[str, Any]) -> Dict[str, Any]:
+    """写入前补充 trade_dt（非K线集合或缺少时间字段时原样返回），所有K线写入方都必须经过此函数"""
+    spec = KLINE_TIME_FIELDS.get(collection_name)
+    if spec is None or NATIVE_TIME_FIELD in doc:
+        return doc
+    value = doc.get(spec[0])
+    if isinstance(value, str) and value:
+        try:
+            doc[NATIVE_TIME_FIELD] = datetime.strptime(value, spec[1])
+        except ValueError:
+            pass
+    return doc
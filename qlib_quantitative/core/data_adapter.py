@@ -9,9 +9,12 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 from typing import Optional, List, Dict, Any, Union
+import hashlib
 import logging
 import sys
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 # 添加项目根目录到路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
@@ -24,6 +27,16 @@ from qlib.utils import init_instance_by_config
 
 # 项目导入
 from api.db_handler import DBHandler
+from database.kline_mirror import find_klines, use_mirror, PRICE_FIELDS
+from database.factor_store import get_factor_store, use_factor_store
+from database.time_fields import NATIVE_TIME_FIELD, time_range_query
+
+# 面板加载每次 $in 查询覆盖的股票数
+PANEL_BATCH_SIZE = 100
+# 面板Parquet缓存目录与有效期
+PANEL_CACHE_DIR = os.getenv("QLIB_PANEL_CACHE_DIR", os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "data", "panel_cache"))
+PANEL_CACHE_MAX_AGE_HOURS = float(os.getenv("QLIB_PANEL_CACHE_MAX_AGE_HOURS", "24"))
 
 class QlibDataAdapter(BaseProvider):
     """
@@ -138,17 +151,30 @@ class QlibDataAdapter(BaseProvider):
                 }
             }
             
-            # 查询数据
-            collection_name = "stock_kline_daily"  # 使用实际的集合名
-            cursor = self.db_handler.get_collection(collection_name).find(query).sort("trade_date", 1)
+            # 查询数据（所需字段都在本地镜像中时，KLINE_SOURCE=mirror 优先读取列式镜像）
+            db_fields = [self.field_mapping.get(field, field) for field in fields]
+            if use_mirror() and set(db_fields) <= set(PRICE_FIELDS):
+                cursor = find_klines("daily", stock_code,
+                                     start=query["trade_date"]["$gte"], end=query["trade_date"]["$lte"],
+                                     db_handler=self.db_handler)
+            else:
+                collection_name = "stock_kline_daily"  # 使用实际的集合名
+                # 迁移完成后按原生 trade_dt 字段过滤与排序
+                sort_field, time_range = time_range_query(self.db_handler.db, collection_name,
+                                                          query["trade_date"]["$gte"], query["trade_date"]["$lte"])
+                query = {"ts_code": stock_code, sort_field: time_range}
+                cursor = self.db_handler.get_collection(collection_name).find(query).sort(sort_field, 1)
             
             # 转换为DataFrame
             data = []
             for doc in cursor:
                 row = {}
-                # tushare日期格式转换: 20230101 -> 2023-01-01
-                date_str = str(doc['trade_date'])
-                row['datetime'] = pd.to_datetime(date_str, format='%Y%m%d')
+                # 优先使用原生 trade_dt 字段，否则转换tushare日期格式: 20230101 -> 2023-01-01
+                native_time = doc.get(NATIVE_TIME_FIELD)
+                if isinstance(native_time, datetime):
+                    row['datetime'] = native_time
+                else:
+                    row['datetime'] = pd.to_datetime(str(doc['trade_date']), format='%Y%m%d')
                 
                 # 映射字段
                 for field in fields:
@@ -181,8 +207,25 @@ class QlibDataAdapter(BaseProvider):
             return pd.DataFrame()
     
     def get_multi_stock_data(self, symbols: List[str], start_date: str, end_date: str, 
-                            fields: List[str] = None) -> pd.DataFrame:
-        """获取多只股票数据"""
+                            fields: List[str] = None, use_cache: bool = False) -> pd.DataFrame:
+        """
+        获取多只股票数据
+        
+        Args:
+            symbols: 股票代码列表（qlib或tushare格式，原样作为 instrument 索引）
+            start_date: 开始日期 (YYYY-MM-DD)
+            end_date: 结束日期 (YYYY-MM-DD)
+            fields: 需要的字段列表
+            use_cache: 是否使用面板Parquet缓存
+            
+        Returns:
+            DataFrame: (instrument, datetime) 多层索引的面板数据
+        """
+        return self.load_panel(symbols, start_date, end_date, fields, use_cache=use_cache)
+    
+    def _get_multi_stock_data_per_symbol(self, symbols: List[str], start_date: str, end_date: str, 
+                                         fields: List[str] = None) -> pd.DataFrame:
+        """逐只股票获取后合并（原实现，供基准测试与结果比对）"""
         all_data = []
         
         for symbol in symbols:
@@ -206,6 +249,113 @@ class QlibDataAdapter(BaseProvider):
         
         return combined_data
     
+    def _panel_cache_path(self, symbols: List[str], start_date: str, end_date: str,
+                          fields: List[str]) -> str:
+        key = hashlib.md5("|".join([",".join(symbols), start_date, end_date, ",".join(fields)]).encode()).hexdigest()
+        return os.path.join(PANEL_CACHE_DIR, f"panel_{key}.parquet")
+    
+    def load_panel(self, symbols: List[str], start_date: str, end_date: str,
+                   fields: List[str] = None, use_cache: bool = False) -> pd.DataFrame:
+        """
+        批量加载多只股票日线面板
+        按 PANEL_BATCH_SIZE 只一组做 $in 查询（只投影所需字段），按列收集后一次性构造
+        (instrument, datetime) 多层索引，结果与逐只调用 get_stock_data 后合并完全相同
+        
+        Args:
+            use_cache: 命中未过期的Parquet缓存时直接读取，否则加载后写入缓存
+        """
+        if fields is None:
+            fields = ['open', 'high', 'low', 'close', 'volume', 'amount']
+        
+        cache_path = self._panel_cache_path(symbols, start_date, end_date, fields) if use_cache else None
+        if cache_path and os.path.exists(cache_path) \
+                and time.time() - os.path.getmtime(cache_path) < PANEL_CACHE_MAX_AGE_HOURS * 3600:
+            try:
+                panel = pd.read_parquet(cache_path)
+                self.logger.info(f"使用面板缓存 {cache_path}（{len(panel)}条）")
+                return panel
+            except Exception as e:
+                self.logger.warning(f"读取面板缓存失败，重新加载: {e}")
+        
+        start = start_date.replace('-', '')
+        end = end_date.replace('-', '')
+        db_fields = [self.field_mapping.get(field, field) for field in fields]
+        
+        stock_codes = [self._convert_from_qlib_format(symbol) for symbol in symbols]
+        code_list = list(dict.fromkeys(stock_codes))
+        
+        codes: List[str] = []
+        dates: List[str] = []
+        columns: Dict[str, List[Any]] = {field: [] for field in fields}
+        
+        def collect(docs):
+            for doc in docs:
+                codes.append(doc['ts_code'])
+                dates.append(str(doc['trade_date']))
+                for field, db_field in zip(fields, db_fields):
+                    columns[field].append(doc.get(db_field, np.nan))
+        
+        if use_mirror() and set(db_fields) <= set(PRICE_FIELDS):
+            # 本地镜像按股票读取，不经过MongoDB
+            for stock_code in code_list:
+                collect({**doc, 'ts_code': stock_code} for doc in find_klines(
+                    "daily", stock_code, start=start, end=end, db_handler=self.db_handler))
+        else:
+            collection_name = "stock_kline_daily"
+            sort_field, time_range = time_range_query(self.db_handler.db, collection_name, start, end)
+            projection = {'_id': 0, 'ts_code': 1, 'trade_date': 1}
+            projection.update({db_field: 1 for db_field in db_fields})
+            collection = self.db_handler.get_collection(collection_name)
+            for i in range(0, len(code_list), PANEL_BATCH_SIZE):
+                batch = code_list[i:i + PANEL_BATCH_SIZE]
+                try:
+                    collect(collection.find({"ts_code": {"$in": batch}, sort_field: time_range}, projection)
+                            .sort([("ts_code", 1), (sort_field, 1)]))
+                except Exception as e:
+                    self.logger.error(f"批量获取股票数据失败（{batch[0]}等{len(batch)}只）: {e}")
+        
+        if not codes:
+            return pd.DataFrame()
+        
+        # 按代码分组（稳定排序保留每只股票内部的时间顺序），再按 symbols 顺序取出各组
+        code_array = np.asarray(codes, dtype=object)
+        by_code = np.argsort(code_array, kind='stable')
+        group_codes, group_starts, group_sizes = np.unique(code_array[by_code], return_index=True, return_counts=True)
+        groups = {code: by_code[start:start + size] for code, start, size in zip(group_codes, group_starts, group_sizes)}
+        
+        takes, labels = [], []
+        for symbol, stock_code in zip(symbols, stock_codes):
+            rows = groups.get(stock_code)
+            if rows is None:
+                self.logger.warning(f"未找到股票 {symbol} 的数据")
+                continue
+            takes.append(rows)
+            labels.append(np.full(len(rows), symbol, dtype=object))
+        order = np.concatenate(takes)
+        
+        index = pd.MultiIndex.from_arrays([
+            pd.Index(np.concatenate(labels), name='instrument'),
+            pd.DatetimeIndex(pd.to_datetime(np.asarray(dates, dtype=object)[order], format='%Y%m%d'), name='datetime')
+        ])
+        panel = pd.DataFrame(columns, columns=fields).iloc[order]
+        panel.index = index
+        
+        # 数据类型转换
+        numeric_fields = ['open', 'high', 'low', 'close', 'volume', 'amount']
+        for field in numeric_fields:
+            if field in panel.columns:
+                panel[field] = pd.to_numeric(panel[field], errors='coerce')
+        
+        self.logger.info(f"批量获取{len(takes)}只股票数据{len(panel)}条")
+        
+        if cache_path:
+            try:
+                os.makedirs(PANEL_CACHE_DIR, exist_ok=True)
+                panel.to_parquet(cache_path)
+            except Exception as e:
+                self.logger.warning(f"写入面板缓存失败: {e}")
+        return panel
+    
     def get_factor_data(self, 
                        symbol: str, 
                        start_date: str = None, 
@@ -277,6 +427,114 @@ class QlibDataAdapter(BaseProvider):
             self.logger.error(f"获取因子数据失败: {e}")
             return pd.DataFrame()
     
+    def _to_trade_date(self, date: Union[datetime, str], align_trading_day: bool = True) -> str:
+        """日期 → tushare格式 YYYYMMDD（align_trading_day 时取不晚于该日的最近交易日）"""
+        if align_trading_day:
+            from chan_theory_v2.core.trading_calendar import get_nearest_trading_date
+            trading_date = get_nearest_trading_date(date, direction='backward')
+            if trading_date is not None:
+                date = trading_date
+        if isinstance(date, datetime):
+            return date.strftime('%Y%m%d')
+        return str(date).replace('-', '')
+    
+    def get_cross_section(self, date: Union[datetime, str], factors: List[str],
+                          symbols: List[str] = None, align_trading_day: bool = True,
+                          use_store: Optional[bool] = None) -> pd.DataFrame:
+        """
+        获取单日全市场（或指定股票）的因子截面
+        一次 (trade_date, ts_code) 索引查询，只投影所需因子字段
+        
+        Args:
+            date: 截面日期
+            factors: 因子列表（支持 field_mapping 中的别名，如 market_cap）
+            symbols: 股票代码列表；None 表示当日全部股票
+            align_trading_day: 非交易日时取之前最近的交易日
+            use_store: 从本地因子存储（database/factor_store.py）读取，缺失日期先同步；
+                       None 时由环境变量 FACTOR_SOURCE 决定
+            
+        Returns:
+            DataFrame: 行为股票（instrument），列为因子；指定 symbols 时按其顺序排列，缺失股票为NaN行
+        """
+        try:
+            db_fields = [self.field_mapping.get(factor, factor) for factor in factors]
+            stock_codes = None
+            if symbols is not None:
+                stock_codes = [self._convert_from_qlib_format(symbol) for symbol in symbols]
+            
+            if use_factor_store() if use_store is None else use_store:
+                cross_section = self._store_cross_section(date, factors, db_fields, stock_codes, align_trading_day)
+            else:
+                trade_date = self._to_trade_date(date, align_trading_day)
+                query: Dict[str, Any] = {"trade_date": trade_date}
+                if stock_codes is not None:
+                    query["ts_code"] = {"$in": list(dict.fromkeys(stock_codes))}
+                projection = {'_id': 0, 'ts_code': 1}
+                projection.update({db_field: 1 for db_field in db_fields})
+                
+                codes: List[str] = []
+                columns: Dict[str, List[Any]] = {factor: [] for factor in factors}
+                for doc in self.db_handler.get_collection("stock_factor_pro").find(query, projection):
+                    codes.append(doc['ts_code'])
+                    for factor, db_field in zip(factors, db_fields):
+                        columns[factor].append(doc.get(db_field, np.nan))
+                cross_section = pd.DataFrame(columns, index=pd.Index(codes, name='instrument'), columns=factors)
+            
+            cross_section = cross_section[~cross_section.index.duplicated()]
+            for factor in factors:
+                cross_section[factor] = pd.to_numeric(cross_section[factor], errors='coerce')
+            
+            if stock_codes is not None:
+                cross_section = cross_section.reindex(stock_codes)
+                cross_section.index = pd.Index(symbols, name='instrument')
+            return cross_section
+            
+        except Exception as e:
+            self.logger.error(f"获取{date}因子截面失败: {e}")
+            return pd.DataFrame(columns=factors)
+    
+    def _store_cross_section(self, date: Union[datetime, str], factors: List[str], db_fields: List[str],
+                             stock_codes: Optional[List[str]], align_trading_day: bool) -> pd.DataFrame:
+        """从本地因子存储读取截面；日期在存储覆盖区间内时由存储对齐交易日，不访问MongoDB"""
+        store = get_factor_store()
+        trade_date = store.nearest_date(date) if align_trading_day else None
+        if trade_date is None:
+            trade_date = self._to_trade_date(date, align_trading_day)
+        store.ensure_dates([trade_date])
+        
+        section = store.read_cross_section(
+            trade_date, list(dict.fromkeys(db_fields)),
+            list(dict.fromkeys(stock_codes)) if stock_codes is not None else None
+        )
+        return pd.DataFrame(
+            {factor: section[db_field].to_numpy() for factor, db_field in zip(factors, db_fields)},
+            index=pd.Index(section.index, name='instrument'), columns=factors
+        )
+    
+    def get_factor_panel(self, dates: List[Union[datetime, str]], factors: List[str],
+                         symbols: List[str] = None, align_trading_day: bool = True,
+                         workers: int = 4, use_store: Optional[bool] = None) -> pd.DataFrame:
+        """
+        获取多个调仓日的因子截面，堆叠为 (datetime, instrument) 多层索引面板
+        每个日期一次查询，多个日期并发执行
+        
+        指定 symbols 时每个日期的行数相同，可直接还原为三维数组：
+            panel.to_numpy().reshape(len(dates), len(symbols), len(factors))
+        
+        Returns:
+            DataFrame: datetime 层为传入的调仓日（而非对齐后的交易日）
+        """
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            sections = list(executor.map(
+                lambda date: self.get_cross_section(date, factors, symbols, align_trading_day, use_store), dates))
+        
+        frames = {pd.Timestamp(date): section for date, section in zip(dates, sections) if not section.empty}
+        if not frames:
+            return pd.DataFrame(columns=factors)
+        panel = pd.concat(frames, names=['datetime', 'instrument'])
+        self.logger.info(f"获取{len(frames)}个日期的因子截面{len(panel)}条")
+        return panel
+    
     def get_benchmark_data(self, benchmark: str, start_date: str, end_date: str) -> pd.DataFrame:
         """获取基准指数数据"""
         try:
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+相关性特征聚类
+把相关系数绝对值超过阈值的特征连成图，每个连通分量只保留一个代表特征。
+上三角掩码、连通分量与代表选择均为数组运算，几百个因子时也不需要逐对遍历或递归DFS。
+"""
+
+from typing import Dict, List, Sequence, Union
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
+
+
+def correlation_components(corr_matrix: Union[pd.DataFrame, np.ndarray], threshold: float) -> np.ndarray:
+    """
+    高相关特征的连通分量
+
+    Args:
+        corr_matrix: 相关系数矩阵（行列顺序与特征顺序一致，只使用上三角）
+        threshold: |相关系数| 严格大于该值的特征对视为相连，NaN 不相连
+
+    Returns:
+        每个特征所属分量的编号（按分量中最靠前特征的位置递增编号）
+    """
+    values = np.abs(np.asarray(corr_matrix, dtype=float))
+    with np.errstate(invalid='ignore'):
+        adjacency = np.triu(values > threshold, k=1)
+    _, labels = connected_components(csr_matrix(adjacency), directed=False)
+
+    # 按首次出现的位置重新编号，与按特征顺序遍历得到的分量顺序一致
+    _, first_positions, inverse = np.unique(labels, return_index=True, return_inverse=True)
+    return np.argsort(np.argsort(first_positions))[inverse]
+
+
+def select_uncorrelated_features(features: Sequence[str], corr_matrix: Union[pd.DataFrame, np.ndarray],
+                                 missing_counts: Dict[str, int], threshold: float) -> List[str]:
+    """
+    每个高相关连通分量保留缺失值最少的特征（缺失值相同时取名称最小者）
+
+    Args:
+        features: 特征名（与 corr_matrix 行列顺序一致）
+        corr_matrix: 特征相关系数矩阵
+        missing_counts: 特征 → 缺失值数量
+        threshold: 相关性阈值
+
+    Returns:
+        选中的特征，按所在分量中最靠前特征的位置排列
+    """
+    features = list(features)
+    if not features:
+        return []
+    n = len(features)
+    labels = correlation_components(np.asarray(corr_matrix, dtype=float)[:n, :n], threshold)
+
+    names = np.asarray(features, dtype=object)
+    missing = np.asarray([missing_counts[feature] for feature in features])
+    name_rank = np.unique(names, return_inverse=True)[1]
+    # 按 (分量, 缺失值, 名称) 排序，每个分量取第一个
+    order = np.lexsort((name_rank, missing, labels))
+    _, first = np.unique(labels[order], return_index=True)
+    return names[order[first]].tolist()
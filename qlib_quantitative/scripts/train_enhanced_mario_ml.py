@@ -7,6 +7,7 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+import os
 import sys
 from pathlib import Path
 import logging
@@ -30,7 +31,11 @@ from imblearn.combine import SMOTETomek  # 样本平衡
 project_root = Path(__file__).parent.parent.parent
 sys.path.append(str(project_root))
 
+# 训练默认读取本地因子存储，重复实验不再查询MongoDB（FACTOR_SOURCE=mongo 可关闭）
+os.environ.setdefault("FACTOR_SOURCE", "store")
+
 from api.db_handler import DBHandler
+from database.factor_store import get_factor_store, use_factor_store
 from quantitative.scripts.mario_factor_calculator import MarioFactorCalculator
 
 warnings.filterwarnings("ignore")
@@ -139,13 +144,17 @@ class EnhancedMarioMLTrainer:
         
         # 从股票因子表获取数据（简化实现）
         try:
-            collection = self.db.get_collection('stock_factor_pro')
-            cursor = collection.find({
-                'trade_date': {'$gte': start_date.replace('-', ''), '$lte': end_date.replace('-', '')}
-            }).limit(1000)  # 限制数据量用于测试
-            
-            data = list(cursor)
-            df = pd.DataFrame(data)
+            if use_factor_store():
+                # 本地因子存储只补齐缺失的交易日，之后直接读Parquet分区
+                store = get_factor_store()
+                store.sync(start_date, end_date)
+                df = store.read(start_date, end_date, limit=1000)  # 限制数据量用于测试
+            else:
+                collection = self.db.get_collection('stock_factor_pro')
+                cursor = collection.find({
+                    'trade_date': {'$gte': start_date.replace('-', ''), '$lte': end_date.replace('-', '')}
+                }).limit(1000)  # 限制数据量用于测试
+                df = pd.DataFrame(list(cursor))
             
             if not df.empty:
                 # 映射到Mario因子
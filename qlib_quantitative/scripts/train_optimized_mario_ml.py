@@ -6,13 +6,13 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+import os
 import sys
 from pathlib import Path
 import logging
 import warnings
 import matplotlib.pyplot as plt
 import seaborn as sns
-from collections import defaultdict
 
 # 机器学习相关库
 import lightgbm as lgb
@@ -27,9 +27,14 @@ from imblearn.over_sampling import SMOTE
 project_root = Path(__file__).parent.parent.parent
 sys.path.append(str(project_root))
 
+# 训练默认读取本地因子存储，重复实验不再查询MongoDB（FACTOR_SOURCE=mongo 可关闭）
+os.environ.setdefault("FACTOR_SOURCE", "store")
+
 from quantitative.strategies.optimized_mario_ml_strategy import (
     OptimizedMarioMLStrategy, OptimizedMarioMLConfig
 )
+from qlib_quantitative.core.data_adapter import get_qlib_adapter
+from qlib_quantitative.core.feature_clustering import select_uncorrelated_features
 
 warnings.filterwarnings("ignore")
 
@@ -313,50 +318,10 @@ class OptimizedMarioMLTrainer:
     def _graph_based_feature_selection(self, features: list, corr_matrix: pd.DataFrame, threshold: float) -> list:
         """基于图的特征选择"""
         
-        # 创建图结构存储高度相关的特征对
-        graph = defaultdict(list)
         missing_counts = self.training_data[features].isnull().sum().to_dict()
         
-        # 构建相关性图
-        n = len(features)
-        for i in range(n):
-            for j in range(i + 1, n):
-                col1, col2 = features[i], features[j]
-                corr_value = corr_matrix.iloc[i, j]
-                
-                if not pd.isna(corr_value) and abs(corr_value) > threshold:
-                    graph[col1].append(col2)
-                    graph[col2].append(col1)
-        
-        # DFS找连通分量
-        visited = set()
-        components = []
-        
-        def dfs(node, comp):
-            visited.add(node)
-            comp.append(node)
-            for neighbor in graph[node]:
-                if neighbor not in visited:
-                    dfs(neighbor, comp)
-        
-        for feature in features:
-            if feature not in visited:
-                comp = []
-                dfs(feature, comp)
-                components.append(comp)
-        
-        # 处理每个连通分量：保留缺失值最少的特征
-        selected_features = []
-        
-        for comp in components:
-            if len(comp) == 1:
-                selected_features.append(comp[0])
-            else:
-                # 按缺失值数量排序，保留缺失值最少的
-                comp_sorted = sorted(comp, key=lambda x: (missing_counts[x], x))
-                selected_features.append(comp_sorted[0])
-        
-        return selected_features
+        # 高度相关的特征连成连通分量，每个分量保留缺失值最少的特征
+        return select_uncorrelated_features(features, corr_matrix, missing_counts, threshold)
     
     def train_model(self):
         """训练模型"""
@@ -1708,9 +1673,10 @@ class OptimizedMarioMLTrainer:
             
             # 获取测试股票列表（002开头的中小板股票）
             trading_date = self.strategy._get_nearest_trading_date(test_date)
-            all_stock_data = self.strategy.db.find_data('stock_factor_pro', {'trade_date': trading_date})
-            test_stock_list = [item['ts_code'] for item in all_stock_data 
-                              if item.get('ts_code', '').startswith('002')][:50]  # 取前50只做测试
+            # 当日截面只取股票代码（一次索引查询，不拉取全部因子字段）
+            cross_section = get_qlib_adapter().get_cross_section(trading_date, [], align_trading_day=False)
+            test_stock_list = [code for code in cross_section.index 
+                              if code.startswith('002')][:50]  # 取前50只做测试
             
             if not test_stock_list:
                 self.logger.warning("未找到测试股票列表")
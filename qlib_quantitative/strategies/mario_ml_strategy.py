@@ -16,11 +16,15 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional, Tuple
+import hashlib
 import logging
+import multiprocessing
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 import pickle
 import warnings
-from collections import defaultdict
 from dataclasses import dataclass
 
 # 机器学习相关库
@@ -39,10 +43,17 @@ from abupy import AbuMetricsBase
 
 # 本地导入
 from ..core.strategy_base import AbuStrategyBase
-from ..core.data_adapter import AbuDataAdapter
+from ..core.data_adapter import AbuDataAdapter, get_qlib_adapter
+from ..core.feature_clustering import select_uncorrelated_features
 
 warnings.filterwarnings("ignore")
 
+logger = logging.getLogger(__name__)
+
+# 训练集分月分片目录（每月一个Parquet文件，重跑时跳过已完成的月份）
+TRAINING_SHARD_DIR = os.getenv("MARIO_TRAINING_SHARD_DIR", os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "data", "training_shards"))
+
 
 @dataclass
 class MarioMLConfig:
@@ -59,6 +70,10 @@ class MarioMLConfig:
     lookback_months: int = 12          # 训练数据回望月数
     min_samples: int = 1000            # 最小训练样本数
     
+    # 训练集构建
+    training_workers: int = 0          # 构建训练集的进程数（0 表示CPU核数）
+    random_seed: int = 42              # 每月股票采样的随机种子
+    
     # LightGBM参数
     lgb_params: Dict = None
     
@@ -86,6 +101,8 @@ class MarioMLBuyFactor(AbuFactorBuyBase):
         super().__init__()
         self.config = config or MarioMLConfig()
         self.data_adapter = AbuDataAdapter()
+        # 因子截面加载（每个调仓日一次查询）
+        self.factor_loader = get_qlib_adapter()
         
         # 策略状态
         self.model = None
@@ -150,8 +167,15 @@ class MarioMLBuyFactor(AbuFactorBuyBase):
         except Exception as e:
             pass
             
-    def prepare_training_data(self, end_date: datetime) -> pd.DataFrame:
-        """准备训练数据"""
+    def prepare_training_data(self, end_date: datetime, workers: Optional[int] = None) -> pd.DataFrame:
+        """
+        准备训练数据
+        每个月作为独立任务在进程池中构建并写入分片，重跑时跳过已完成的月份；
+        失败的月份汇总到 self.failed_months 并输出日志，下次运行时重试
+        
+        Args:
+            workers: 进程数，默认取 config.training_workers，为0时使用CPU核数
+        """
         # 训练数据时间范围：2020-2024年
         start_date = datetime(2020, 1, 1)
         train_end_date = datetime(2024, 6, 30)
@@ -159,63 +183,127 @@ class MarioMLBuyFactor(AbuFactorBuyBase):
         # 生成月末日期序列
         date_list = self._generate_month_end_dates(start_date, train_end_date)
         
-        all_training_data = []
-        
-        for i, date in enumerate(date_list[:-1]):
-            try:
-                # 获取中小板股票池（使用数据适配器）
-                stock_list = self.data_adapter.get_stock_list(date)
-                
-                if len(stock_list) < 100:
-                    continue
-                
-                # 随机采样500只股票
-                import random
-                if len(stock_list) > 500:
-                    stock_list = random.sample(stock_list, 500)
-                
-                # 获取因子数据
-                factor_data = self.data_adapter.get_factor_data(
-                    stock_list, self.factor_names, date
-                )
-                
-                # 构建因子DataFrame
-                df_factors = self._build_factor_dataframe(factor_data, stock_list)
-                
-                if df_factors.empty:
-                    continue
-                
-                # 计算下月收益率作为标签
-                next_date = date_list[i + 1]
-                returns = self._calculate_monthly_returns(stock_list, date, next_date)
-                
-                if returns.empty:
-                    continue
-                
-                # 合并因子和收益率数据
-                df_combined = df_factors.merge(
-                    returns, left_index=True, right_index=True, how='inner'
-                )
-                
-                # 构建标签：以收益率中位数为分界
-                median_return = df_combined['monthly_return'].median()
-                df_combined['label'] = (df_combined['monthly_return'] >= median_return).astype(int)
-                
-                # 去除收益率列，保留因子和标签
-                df_combined = df_combined.drop(columns=['monthly_return'])
-                
-                all_training_data.append(df_combined)
-                
-            except Exception as e:
+        shard_dir = self._training_shard_dir(start_date, train_end_date)
+        os.makedirs(shard_dir, exist_ok=True)
+        months = [
+            (date, next_date, os.path.join(shard_dir, f"{date:%Y%m}.parquet"))
+            for date, next_date in zip(date_list[:-1], date_list[1:])
+        ]
+        pending = [month for month in months if not os.path.exists(month[2])]
+        
+        self.failed_months = {}
+        if pending:
+            workers = min(workers or self.config.training_workers or os.cpu_count() or 1, len(pending))
+            logger.info(f"📚 构建训练数据: {len(pending)}/{len(months)} 个月待处理, {workers} 个进程")
+            # spawn 启动的子进程各自建立数据库连接，不继承父进程的连接
+            with ProcessPoolExecutor(max_workers=workers,
+                                     mp_context=multiprocessing.get_context('spawn')) as executor:
+                futures = {
+                    executor.submit(_build_training_shard, self.config, self.factor_names,
+                                    date, next_date, path): date
+                    for date, next_date, path in pending
+                }
+                for future in as_completed(futures):
+                    try:
+                        future.result()
+                    except Exception as e:
+                        self.failed_months[futures[future].strftime('%Y-%m')] = str(e)
+            
+            if self.failed_months:
+                logger.warning(f"⚠️ {len(self.failed_months)} 个月训练数据构建失败（下次运行时重试）:")
+                for month, error in sorted(self.failed_months.items()):
+                    logger.warning(f"   {month}: {error}")
+        
+        import pyarrow.parquet as pq
+        
+        # 按月份顺序合并分片（跳过的月份为空分片，元数据中记录跳过原因）
+        frames = []
+        self.skipped_months = {}
+        for date, _, path in months:
+            if not os.path.exists(path):
                 continue
+            frame = pd.read_parquet(path)
+            if frame.empty:
+                metadata = pq.read_schema(path).metadata or {}
+                self.skipped_months[date.strftime('%Y-%m')] = metadata.get(b'skip_reason', b'').decode('utf-8')
+                continue
+            frames.append(frame)
+        if self.skipped_months:
+            logger.info(f"📋 {len(self.skipped_months)} 个月无训练样本: "
+                        f"{', '.join(f'{m}({r})' for m, r in sorted(self.skipped_months.items()))}")
         
-        if not all_training_data:
+        if not frames:
             return pd.DataFrame()
         
-        # 合并所有数据
-        training_df = pd.concat(all_training_data, ignore_index=True)
+        return pd.concat(frames, ignore_index=True)
+    
+    def _training_shard_dir(self, start_date: datetime, end_date: datetime) -> str:
+        """分片目录按因子列表、时间范围与采样种子区分，配置变化时不复用旧分片"""
+        key = hashlib.md5("|".join([
+            ",".join(self.factor_names), f"{start_date:%Y%m%d}", f"{end_date:%Y%m%d}", str(self.config.random_seed)
+        ]).encode()).hexdigest()[:12]
+        return os.path.join(TRAINING_SHARD_DIR, f"mario_ml_{key}")
+    
+    def build_month_training_data(self, date: datetime, next_date: datetime) -> pd.DataFrame:
+        """
+        构建单个调仓月的训练样本：当日因子截面 + 以下月收益率中位数为分界的标签
+        
+        数据适配器在查询失败时返回空结果（因子截面为全NaN），因此股票池、因子或价格为空都视为加载失败并抛出异常
+        （该月计入 failed_months，下次运行重试）；只有股票池确实不足100只时返回空表，
+        并在 attrs['skip_reason'] 中记录跳过原因
+        
+        Returns:
+            DataFrame: 因子列与 label 列
+        """
+        # 获取中小板股票池（使用数据适配器）
+        stock_list = self.data_adapter.get_stock_list(date)
+        
+        if not stock_list:
+            raise RuntimeError(f"{date:%Y-%m-%d} 股票池为空（查询失败或无数据）")
+        if len(stock_list) < 100:
+            empty = pd.DataFrame(columns=self.factor_names + ['label'])
+            empty.attrs['skip_reason'] = f"股票池仅 {len(stock_list)} 只（少于100只）"
+            return empty
+        
+        # 随机采样500只股票（按月份固定随机种子，重跑与并行构建结果一致）
+        if len(stock_list) > 500:
+            stock_list = random.Random(f"{self.config.random_seed}-{date:%Y%m%d}").sample(stock_list, 500)
+        
+        # 获取当日因子截面（一次查询取回全部股票的全部因子）
+        factor_section = self.factor_loader.get_cross_section(
+            date, self.factor_names, stock_list
+        )
+        
+        # 截面按股票池重建索引，查询无结果时为全NaN行而非空表
+        if factor_section.dropna(how='all').empty:
+            raise RuntimeError(f"{date:%Y-%m-%d} 因子截面为空（查询失败或无数据）")
         
-        return training_df
+        # 构建因子DataFrame
+        df_factors = self._build_factor_dataframe(factor_section)
+        
+        if df_factors.empty:
+            raise RuntimeError(f"{date:%Y-%m-%d} 因子截面缺失值过多")
+        
+        # 计算下月收益率作为标签（当月股票一次批量加载收盘价）
+        returns = self._calculate_monthly_returns(stock_list, date, next_date)
+        
+        if returns.empty:
+            raise RuntimeError(f"{date:%Y-%m-%d} ~ {next_date:%Y-%m-%d} 收盘价为空，无法计算收益率")
+        
+        # 合并因子和收益率数据
+        df_combined = df_factors.merge(
+            returns, left_index=True, right_index=True, how='inner'
+        )
+        
+        # 构建标签：以收益率中位数为分界
+        median_return = df_combined['monthly_return'].median()
+        df_combined['label'] = (df_combined['monthly_return'] >= median_return).astype(int)
+        
+        if df_combined.empty:
+            raise RuntimeError(f"{date:%Y-%m-%d} 因子与收益率没有共同的股票")
+        
+        # 去除收益率列，保留因子和标签
+        return df_combined.drop(columns=['monthly_return']).reset_index(drop=True)
         
     def _generate_month_end_dates(self, start_date: datetime, end_date: datetime) -> List[datetime]:
         """生成月末日期序列"""
@@ -238,16 +326,9 @@ class MarioMLBuyFactor(AbuFactorBuyBase):
         
         return dates
         
-    def _build_factor_dataframe(self, factor_data: Dict[str, pd.DataFrame], 
-                               stock_list: List[str]) -> pd.DataFrame:
-        """构建因子DataFrame"""
-        factor_df = pd.DataFrame(index=stock_list)
-        
-        for factor_name, df in factor_data.items():
-            if not df.empty and len(df.columns) > 0:
-                # 取第一行数据（日期维度）
-                factor_values = df.iloc[0, :]
-                factor_df[factor_name] = factor_values
+    def _build_factor_dataframe(self, factor_section: pd.DataFrame) -> pd.DataFrame:
+        """构建因子DataFrame（输入为 get_cross_section 返回的 股票×因子 截面）"""
+        factor_df = factor_section.copy()
         
         # 处理缺失值 - 使用中位数填充
         for col in factor_df.columns:
@@ -263,40 +344,79 @@ class MarioMLBuyFactor(AbuFactorBuyBase):
         
     def _calculate_monthly_returns(self, stock_list: List[str], 
                                   start_date: datetime, end_date: datetime) -> pd.DataFrame:
-        """计算月度收益率"""
-        returns_data = []
-        
-        for stock_code in stock_list:
-            try:
-                # 获取价格数据
-                price_data = self.data_adapter.get_price_data(
-                    stock_code, start_date, end_date + timedelta(days=5)
-                )
-                
-                if price_data.empty:
-                    continue
-                
-                # 计算收益率
-                start_price = price_data['close'].iloc[0]
-                end_price = price_data['close'].iloc[-1]
-                
-                if start_price and end_price and start_price > 0:
-                    monthly_return = (end_price / start_price) - 1
-                    returns_data.append({
-                        'stock_code': stock_code,
-                        'monthly_return': monthly_return
-                    })
-                    
-            except Exception as e:
-                continue
+        """计算月度收益率（单个区间，一次批量加载收盘价）"""
+        close_panel = self._load_close_panel(stock_list, start_date, end_date + timedelta(days=5))
+        returns = self._monthly_returns_from_panel(close_panel, [start_date, end_date])
         
-        if not returns_data:
+        if returns.empty:
             return pd.DataFrame()
         
-        returns_df = pd.DataFrame(returns_data)
+        returns_df = returns[returns['stock_code'].isin(stock_list)][['stock_code', 'monthly_return']]
         returns_df.set_index('stock_code', inplace=True)
         
         return returns_df
+    
+    def _load_close_panel(self, symbols: List[str], start_date: datetime, end_date: datetime) -> pd.DataFrame:
+        """批量加载收盘价面板（(instrument, datetime) 多层索引）"""
+        return self.factor_loader.load_panel(
+            symbols, start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'), fields=['close']
+        )
+    
+    def _monthly_returns_from_panel(self, close_panel: pd.DataFrame, date_list: List[datetime]) -> pd.DataFrame:
+        """
+        由收盘价面板计算各区间收益率（全部为数组运算）
+        区间 i 为 [date_list[i], date_list[i+1] + 5天]，取区间内首个与最后一个交易日的收盘价，
+        与逐只查询价格后取 iloc[0] / iloc[-1] 的结果相同
+        
+        Returns:
+            DataFrame: period（区间序号）、stock_code、monthly_return，只含有效收益率
+        """
+        empty = pd.DataFrame(columns=['period', 'stock_code', 'monthly_return'])
+        if close_panel.empty or len(date_list) < 2:
+            return empty
+        
+        close_series = close_panel['close']
+        close_series = close_series[~close_series.index.duplicated()]
+        close = close_series.unstack('instrument')  # 日期 × 股票
+        present = pd.Series(True, index=close_series.index).unstack('instrument', fill_value=False)
+        present = present.reindex(index=close.index, columns=close.columns, fill_value=False)
+        
+        prices = close.to_numpy(dtype=float)
+        mask = present.to_numpy(dtype=bool)
+        n_days, n_stocks = prices.shape
+        rows = np.arange(n_days)[:, None]
+        
+        # 每个位置向后（含）最近一根K线的行号，末尾补哨兵行 n_days
+        next_row = np.minimum.accumulate(np.where(mask, rows, n_days)[::-1], axis=0)[::-1]
+        next_row = np.vstack([next_row, np.full((1, n_stocks), n_days)])
+        # 每个位置向前（含）最近一根K线的行号，开头补哨兵行 -1
+        prev_row = np.maximum.accumulate(np.where(mask, rows, -1), axis=0)
+        prev_row = np.vstack([np.full((1, n_stocks), -1), prev_row])
+        
+        days = close.index.values
+        starts = np.searchsorted(days, pd.DatetimeIndex(date_list[:-1]).values, side='left')
+        ends = np.searchsorted(
+            days, (pd.DatetimeIndex(date_list[1:]) + pd.Timedelta(days=5)).values, side='right') - 1
+        first = next_row[starts]        # 区间 × 股票
+        last = prev_row[ends + 1]
+        has_bars = first <= ends[:, None]
+        
+        columns = np.arange(n_stocks)
+        start_price = prices[np.minimum(first, n_days - 1), columns]
+        end_price = prices[np.maximum(last, 0), columns]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns = end_price / start_price - 1
+        # 与逐只计算的条件一致：起始价为正且期末价非零
+        valid = has_bars & (start_price > 0) & (end_price != 0)
+        
+        period, column = np.nonzero(valid)
+        if not len(period):
+            return empty
+        return pd.DataFrame({
+            'period': period,
+            'stock_code': close.columns.to_numpy()[column],
+            'monthly_return': returns[period, column]
+        })
         
     def feature_selection(self, df: pd.DataFrame) -> List[str]:
         """特征选择"""
@@ -310,52 +430,13 @@ class MarioMLBuyFactor(AbuFactorBuyBase):
         # 计算相关系数矩阵
         corr_matrix = feature_df.corr()
         
-        # 创建图结构存储高度相关的特征对
-        graph = defaultdict(list)
-        threshold = self.config.correlation_threshold
-        
         # 计算缺失值数量
         missing_counts = feature_df.isnull().sum().to_dict()
         
-        # 遍历上三角矩阵找到高度相关的特征对
-        n = len(features)
-        for i in range(n):
-            for j in range(i + 1, n):
-                col1, col2 = features[i], features[j]
-                corr_value = corr_matrix.iloc[i, j]
-                
-                if not pd.isna(corr_value) and abs(corr_value) > threshold:
-                    graph[col1].append(col2)
-                    graph[col2].append(col1)
-        
-        # 使用DFS找到连通分量
-        visited = set()
-        components = []
-        
-        def dfs(node, comp):
-            visited.add(node)
-            comp.append(node)
-            for neighbor in graph[node]:
-                if neighbor not in visited:
-                    dfs(neighbor, comp)
-        
-        for feature in features:
-            if feature not in visited:
-                comp = []
-                dfs(feature, comp)
-                components.append(comp)
-        
-        # 处理每个连通分量：保留缺失值最少的特征
-        selected_features = []
-        
-        for comp in components:
-            if len(comp) == 1:
-                selected_features.append(comp[0])
-            else:
-                comp_sorted = sorted(comp, key=lambda x: (missing_counts[x], x))
-                selected_features.append(comp_sorted[0])
-        
-        return selected_features
+        # 高度相关的特征连成连通分量，每个分量保留缺失值最少的特征
+        return select_uncorrelated_features(
+            features, corr_matrix, missing_counts, self.config.correlation_threshold
+        )
         
     def train_model(self, df: pd.DataFrame) -> bool:
         """训练机器学习模型"""
@@ -415,13 +496,13 @@ class MarioMLBuyFactor(AbuFactorBuyBase):
             if len(stock_list) < 20:
                 return []
             
-            # 获取因子数据
-            factor_data = self.data_adapter.get_factor_data(
-                stock_list, self.factor_names, date
+            # 获取当日因子截面
+            factor_section = self.factor_loader.get_cross_section(
+                date, self.factor_names, stock_list
             )
             
             # 构建预测数据
-            df_factors = self._build_factor_dataframe(factor_data, stock_list)
+            df_factors = self._build_factor_dataframe(factor_section)
             
             if df_factors.empty:
                 return []
@@ -505,6 +586,39 @@ class MarioMLBuyFactor(AbuFactorBuyBase):
             return None
 
 
+
+# 子进程内复用的买入因子（每个进程创建一次）
+_worker_factor: Optional[MarioMLBuyFactor] = None
+
+
+def _build_training_shard(config: MarioMLConfig, factor_names: List[str], date: datetime,
+                          next_date: datetime, shard_path: str) -> int:
+    """
+    进程池任务：构建单月训练数据并写入分片（写临时文件后原子替换），返回行数
+    加载失败时抛出异常且不写分片；跳过的月份写入空分片，跳过原因记录在Parquet元数据 skip_reason 中
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    global _worker_factor
+    if _worker_factor is None:
+        _worker_factor = MarioMLBuyFactor(config)
+    _worker_factor.factor_names = factor_names
+    
+    month_df = _worker_factor.build_month_training_data(date, next_date)
+    table = pa.Table.from_pandas(month_df, preserve_index=False)
+    skip_reason = month_df.attrs.get('skip_reason')
+    if skip_reason:
+        table = table.replace_schema_metadata({
+            **(table.schema.metadata or {}), b'skip_reason': skip_reason.encode('utf-8')
+        })
+    
+    tmp_path = f"{shard_path}.tmp"
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, shard_path)
+    return len(month_df)
+
+
 class MarioMLSellFactor(AbuFactorSellBase):
     """Mario机器学习卖出因子"""
     
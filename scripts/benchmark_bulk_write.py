@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+K线批量写入基准测试
+用合成的5分钟K线写入临时集合，对比各写入模式的吞吐量（条/秒）：
+    upsert          逐条 UpdateOne(upsert=True)，单线程（原有方式）
+    upsert-parallel 逐条 upsert，按 ts_code 区间多线程
+    append          insert_many 追加，单线程
+    append-parallel insert_many 追加，按 ts_code 区间多线程
+    append-dup      重复写入同一批数据（全部命中唯一索引，衡量重复处理开销）
+
+运行方式：
+python scripts/benchmark_bulk_write.py
+python scripts/benchmark_bulk_write.py --symbols 5000 --bars 48 --workers 8
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+# 添加项目根目录到路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from database.db_handler import get_db_handler
+
+BENCH_COLLECTION = "benchmark_kline_5min"
+
+
+def make_bars(symbols: int, bars: int):
+    """生成 symbols 只股票、每只 bars 根的5分钟K线"""
+    start = datetime(2024, 1, 2, 9, 35)
+    docs = []
+    for i in range(symbols):
+        ts_code = f"{600000 + i:06d}.SH"
+        for j in range(bars):
+            price = 10 + (j % 20) * 0.01
+            docs.append({
+                "ts_code": ts_code,
+                "trade_time": (start + timedelta(minutes=5 * j)).strftime("%Y-%m-%d %H:%M:%S"),
+                "open": price, "high": price + 0.02, "low": price - 0.02, "close": price + 0.01,
+                "vol": 1000.0 + j, "amount": 10000.0 + j
+            })
+    return docs
+
+
+def reset_collection(db):
+    db.drop_collection(BENCH_COLLECTION)
+    db[BENCH_COLLECTION].create_index([("ts_code", 1), ("trade_time", 1)], unique=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='K线批量写入基准测试')
+    parser.add_argument('--symbols', type=int, default=1000, help='股票数')
+    parser.add_argument('--bars', type=int, default=48, help='每只股票K线数（48 = 一天5分钟线）')
+    parser.add_argument('--workers', type=int, default=4, help='并行写入线程数')
+    args = parser.parse_args()
+
+    handler = get_db_handler()
+    db = handler.db
+    total = args.symbols * args.bars
+    print(f"📊 合成数据: {args.symbols} 只 × {args.bars} 根 = {total:,} 条, 临时集合: {BENCH_COLLECTION}")
+
+    modes = [
+        ("upsert", lambda docs: handler.bulk_upsert(BENCH_COLLECTION, docs, ["ts_code", "trade_time"], workers=1)),
+        ("upsert-parallel", lambda docs: handler.bulk_upsert(BENCH_COLLECTION, docs, ["ts_code", "trade_time"],
+                                                             workers=args.workers)),
+        ("append", lambda docs: handler.bulk_insert(BENCH_COLLECTION, docs, ["ts_code", "trade_time"], workers=1)),
+        ("append-parallel", lambda docs: handler.bulk_insert(BENCH_COLLECTION, docs, ["ts_code", "trade_time"],
+                                                             workers=args.workers)),
+    ]
+
+    results = []
+    try:
+        for name, write in modes:
+            reset_collection(db)
+            docs = make_bars(args.symbols, args.bars)
+            start = time.perf_counter()
+            write(docs)
+            seconds = time.perf_counter() - start
+            results.append((name, seconds, db[BENCH_COLLECTION].estimated_document_count()))
+
+        # 集合中已有全部数据，再次追加写入同一批记录
+        docs = make_bars(args.symbols, args.bars)
+        start = time.perf_counter()
+        handler.bulk_insert(BENCH_COLLECTION, docs, ["ts_code", "trade_time"], workers=args.workers)
+        results.append(("append-dup", time.perf_counter() - start, db[BENCH_COLLECTION].estimated_document_count()))
+    finally:
+        db.drop_collection(BENCH_COLLECTION)
+
+    print(f"\n{'模式':<18}{'耗时(秒)':>10}{'条/秒':>12}{'集合条数':>12}")
+    print("-" * 52)
+    for name, seconds, count in results:
+        print(f"{name:<18}{seconds:>10.2f}{total / seconds:>12,.0f}{count:>12,}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多股票面板加载基准测试
+对比 QlibDataAdapter 逐只加载（原 get_multi_stock_data）与批量面板加载（load_panel）的耗时，
+并校验两者结果完全一致：
+    per-symbol   每只股票一次查询，逐条构造行后 concat
+    panel        $in 分批查询 + 按列构造多层索引
+    panel-cache  第二次加载命中Parquet缓存
+
+运行方式：
+python scripts/benchmark_panel_loader.py
+python scripts/benchmark_panel_loader.py --market CSI500 --start 2021-01-01 --end 2024-12-31
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# 添加项目根目录到路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import pandas as pd
+
+from qlib_quantitative.core.data_adapter import get_qlib_adapter
+
+
+def main():
+    parser = argparse.ArgumentParser(description='多股票面板加载基准测试')
+    parser.add_argument('--market', default='CSI500', help='成分股指数')
+    parser.add_argument('--start', default='2022-01-01', help='开始日期 (YYYY-MM-DD)')
+    parser.add_argument('--end', default='2024-12-31', help='结束日期 (YYYY-MM-DD)')
+    parser.add_argument('--limit', type=int, help='只取前N只股票')
+    args = parser.parse_args()
+
+    adapter = get_qlib_adapter()
+    symbols = adapter.get_stock_list(args.market)
+    if args.limit:
+        symbols = symbols[:args.limit]
+    print(f"📊 {args.market}: {len(symbols)} 只股票, {args.start} ~ {args.end}")
+
+    start = time.perf_counter()
+    legacy = adapter._get_multi_stock_data_per_symbol(symbols, args.start, args.end)
+    legacy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    panel = adapter.load_panel(symbols, args.start, args.end, use_cache=True)
+    panel_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    cached = adapter.load_panel(symbols, args.start, args.end, use_cache=True)
+    cache_seconds = time.perf_counter() - start
+
+    pd.testing.assert_frame_equal(legacy, panel)
+    pd.testing.assert_frame_equal(legacy, cached, check_freq=False)
+    print(f"✅ 结果一致: {panel.shape[0]:,} 行 × {panel.shape[1]} 列")
+
+    print(f"\n{'模式':<14}{'耗时(秒)':>10}{'加速比':>10}")
+    print("-" * 34)
+    for name, seconds in (("per-symbol", legacy_seconds), ("panel", panel_seconds), ("panel-cache", cache_seconds)):
+        print(f"{name:<14}{seconds:>10.2f}{legacy_seconds / seconds:>10.1f}x")
+
+
+if __name__ == '__main__':
+    main()
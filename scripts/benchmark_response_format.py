@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分析结果响应格式基准测试
+对比现有逐元素JSON输出与列式格式、orjson、MessagePack、Arrow IPC的体积和编码耗时
+
+运行方式：
+python scripts/benchmark_response_format.py --symbol 000001.SZ --timeframe 5min --days 90
+python scripts/benchmark_response_format.py --input chan_v2_data_xxx.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+# 添加项目根目录到路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from api.response_format import (
+    to_columnar, encode_json, encode_msgpack, encode_arrow,
+    FORMAT_COLUMNAR, orjson, msgpack, arrow_available
+)
+
+
+def load_payload(args):
+    """获取待测试的分析结果"""
+    if args.input:
+        with open(args.input, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    from api.chan_api_v2 import ChanDataAPIv2
+    return ChanDataAPIv2().analyze_symbol_complete(args.symbol, args.timeframe, args.days, "complete")
+
+
+def measure(name, func, repeat):
+    """多次执行取中位数耗时"""
+    timings = []
+    output = b""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return name, len(output), statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='分析结果响应格式基准测试')
+    parser.add_argument('--symbol', default='000001.SZ', help='股票代码')
+    parser.add_argument('--timeframe', default='5min', choices=['5min', '30min', 'daily'], help='时间级别')
+    parser.add_argument('--days', type=int, default=90, help='分析天数')
+    parser.add_argument('--input', help='已保存的分析结果JSON文件（不连接数据库）')
+    parser.add_argument('--repeat', type=int, default=20, help='重复次数')
+    args = parser.parse_args()
+
+    payload = load_payload(args)
+    bar_count = len(payload.get('chart_data', {}).get('kline', {}).get('categories', []))
+    print(f"📊 K线数量: {bar_count}")
+
+    def baseline():
+        # 现有路径：逐元素字典 + 标准json
+        return json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+
+    def columnar_json():
+        return json.dumps(to_columnar(payload), ensure_ascii=False, default=str).encode('utf-8')
+
+    cases = [("rows + json (现状)", baseline), ("columnar + json", columnar_json)]
+    if orjson is not None:
+        cases.append(("rows + orjson", lambda: encode_json(payload)))
+        cases.append(("columnar + orjson", lambda: encode_json(to_columnar(payload))))
+    if msgpack is not None:
+        cases.append(("columnar + msgpack", lambda: encode_msgpack(to_columnar(payload))))
+    if arrow_available():
+        cases.append(("columnar + arrow ipc", lambda: encode_arrow(to_columnar(payload))))
+
+    results = [measure(name, func, args.repeat) for name, func in cases]
+    base_bytes, base_ms = results[0][1], results[0][2]
+
+    print(f"\n{'格式':<24}{'字节':>12}{'体积比':>10}{'耗时(ms)':>12}{'加速比':>10}")
+    print("-" * 68)
+    for name, size, ms in results:
+        print(f"{name:<24}{size:>12,}{size / base_bytes:>10.2f}{ms:>12.2f}{base_ms / ms if ms else 0:>10.1f}")
+
+    installed = (("orjson", orjson is not None), ("msgpack", msgpack is not None), ("pyarrow", arrow_available()))
+    skipped = [name for name, available in installed if not available]
+    if skipped:
+        print(f"\n💡 未安装: {', '.join(skipped)}（对应格式已跳过）")
+    print(f"\n✅ 列式格式标识: meta.format = '{FORMAT_COLUMNAR}'")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+股票搜索基准测试
+对比内存索引（SymbolIndex）与原数据库正则查询路径的单次搜索耗时
+
+运行方式：
+python scripts/benchmark_symbol_search.py
+python scripts/benchmark_symbol_search.py --queries 000001 600 平安 PAYH --repeat 50
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+# 添加项目根目录到路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from api.chan_api_v2 import ChanDataAPIv2
+
+DEFAULT_QUERIES = ["000001.SZ", "000001", "6000", "300", "银行", "平安", "PAYH", "ST", ""]
+
+
+def median_ms(func, repeat):
+    """多次执行取中位数耗时（毫秒）"""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='股票搜索基准测试')
+    parser.add_argument('--queries', nargs='*', default=DEFAULT_QUERIES, help='搜索关键字')
+    parser.add_argument('--repeat', type=int, default=20, help='重复次数')
+    args = parser.parse_args()
+
+    api = ChanDataAPIv2()
+
+    start = time.perf_counter()
+    count = api.symbol_index.refresh()
+    print(f"📊 索引加载: {count} 只股票, {(time.perf_counter() - start) * 1000:.0f}ms")
+
+    print(f"\n{'关键字':<14}{'数据库(ms)':>12}{'索引(us)':>12}{'加速比':>10}{'数据库结果':>12}{'索引结果':>10}")
+    print("-" * 70)
+    for query in args.queries:
+        db_ms, db_result = median_ms(lambda: api._query_symbols_from_db(query), args.repeat)
+        index_ms, index_result = median_ms(lambda: api.symbol_index.search(query, limit=100), args.repeat)
+        speedup = db_ms / index_ms if index_ms else 0
+        print(f"{query or '(空)':<14}{db_ms:>12.2f}{index_ms * 1000:>12.1f}{speedup:>10.0f}"
+              f"{len(db_result):>12}{len(index_result):>10}")
+
+    print("\n💡 索引结果按 代码精确 > 前缀 > 子串 排序，并额外匹配 symbol 与拼音首字母，结果数可能多于数据库查询")
+
+
+if __name__ == '__main__':
+    main()
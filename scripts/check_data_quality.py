@@ -13,7 +13,9 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(current_dir)
 
 from database.db_handler import get_db_handler
+from database.time_fields import parse_kline_time, time_range_query
 from chan_theory_v2.core.trading_calendar import get_nearest_trading_date
+from chan_theory_v2.core.session_slots import get_session_slots
 
 def check_data_intervals(symbol="300750.SZ", days=30):
     """检查数据时间间隔"""
@@ -34,13 +36,16 @@ def check_data_intervals(symbol="300750.SZ", days=30):
     start_datetime = datetime.combine(start_date, datetime.min.time())
     end_datetime = datetime.combine(end_trading_date, datetime.max.time())
     
+    # 迁移完成后按原生 trade_dt 字段过滤与排序
+    time_field, time_range = time_range_query(
+        db_handler.db, "stock_kline_30min",
+        start_datetime.strftime("%Y-%m-%d %H:%M:%S"),
+        end_datetime.strftime("%Y-%m-%d %H:%M:%S")
+    )
     cursor = collection.find({
         "ts_code": symbol,
-        "trade_time": {
-            "$gte": start_datetime.strftime("%Y-%m-%d %H:%M:%S"),
-            "$lte": end_datetime.strftime("%Y-%m-%d %H:%M:%S")
-        }
-    }).sort("trade_time", 1)
+        time_field: time_range
+    }).sort(time_field, 1)
     
     data = list(cursor)
     print(f"获取到 {len(data)} 条数据")
@@ -49,39 +54,45 @@ def check_data_intervals(symbol="300750.SZ", days=30):
         print("❌ 数据不足")
         return
     
-    # 检查时间间隔
+    # 检查时间间隔：按交易时段槽位索引比较，午休、隔夜、周末和节假日不算缺口
+    slots = get_session_slots(30)
     abnormal_intervals = []
     prev_time = None
+    prev_index = None
     
     for i, doc in enumerate(data):
         try:
-            current_time = datetime.strptime(doc['trade_time'], '%Y-%m-%d %H:%M:%S')
+            current_time = parse_kline_time(doc, 'trade_time')
+            current_index = slots.index(current_time)
             
-            if prev_time:
-                interval = (current_time - prev_time).total_seconds() / 60  # 分钟
-                
-                # 30分钟K线，正常间隔应该是30分钟
-                if interval > 60:  # 超过1小时认为异常
-                    abnormal_intervals.append({
-                        'index': i,
-                        'prev_time': prev_time,
-                        'current_time': current_time,
-                        'interval_minutes': interval,
-                        'prev_price': data[i-1].get('close', 0),
-                        'current_price': doc.get('close', 0)
-                    })
+            if current_index is None:
+                print(f"⚠️ 非交易时段的K线: {current_time}")
+            elif prev_index is not None and current_index - prev_index > 1:
+                abnormal_intervals.append({
+                    'index': i,
+                    'prev_time': prev_time,
+                    'current_time': current_time,
+                    'missing_bars': current_index - prev_index - 1,
+                    'prev_price': data[i-1].get('close', 0),
+                    'current_price': doc.get('close', 0)
+                })
             
-            prev_time = current_time
+            if current_index is not None:
+                prev_time, prev_index = current_time, current_index
             
         except Exception as e:
             print(f"❌ 处理第{i}条数据时出错: {e}")
     
+    expected = slots.expected_bars(start_datetime, end_datetime)
+    print(f"应有 {expected} 根K线，实际 {len(data)} 根，"
+          f"缺失 {sum(item['missing_bars'] for item in abnormal_intervals)} 根（区间内部）")
+    
     print(f"\n发现 {len(abnormal_intervals)} 个异常时间间隔:")
     
     for interval in abnormal_intervals[:10]:  # 只显示前10个
         price_change = abs(interval['current_price'] - interval['prev_price']) / interval['prev_price'] * 100
         print(f"  {interval['prev_time']} -> {interval['current_time']}")
-        print(f"    间隔: {interval['interval_minutes']:.0f}分钟")
+        print(f"    缺失: {interval['missing_bars']}根K线")
         print(f"    价格: {interval['prev_price']:.2f} -> {interval['current_price']:.2f} ({price_change:.2f}%)")
         print()
     
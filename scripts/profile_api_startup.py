@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+API进程冷启动导入耗时分析
+在全新解释器中以 -X importtime 导入 api/main.py，汇总各模块累计导入耗时，
+并检查启动预算与不应在启动阶段加载的重量级模块（pandas等）
+
+运行方式：
+python scripts/profile_api_startup.py
+python scripts/profile_api_startup.py --budget-ms 800 --top 30
+python scripts/profile_api_startup.py --with-service   # 额外统计首次创建分析服务（不连接数据库）的耗时
+
+超出预算或加载了禁止模块时以非零状态码退出；测试套件中的同类检查见 chan_theory_v2/tests/test_api_startup.py
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+# 添加项目根目录到路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+api_dir = os.path.join(project_root, 'api')
+
+# 启动阶段不应加载的模块（应在首次使用时按需导入）
+DEFAULT_FORBIDDEN = ["pandas", "chan_theory_v2.core.chan_engine", "database.db_handler", "api.chan_api_v2"]
+
+STARTUP_CODE = "import main"
+SERVICE_CODE = "import main, time; t = time.perf_counter(); main.get_chan_api(); print('SERVICE_MS', (time.perf_counter() - t) * 1000)"
+
+
+def run_importtime(code):
+    """在api目录下用全新解释器执行代码，返回 (墙钟耗时ms, stdout, importtime原始输出)"""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [project_root, env.get("PYTHONPATH")]))
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=api_dir, env=env, capture_output=True, text=True
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        tail = "\n".join(line for line in result.stderr.splitlines() if not line.startswith("import time:"))
+        raise RuntimeError(f"导入失败:\n{tail[-2000:]}")
+    return wall_ms, result.stdout, result.stderr
+
+
+def parse_importtime(stderr):
+    """解析 -X importtime 输出，返回 {模块: (自身us, 累计us)}"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        fields = line.split(":", 1)[1].split("|")
+        if len(fields) != 3:
+            continue
+        modules[fields[2].strip()] = (int(fields[0]), int(fields[1]))
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description='API进程冷启动导入耗时分析')
+    parser.add_argument('--budget-ms', type=float, default=1500, help='导入 api/main.py 的累计耗时预算（毫秒）')
+    parser.add_argument('--top', type=int, default=20, help='显示累计耗时最高的模块数量')
+    parser.add_argument('--forbid', nargs='*', default=DEFAULT_FORBIDDEN, help='启动阶段禁止加载的模块')
+    parser.add_argument('--with-service', action='store_true', help='额外统计首次创建分析服务的耗时')
+    args = parser.parse_args()
+
+    try:
+        wall_ms, _, stderr = run_importtime(STARTUP_CODE)
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        sys.exit(2)
+    modules = parse_importtime(stderr)
+    main_us = modules.get("main", (0, 0))[1]
+
+    print(f"📊 导入 api/main.py: 累计 {main_us / 1000:.1f}ms, 进程墙钟 {wall_ms:.0f}ms, 模块数 {len(modules)}")
+    print(f"\n{'模块':<56}{'自身(ms)':>10}{'累计(ms)':>10}")
+    print("-" * 76)
+    ranked = sorted(modules.items(), key=lambda item: item[1][1], reverse=True)
+    for name, (self_us, cumulative_us) in ranked[:args.top]:
+        print(f"{name:<56}{self_us / 1000:>10.1f}{cumulative_us / 1000:>10.1f}")
+
+    failures = []
+    loaded = [name for name in args.forbid if name in modules]
+    if loaded:
+        failures.append(f"启动阶段加载了应延迟导入的模块: {', '.join(loaded)}")
+    if main_us / 1000 > args.budget_ms:
+        failures.append(f"导入耗时 {main_us / 1000:.1f}ms 超出预算 {args.budget_ms:.0f}ms")
+
+    if args.with_service:
+        _, stdout, service_stderr = run_importtime(SERVICE_CODE)
+        service_ms = next((float(line.split()[1]) for line in stdout.splitlines() if line.startswith("SERVICE_MS")), 0.0)
+        service_modules = parse_importtime(service_stderr)
+        print(f"\n🔧 首次创建分析服务: {service_ms:.1f}ms（新增模块 {len(service_modules) - len(modules)} 个）")
+        if "pandas" in service_modules:
+            failures.append("创建分析服务时加载了pandas")
+
+    if failures:
+        for failure in failures:
+            print(f"❌ {failure}")
+        sys.exit(1)
+    print(f"\n✅ 冷启动在预算内（{args.budget_ms:.0f}ms），未加载禁止模块")
+
+
+if __name__ == '__main__':
+    main()